@@ -0,0 +1,211 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from app.metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_ENABLED = os.environ.get("AEOS_ADMISSION", "1") != "0"
+DEFAULT_USER_RATE = float(os.environ.get("AEOS_USER_RATE", "20"))        # tokens per second, 0 = unlimited
+DEFAULT_USER_BURST = float(os.environ.get("AEOS_USER_BURST", "40"))      # bucket capacity
+DEFAULT_MAX_CONCURRENCY = int(os.environ.get("AEOS_MAX_CONCURRENCY", "64"))
+DEFAULT_TARGET_WAIT = float(os.environ.get("AEOS_TARGET_QUEUE_WAIT_MS", "250")) / 1000.0
+# When set, a request consumes (estimated division cost / cost unit) tokens
+# instead of one, so a DTAD call (0.03) weighs six HID calls (0.005).
+DEFAULT_COST_UNIT = float(os.environ.get("AEOS_ADMISSION_COST_UNIT", "0")) or None
+
+# Smoothing factor for the service-time moving average.
+SERVICE_TIME_ALPHA = 0.1
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed; `retry_after` is in seconds."""
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(f"Request rejected ({reason}); retry after {retry_after:.1f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, updated: float):
+        self.tokens = tokens
+        self.updated = updated
+
+
+class AdmissionController:
+    """
+    Admission control in front of the agent.
+
+    Each user_id draws from its own token bucket (`rate` tokens per second up to
+    `burst`), and at most `max_concurrency` admitted requests run at once; the
+    rest wait in a FIFO queue. A request is rejected immediately, instead of
+    being queued, when its user is out of tokens or when the estimated queue
+    wait (queue depth / concurrency x average service time) exceeds
+    `target_wait`.
+
+    A bucket left idle for `burst / rate` seconds has refilled completely and is
+    indistinguishable from a new one, so it is dropped. Memory therefore tracks
+    users active within that window, not every user_id ever seen.
+
+    With `shared` (a SharedBuckets, in the preforked server), the buckets live
+    in memory shared by every worker, so a user's rate holds across workers.
+    The concurrency limit and queue stay per worker: they bound each worker's
+    own event loop.
+    """
+    def __init__(
+        self,
+        rate: float = DEFAULT_USER_RATE,
+        burst: float = DEFAULT_USER_BURST,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        target_wait: float = DEFAULT_TARGET_WAIT,
+        cost_unit: Optional[float] = DEFAULT_COST_UNIT,
+        enabled: bool = DEFAULT_ENABLED,
+        shared=None,
+    ):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_concurrency = max_concurrency
+        self.target_wait = target_wait
+        self.cost_unit = cost_unit
+        self.enabled = enabled
+        self.idle_ttl = self.burst / rate if rate > 0 else 0.0
+        self.shared = shared
+
+        # Least recently used first, so expired buckets are popped from the front.
+        self._buckets: "OrderedDict[str, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.active = 0
+        self._waiters: "OrderedDict[asyncio.Future, None]" = OrderedDict()
+        self._service_time = 0.0
+
+        self.admitted = 0
+        self.rate_limited = 0
+        self.overloaded = 0
+
+    def weight(self, cost: float) -> float:
+        """Tokens consumed by a request of the given estimated cost."""
+        if not self.cost_unit:
+            return 1.0
+        return min(cost / self.cost_unit, self.burst)
+
+    # -- per-user token buckets --------------------------------------------
+
+    def _take(self, user_id: str, weight: float, now: float):
+        missing = self.shared.take(user_id, weight, now, self.rate, self.burst) if self.shared is not None else None
+        if missing is None:
+            # No shared buckets, or their lock is busy: this worker's bucket decides.
+            missing = self._take_local(user_id, weight, now)
+        if missing:
+            self.rate_limited += 1
+            ADMISSION_REJECTED.inc("rate_limit")
+            raise AdmissionRejected("rate_limit", missing / self.rate)
+
+    def _take_local(self, user_id: str, weight: float, now: float) -> float:
+        """Takes `weight` tokens from this process's bucket; returns the tokens missing."""
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = _Bucket(self.burst, now)
+            else:
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+                self._buckets.move_to_end(user_id)
+            self._expire(now)
+            if bucket.tokens < weight:
+                return weight - bucket.tokens
+            bucket.tokens -= weight
+            return 0.0
+
+    def _expire(self, now: float):
+        buckets = self._buckets
+        while buckets:
+            user_id, bucket = next(iter(buckets.items()))
+            if now - bucket.updated < self.idle_ttl:
+                break
+            del buckets[user_id]
+
+    def check(self, user_id: Optional[str], cost: float = 0.0):
+        """Applies the user's token bucket only; raises AdmissionRejected."""
+        if self.enabled and self.rate > 0:
+            self._take(user_id or "anonymous", self.weight(cost), time.monotonic())
+
+    # -- global concurrency -----------------------------------------------
+
+    def estimated_wait(self) -> float:
+        """Expected queueing delay for a request arriving now."""
+        if self.active < self.max_concurrency:
+            return 0.0
+        return (len(self._waiters) + 1) / self.max_concurrency * self._service_time
+
+    async def acquire(self, user_id: Optional[str], cost: float = 0.0) -> float:
+        """
+        Admits a request or raises AdmissionRejected. Returns the admission
+        timestamp, to be passed back to `release` when the request finishes.
+        """
+        if not self.enabled:
+            return time.monotonic()
+        self.check(user_id, cost)
+        wait = self.estimated_wait()
+        if wait > self.target_wait:
+            self.overloaded += 1
+            ADMISSION_REJECTED.inc("overload")
+            raise AdmissionRejected("overload", wait)
+
+        queued = time.monotonic()
+        if self.active >= self.max_concurrency or self._waiters:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters[waiter] = None
+            try:
+                await waiter
+            except BaseException:
+                self._waiters.pop(waiter, None)
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we were cancelled.
+                    self._release_slot()
+                raise
+        else:
+            self.active += 1
+        started = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(started - queued)
+        self.admitted += 1
+        return started
+
+    def release(self, started: float):
+        if not self.enabled:
+            return
+        elapsed = time.monotonic() - started
+        self._service_time += SERVICE_TIME_ALPHA * (elapsed - self._service_time)
+        self._release_slot()
+
+    def _release_slot(self):
+        # Hand the slot straight to the oldest waiter, keeping `active` unchanged.
+        while self._waiters:
+            waiter, _ = self._waiters.popitem(last=False)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "enabled": self.enabled,
+            "user_rate": self.rate,
+            "user_burst": self.burst,
+            "max_concurrency": self.max_concurrency,
+            "target_wait_seconds": self.target_wait,
+            "cost_unit": self.cost_unit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "tracked_users": len(self._buckets),
+            "service_time_seconds": self._service_time,
+            "estimated_wait_seconds": self.estimated_wait(),
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "overloaded": self.overloaded,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
@@ -1,10 +1,46 @@
-from typing import List, Dict, Any
+import asyncio
+import threading
+import time
+from typing import List, Dict, Any, FrozenSet, Optional, Tuple
+from app.admission import AdmissionController
+from app.audit import AuditLog
+from app.cache import ResponseCache
+from app.events import Emit, emit_division_result, emit_logs
+from app.metering import MeteringLedger
+from app.metrics import (
+    DIVISION_COST,
+    DIVISION_ERRORS,
+    DIVISION_IN_FLIGHT,
+    DIVISION_SECONDS,
+    RESPONSE_BUILD_SECONDS,
+    ROUTING_SECONDS,
+    SampledSeries,
+)
 from app.models import AgentResponse
 from app.divisions import (
+    DIVISION_EXECUTOR,
+    AEOSDivision,
     EarthIntelligenceDivision,
     EnterpriseIntelligenceDivision,
     DeFiTransactionDivision,
-    HumanInteractionDivision
+    HumanInteractionDivision,
+    with_requester,
+)
+from app.routing import build_router, capability_intent, route_intent, triggered
+from app.sentiment import SENTIMENT, SentimentScorer
+from app.sessions import SessionStore
+from app.tools import TOOL_REGISTRY
+from app.workflows import WORKFLOWS, WorkflowEngine
+
+# Upper bound (seconds) on any single division step in the async pipeline.
+DEFAULT_STEP_TIMEOUT = 10.0
+
+# Order defines routing precedence: EID > ENID > DTAD > HID
+DIVISION_CLASSES = (
+    EarthIntelligenceDivision,
+    EnterpriseIntelligenceDivision,
+    DeFiTransactionDivision,
+    HumanInteractionDivision,
 )
 
 class AEOSOrchestrator:
@@ -12,130 +48,514 @@ class AEOSOrchestrator:
     The Superior AI OS that controls and orchestrates the other 4 agent divisions.
     It acts as the "Brain" of the Autonomous Earth Operating System.
     """
-    def __init__(self):
-        self.eid = EarthIntelligenceDivision()
-        self.enid = EnterpriseIntelligenceDivision()
-        self.dtad = DeFiTransactionDivision()
-        self.hid = HumanInteractionDivision()
-        self.divisions = [self.eid, self.enid, self.dtad, self.hid]
+    def __init__(
+        self,
+        step_timeout: float = DEFAULT_STEP_TIMEOUT,
+        cache: Optional[ResponseCache] = None,
+        meter: Optional[MeteringLedger] = None,
+        sessions: Optional[SessionStore] = None,
+        audit: Optional[AuditLog] = None,
+        sentiment: Optional[SentimentScorer] = None,
+    ):
+        self.step_timeout = step_timeout
+        self.cache = cache if cache is not None else ResponseCache()
+        # Per-user cost metering; disabled when no ledger is supplied.
+        self.meter = meter
+        # Per-user session context for follow-ups; disabled when not supplied.
+        self.sessions = sessions
+        # Audit trail of every call; disabled when no log is supplied.
+        self.audit = audit
+        # Scores the `sentiment` of every response from the query.
+        self.sentiment = sentiment if sentiment is not None else SENTIMENT
+        # Divisions are created on first use; routing only needs the keyword
+        # tables declared on the classes.
+        self.division_classes = {cls.code: cls for cls in DIVISION_CLASSES}
+        self._divisions: Dict[str, AEOSDivision] = {}
+        self._division_lock = threading.Lock()
+        self.workflows = WORKFLOWS
+        # Metric series bound once, so each update skips the label lookup.
+        self._routing_seconds = SampledSeries(ROUTING_SECONDS.labels())
+        self._response_build_seconds = SampledSeries(RESPONSE_BUILD_SECONDS.labels())
+        self._division_series: Dict[Tuple[str, str], Tuple] = {}
+        self._workflows_by_name = {workflow.name: workflow for workflow in self.workflows}
+        self.router = build_router(DIVISION_CLASSES, self._triggers(self.workflows))
+        self.engine = WorkflowEngine(self.division, self._process_step, self._run_step, self._reuse_step,
+                                     self.sentiment.label)
+
+    @staticmethod
+    def _triggers(workflows) -> List:
+        """Keyword trigger groups to compile into the router, per workflow."""
+        return [(w.name, w.trigger) for w in workflows]
+
+    def division(self, code: str) -> AEOSDivision:
+        """Returns the division for `code`, instantiating it on first use."""
+        division = self._divisions.get(code)
+        if division is None:
+            with self._division_lock:
+                division = self._divisions.get(code)
+                if division is None:
+                    division = self._divisions[code] = self._attach(self.division_classes[code]())
+        return division
+
+    def use_division(self, division: AEOSDivision):
+        """Replaces the instance serving `division.code` (e.g. a stub or a warmed instance)."""
+        self._divisions[division.code] = self._attach(division)
+
+    def _attach(self, division: AEOSDivision) -> AEOSDivision:
+        """Hands the orchestrator's audit log to the division that reports on it."""
+        if isinstance(division, EnterpriseIntelligenceDivision):
+            division.audit = self.audit
+        return division
+
+    @property
+    def divisions(self) -> List[AEOSDivision]:
+        return [self.division(code) for code in self.division_classes]
+
+    @property
+    def eid(self) -> AEOSDivision:
+        return self.division("EID")
+
+    @property
+    def enid(self) -> AEOSDivision:
+        return self.division("ENID")
+
+    @property
+    def dtad(self) -> AEOSDivision:
+        return self.division("DTAD")
+
+    @property
+    def hid(self) -> AEOSDivision:
+        return self.division("HID")
 
-    def process(self, query: str) -> AgentResponse:
+    def _route(
+        self,
+        query: str,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+        risks: Optional[Dict[str, Optional[Dict[str, Any]]]] = None,
+    ):
         """
-        Main entry point for AEOS. Analyzes the query and delegates to the appropriate division(s).
-        Demonstrates the "Superior OS" capability by coordinating multi-agent workflows.
+        Returns (logs, intents, workflow, division). Exactly one of
+        `workflow` and `division` is set. `risks` holds the assessments of the
+        workflows' risk triggers (see `_assess_risks`). A query that matches
+        no route but reads as a follow-up (see `SessionStore.follow_up`)
+        continues the user's previous route: its workflow is re-run, or its
+        division called again with the same capability. Routes that would move
+        funds or skip the cache are never continued; the query goes to HID.
         """
-
-        selected_division = None
+        started = time.perf_counter()
         logs = []
 
         # 1. Master Logic: Determine Intent
         logs.append(f"AEOS Orchestrator receiving query: '{query}'")
         logs.append("Analyzing intent across 4 Intelligence Divisions...")
 
-        # 2. Check for Cross-Division Collaboration Triggers
-        # Example: "Compliance check then pay" -> ENID + DTAD
-        # Example: "Disaster payment" -> EID + DTAD
+        # A single scan of the query yields every matched intent; routing and
+        # the divisions' capability selection both read from this set.
+        intents = self.router.match(query)
+        workflow, code = self._select(intents, query, risks)
+        if workflow:
+            self._routing_seconds.observe(time.perf_counter() - started)
+            return logs, intents, workflow, None
 
-        query_lower = query.lower()
-        if ("flood" in query_lower or "disaster" in query_lower) and ("pay" in query_lower or "fund" in query_lower):
-            return self._handle_collaboration_eid_dtad(query)
+        if code is None:
+            session = self.sessions.follow_up(user_id, query) if self.sessions is not None else None
+            pinned = self._workflows_by_name.get(session.workflow) if session is not None and session.workflow else None
+            if pinned is not None:
+                # The forwarded steps select the capabilities the workflow's keywords do.
+                pinned_intents = intents | self.router.match(" ".join(word for group in pinned.trigger for word in group))
+                if self._replayable(pinned, query, pinned_intents):
+                    self.sessions.pinned += 1
+                    logs.append(f"Follow-up query: re-running {pinned.title} from session context.")
+                    self._routing_seconds.observe(time.perf_counter() - started)
+                    return logs, pinned_intents, pinned, None
+            elif (session is not None and session.division and session.capability
+                  and session.capability not in self.division(session.division).uncacheable_capabilities):
+                code = session.division
+                intents = intents | {capability_intent(code, session.capability)}
+                self.sessions.pinned += 1
+                logs.append(f"Follow-up query: continuing with {self.division(code).name} from session context.")
+            if code is None:
+                # Fallback to HID if no specific technical division matches
+                code = "HID"
 
-        if "compliance" in query_lower and "pay" in query_lower:
-            return self._handle_collaboration_enid_dtad(query)
+        selected_division = self.division(code)
+        logs.append(f"Delegating task to: {selected_division.name}")
+        self._routing_seconds.observe(time.perf_counter() - started)
+        return logs, intents, None, selected_division
+
+    def _replayable(self, workflow, query: str, intents: FrozenSet[str]) -> bool:
+        """Whether every step of `workflow` selects a cacheable capability, so re-running it moves no funds."""
+        for step in workflow.steps:
+            division = self.division(step.division)
+            step_intents = intents if step.query is None else division.match(step.query.replace("{query}", query))
+            if division.select_capability(step_intents) in division.uncacheable_capabilities:
+                return False
+        return True
+
+    def _select(self, intents: FrozenSet[str], query: str, risks: Optional[Dict[str, Optional[Dict[str, Any]]]] = None):
+        """
+        Returns (workflow, None) for a collaboration, else (None, division code);
+        the code is None when no division matched. Workflows are tried in
+        declaration order. A risk-gated one also needs its intent words, and
+        is passed over when the assessment in `risks` falls short of its
+        threshold; without an assessment it selects on its words alone.
+        """
+        # 2. Check for Cross-Division Collaboration Triggers
+        for workflow in self.workflows:
+            if not triggered(intents, workflow.name, workflow.trigger):
+                continue
+            risk = workflow.risk
+            if risk is None:
+                return workflow, None
+            if risk.matches(query) and risk.fired((risks or {}).get(workflow.name)) is not False:
+                return workflow, None
 
         # 3. Standard Routing (Single Division)
-        # Naive keyword matching for the orchestrator to route to correct division
-        if any(k in query_lower for k in ["weather", "climate", "satellite", "disaster", "planet", "venus", "mars"]):
-            selected_division = self.eid
-        elif any(k in query_lower for k in ["marketing", "workflow", "compliance", "audit", "kyc"]):
-            selected_division = self.enid
-        elif any(k in query_lower for k in ["yield", "treasury", "risk", "pay", "transaction", "send"]):
-            selected_division = self.dtad
-        elif any(k in query_lower for k in ["support", "personal", "ticket", "voice"]):
-            selected_division = self.hid
-
-        # Fallback to HID if no specific technical division matches
-        if not selected_division:
-            selected_division = self.hid
+        for code in self.division_classes:
+            if route_intent(code) in intents:
+                return None, code
+        return None, None
 
-        logs.append(f"Delegating task to: {selected_division.name}")
+    def _risk_candidates(self, query: str) -> List:
+        """
+        Workflows whose risk trigger the query reaches, as (workflow, division)
+        pairs; only those triggered ahead of any explicit collaboration, which
+        would win.
+        """
+        if not any(w.risk is not None and w.risk.matches(query) for w in self.workflows):
+            return []
+        intents = self.router.match(query)
+        candidates = []
+        for workflow in self.workflows:
+            if not triggered(intents, workflow.name, workflow.trigger):
+                continue
+            if workflow.risk is None:
+                break
+            if workflow.risk.matches(query):
+                candidates.append((workflow, self.division(workflow.risk.division)))
+        return candidates
+
+    def _assess_risks(self, query: str, context: Optional[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        return {workflow.name: division.assess(query, context) for workflow, division in self._risk_candidates(query)}
+
+    async def _aassess_risks(self, query: str, context: Optional[Dict[str, Any]]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """`_assess_risks` with the (raster-reading) assessments run in the division executor."""
+        candidates = self._risk_candidates(query)
+        if not candidates:
+            return {}
+        loop = asyncio.get_running_loop()
+        assessments = await asyncio.gather(*(
+            loop.run_in_executor(DIVISION_EXECUTOR, division.assess, query, context) for _, division in candidates
+        ))
+        return {workflow.name: assessment for (workflow, _), assessment in zip(candidates, assessments)}
+
+    def estimate_cost(self, query: str) -> float:
+        """
+        Cost the query would incur, from the route it selects and the divisions'
+        declared costs. Nothing is executed or instantiated.
+        """
+        workflow, code = self._select(self.router.match(query), query)
+        if workflow is None:
+            return self.division_classes[code or "HID"].cost
+        calls = {(step.division, step.query) for step in workflow.steps}
+        return sum(self.division_classes[division].cost for division, _ in calls)
 
-        # 4. Execute Division Logic
-        result = selected_division.process(query)
+    def process(self, query: str, user_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
+        """
+        Main entry point for AEOS. Analyzes the query and delegates to the appropriate division(s).
+        Demonstrates the "Superior OS" capability by coordinating multi-agent workflows.
+        """
+        started = time.perf_counter()
+        routed = None
+        context = with_requester(context, user_id)
+        try:
+            risks = self._assess_risks(query, context)
+            routed = logs, intents, workflow, division = self._route(query, user_id, context, risks)
+            self._remember_route(user_id, intents, workflow, division)
+            if workflow:
+                response = self.engine.run(workflow, query, intents, user_id, context)
+            else:
+                # 4. Execute Division Logic
+                result = self._process_step(division, query, intents, user_id, context)
+                response = self._aggregate(division, query, result, logs)
+        except BaseException as e:
+            self._audit(started, query, user_id, routed, error=e)
+            raise
+        self._audit(started, query, user_id, routed, response)
+        return response
 
+    async def aprocess(
+        self,
+        query: str,
+        emit: Optional[Emit] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> AgentResponse:
+        """
+        Async entry point. Division logic runs through the async division protocol,
+        so slow divisions never block the event loop. When `emit` is given, log
+        lines, tool calls and partial results are published as they are produced.
+        """
+        started = time.perf_counter()
+        routed = None
+        context = with_requester(context, user_id)
+        try:
+            risks = await self._aassess_risks(query, context)
+            routed = logs, intents, workflow, division = self._route(query, user_id, context, risks)
+            self._remember_route(user_id, intents, workflow, division)
+            if workflow:
+                response = await self.engine.arun(workflow, query, intents, emit, user_id, context)
+            else:
+                emit_logs(emit, logs, "AEOS")
+                result = await self._run_step(division, query, intents, user_id, context)
+                emit_division_result(emit, division.name, result)
+                response = self._aggregate(division, query, result, logs)
+        except BaseException as e:
+            self._audit(started, query, user_id, routed, error=e)
+            raise
+        self._audit(started, query, user_id, routed, response)
+        return response
+
+    def _audit(
+        self,
+        started: float,
+        query: str,
+        user_id: Optional[str],
+        routed,
+        response: Optional[AgentResponse] = None,
+        error: Optional[BaseException] = None,
+    ):
+        """Appends the call to the audit log, when enabled. Never does I/O."""
+        if self.audit is None:
+            return
+        route, capability = "", None
+        if routed is not None:
+            _, intents, workflow, division = routed
+            if workflow:
+                route = workflow.name
+            else:
+                route, capability = division.code, division.select_capability(intents)
+        self.audit.record(
+            user_id,
+            route,
+            capability,
+            tuple(tool["tool"] for tool in response.tool_usage) if response is not None else (),
+            response.cost_incurred if response is not None else 0.0,
+            time.perf_counter() - started,
+            query,
+            type(error).__name__ if error is not None else None,
+        )
+
+    def _remember_route(self, user_id: Optional[str], intents: FrozenSet[str], workflow, division):
+        if self.sessions is None:
+            return
+        if workflow:
+            self.sessions.remember_route(user_id, workflow=workflow.name)
+        else:
+            self.sessions.remember_route(user_id, division.code, division.select_capability(intents))
+
+    def _remember_result(self, user_id: Optional[str], key, result: Dict[str, Any]):
+        # Only cacheable results are kept, so a payment is never replayed.
+        if self.sessions is not None and key is not None:
+            self.sessions.remember_result(user_id, key, result)
+
+    def _reuse_step(
+        self,
+        division,
+        query: str,
+        intents: Optional[FrozenSet[str]] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """The result of an equivalent step from the user's session, if still fresh."""
+        if self.sessions is None:
+            return None
+        key = division.cache_key(query, intents if intents is not None else division.match(query), context)
+        return self.sessions.result(user_id, key) if key is not None else None
+
+    def _aggregate(self, division, query: str, result: Dict[str, Any], logs: List[str]) -> AgentResponse:
         # 5. Aggregate Results
-        full_logs = logs + result.get("logs", [])
+        started = time.perf_counter()
+        # Division results may be shared templates with tuple fields.
+        full_logs = logs + list(result.get("logs", ()))
 
-        return AgentResponse(
+        response = AgentResponse(
             response=result["response"],
-            division=selected_division.name,
+            division=division.name,
             tool_usage=result["tool_usage"],
             collaboration_log=full_logs,
-            sentiment="positive", # simplified for now
+            sentiment=self.sentiment.label(query),
             cost_incurred=result.get("cost", 0.0)
         )
+        self._response_build_seconds.observe(time.perf_counter() - started)
+        return response
 
-    def _handle_collaboration_eid_dtad(self, query: str) -> AgentResponse:
-        """
-        Handles the complex workflow: Earth Intelligence detects disaster -> DeFi Agent releases funds.
-        """
-        logs = []
-        logs.append("AEOS Orchestrator detected MULTI-AGENT workflow: Disaster Response + Financial Settlement")
-
-        # Step 1: EID
-        logs.append("Step 1: Activating EID for disaster verification...")
-        eid_result = self.eid.process(query)
-        logs.extend(eid_result["logs"])
-
-        # Step 2: DTAD
-        logs.append("Step 2: Activating DTAD for emergency fund release...")
-        dtad_result = self.dtad.process("send emergency funds")
-        logs.extend(dtad_result.get("logs", []))
-
-        # Collaboration log
-        logs.append("COLLABORATION SUCCESS: Verified disaster data on-chain, triggered smart contract release.")
-
-        return AgentResponse(
-            response=f"Collaborative Workflow Complete: {eid_result['response']} -> {dtad_result['response']}",
-            division="AEOS Collaborative Core (EID + DTAD)",
-            tool_usage=eid_result["tool_usage"] + dtad_result["tool_usage"],
-            collaboration_log=logs,
-            sentiment="serious",
-            cost_incurred=eid_result["cost"] + dtad_result["cost"]
-        )
+    def _process_step(
+        self,
+        division,
+        query: str,
+        intents: Optional[FrozenSet[str]] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        """Runs one division step synchronously, through the response cache."""
+        if intents is None:
+            intents = division.match(query)
+        capability = division.select_capability(intents) or "none"
+        key = division.cache_key(query, intents, context)
+        if key is None:
+            result = self._execute(division, capability, query, intents, context)
+        else:
+            result = self.cache.get_or_compute(key, lambda: self._execute(division, capability, query, intents, context))
+        self._charge(division, capability, result, user_id)
+        self._remember_result(user_id, key, result)
+        return result
 
-    def _handle_collaboration_enid_dtad(self, query: str) -> AgentResponse:
+    def _series(self, code: str, capability: str) -> Tuple:
+        """(latency, errors, in-flight, cost) metric series of a division capability."""
+        series = self._division_series.get((code, capability))
+        if series is None:
+            series = self._division_series[(code, capability)] = (
+                DIVISION_SECONDS.labels(code, capability),
+                DIVISION_ERRORS.labels(code, capability),
+                DIVISION_IN_FLIGHT.labels(code),
+                DIVISION_COST.labels(code, capability),
+            )
+        return series
+
+    def _charge(self, division, capability: str, result: Dict[str, Any], user_id: Optional[str]):
+        """Accounts a step's cost in the metrics and, when enabled, the metering ledger."""
+        cost = result.get("cost", 0.0)
+        if cost:
+            self._series(division.code, capability)[3].inc(cost)
+            if self.meter is not None:
+                self.meter.record(user_id, division.code, cost)
+
+    def _execute(self, division, capability: str, query: str, intents: FrozenSet[str],
+                 context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Runs division.process with latency, error and in-flight instrumentation."""
+        seconds, errors, in_flight, _ = self._series(division.code, capability)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return division.process(query, intents, context)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started)
+            in_flight.dec()
+
+    async def _aexecute(self, division, capability: str, query: str, intents: FrozenSet[str],
+                        context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        seconds, errors, in_flight, _ = self._series(division.code, capability)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            return await division.aprocess(query, intents, context)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - started)
+            in_flight.dec()
+
+    async def _run_step(
+        self,
+        division,
+        query: str,
+        intents: Optional[FrozenSet[str]] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
         """
-        Handles: Enterprise Compliance -> DeFi Payment.
+        Runs one division step through the response cache, with the orchestrator's
+        per-step timeout. A timed-out step yields a degraded result instead of
+        failing the whole request. Uncacheable capabilities (payments) are not
+        timed out: their executor thread cannot be cancelled and would still
+        settle, so the step waits for the real outcome.
         """
-        logs = []
-        logs.append("AEOS Orchestrator detected MULTI-AGENT workflow: Compliance Check + Payment")
-
-        # Step 1: ENID
-        logs.append("Step 1: Activating ENID for KYC/AML check...")
-        enid_result = self.enid.process(query)
-        logs.extend(enid_result.get("logs", []))
-
-        # Step 2: DTAD
-        logs.append("Step 2: Activating DTAD for secure settlement...")
-        dtad_result = self.dtad.process(query) # Pass original query to capture amount
-        logs.extend(dtad_result.get("logs", []))
-
-        logs.append("COLLABORATION SUCCESS: Identity proof minted, transaction executed.")
-
-        return AgentResponse(
-            response=f"Secure Transaction Complete: {enid_result['response']} -> {dtad_result['response']}",
-            division="AEOS Collaborative Core (ENID + DTAD)",
-            tool_usage=enid_result["tool_usage"] + dtad_result["tool_usage"],
-            collaboration_log=logs,
-            sentiment="positive",
-            cost_incurred=enid_result["cost"] + dtad_result["cost"]
-        )
+        if intents is None:
+            intents = division.match(query)
+        capability = division.select_capability(intents) or "none"
+        key = division.cache_key(query, intents, context)
+        if key is None:
+            step = self._aexecute(division, capability, query, intents, context)
+        else:
+            step = self.cache.aget_or_compute(key, lambda: self._aexecute(division, capability, query, intents, context))
+        try:
+            if capability in division.uncacheable_capabilities:
+                result = await step
+            else:
+                result = await asyncio.wait_for(step, self.step_timeout)
+            self._charge(division, capability, result, user_id)
+            self._remember_result(user_id, key, result)
+            return result
+        except asyncio.TimeoutError:
+            return {
+                "response": f"{division.name} did not respond in time.",
+                "tool_usage": [],
+                "logs": [f"{division.name} timed out after {self.step_timeout:.1f}s"],
+                "cost": 0.0,
+            }
 
 # Maintain the interface expected by main.py but redirect to Orchestrator
 class MasumiAgent:
     def __init__(self):
-        self.orchestrator = AEOSOrchestrator()
+        self.meter = MeteringLedger()
+        self.sessions = SessionStore()
+        self.audit = AuditLog()
+        self.orchestrator = AEOSOrchestrator(meter=self.meter, sessions=self.sessions, audit=self.audit)
+        self.admission = AdmissionController()
+
+    def warm(self) -> List[AEOSDivision]:
+        """
+        Instantiates every division and tool backend, loading their data, e.g.
+        before forking workers that share it. Returns the divisions.
+        """
+        divisions = self.orchestrator.divisions
+        for spec in TOOL_REGISTRY.specs.values():
+            TOOL_REGISTRY.backend(spec.backend)
+        return divisions
+
+    def after_fork(self, partition: str):
+        """
+        Called in a worker forked from a warmed agent: audit, metering and
+        session snapshots go to the worker's own `partition`, and backends
+        restart their background threads.
+        """
+        self.audit.partition(partition)
+        self.meter.partition(partition)
+        self.sessions.partition(partition)
+        TOOL_REGISTRY.after_fork()
+
+    def _weight_cost(self, query: str) -> float:
+        # Routing is only re-run when admission weights requests by cost.
+        return self.orchestrator.estimate_cost(query) if self.admission.cost_unit else 0.0
+
+    def process(self, query: str, user_id: Optional[str] = None, context: Optional[Dict[str, Any]] = None) -> AgentResponse:
+        self.admission.check(user_id, self._weight_cost(query))
+        return self.orchestrator.process(query, user_id, context)
+
+    async def admit(self, query: str, user_id: Optional[str] = None) -> float:
+        """
+        Reserves capacity for a request, raising AdmissionRejected when it must be
+        shed. The returned ticket is handed to `aprocess`, which releases it.
+        """
+        return await self.admission.acquire(user_id, self._weight_cost(query))
 
-    def process(self, query: str) -> AgentResponse:
-        return self.orchestrator.process(query)
+    async def aprocess(
+        self,
+        query: str,
+        emit: Optional[Emit] = None,
+        user_id: Optional[str] = None,
+        ticket: Optional[float] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> AgentResponse:
+        if ticket is None:
+            ticket = await self.admit(query, user_id)
+        try:
+            return await self.orchestrator.aprocess(query, emit, user_id, context)
+        finally:
+            self.admission.release(ticket)
@@ -0,0 +1,397 @@
+import hashlib
+import heapq
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_AUDIT_DIR = os.environ.get("AEOS_AUDIT_DIR", os.path.join("data", "audit"))
+DEFAULT_COMMIT_INTERVAL = float(os.environ.get("AEOS_AUDIT_COMMIT_MS", "5")) / 1000.0
+DEFAULT_SEGMENT_BYTES = int(os.environ.get("AEOS_AUDIT_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_FSYNC = os.environ.get("AEOS_AUDIT_FSYNC", "1") != "0"
+
+# Records buffered in memory before new ones are dropped rather than block.
+MAX_PENDING = 1_000_000
+# Seconds between commit attempts after a failed one.
+RETRY_INTERVAL = 1.0
+# Records per block, the unit of the sparse time and user indexes.
+BLOCK_RECORDS = 256
+# Query text kept per record.
+QUERY_CHARS = 512
+
+# Frame header: payload length, CRC-32 of the payload, timestamp.
+FRAME = struct.Struct("<IId")
+# Per-segment sparse indexes: one row per block, one row per (user, block).
+BLOCK_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4"), ("count", "<u4"), ("min_ts", "<f8"), ("max_ts", "<f8")])
+USER_DTYPE = np.dtype([("user", "<u8"), ("block", "<u4")])
+
+LOG_SUFFIX, BLOCKS_SUFFIX, USERS_SUFFIX = ".log", ".blocks", ".users"
+
+
+def user_key(user_id: str) -> int:
+    """Stable 64-bit key of a user id, as stored in the user index."""
+    return int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "little")
+
+
+def _frames(data: bytes) -> Iterator[Tuple[int, float, bytes]]:
+    """Yields (end offset, timestamp, payload) of each intact frame in `data`."""
+    offset = 0
+    while offset + FRAME.size <= len(data):
+        length, crc, ts = FRAME.unpack_from(data, offset)
+        end = offset + FRAME.size + length
+        payload = data[offset + FRAME.size:end]
+        if end > len(data) or zlib.crc32(payload) != crc:
+            return
+        yield end, ts, payload
+        offset = end
+
+
+class AuditLog:
+    """
+    Durable, append-only audit trail of orchestrator calls.
+
+    `record()` appends to an in-memory list under a short lock and returns; a
+    background thread group-commits everything pending every `commit_interval`
+    seconds: one write and one fsync for the whole batch. Records are CRC-framed
+    and appended to rotating `<n>.log` segment files. Each commit also appends
+    to two sparse indexes per segment: `<n>.blocks` (byte range, record count
+    and time range of every block of BLOCK_RECORDS records) and `<n>.users`
+    (which users appear in which block). Queries read only the blocks whose
+    time range and user set can match.
+
+    The indexes are derived data: only the log is fsynced, and on start-up the
+    writer rebuilds the indexes of the last segment from its log, dropping a
+    torn trailing frame. Any instance can read the directory; only the one
+    that records starts the writer thread. A batch that fails to commit stays
+    pending and is retried, after the segment is recovered the same way.
+
+    Each process of a preforked server writes its own partition, a
+    subdirectory of `path` (see `partition`); queries merge the records of
+    `path` and every partition, newest first.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_AUDIT_DIR,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+        segment_bytes: int = DEFAULT_SEGMENT_BYTES,
+        fsync: bool = DEFAULT_FSYNC,
+    ):
+        self.path = path
+        self.root = path
+        self.commit_interval = commit_interval
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+
+        self._lock = threading.Lock()
+        self._commit_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._pending: List[Tuple] = []
+        self._segment: Optional[int] = None
+
+        self.recorded = 0
+        self.dropped = 0
+        self.commits = 0
+        self.committed = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        if path:
+            os.makedirs(path, exist_ok=True)
+
+    @classmethod
+    def open(cls, path: Optional[str] = DEFAULT_AUDIT_DIR) -> Optional["AuditLog"]:
+        """A reader for the log at `path`, or None when nothing was ever recorded there."""
+        if not path or not os.path.isdir(path):
+            return None
+        return cls(path)
+
+    def partition(self, name: str):
+        """Writes to `<root>/<name>` from now on. Call before the first record."""
+        if self.root:
+            self.path = os.path.join(self.root, name)
+            os.makedirs(self.path, exist_ok=True)
+            self._segment = None
+
+    def _file(self, segment: int, suffix: str, directory: Optional[str] = None) -> str:
+        return os.path.join(directory or self.path, f"{segment:08d}{suffix}")
+
+    def segments(self, directory: Optional[str] = None) -> List[int]:
+        directory = directory or self.path
+        if not directory or not os.path.isdir(directory):
+            return []
+        return sorted(int(name[:-len(LOG_SUFFIX)]) for name in os.listdir(directory)
+                      if name.endswith(LOG_SUFFIX) and name[:-len(LOG_SUFFIX)].isdigit())
+
+    def _directories(self) -> List[str]:
+        """The root and each partition directory under it."""
+        if not self.root or not os.path.isdir(self.root):
+            return []
+        return [self.root] + [os.path.join(self.root, name) for name in sorted(os.listdir(self.root))
+                              if os.path.isdir(os.path.join(self.root, name))]
+
+    # -- write path -------------------------------------------------------
+
+    def record(
+        self,
+        user_id: Optional[str],
+        route: str,
+        capability: Optional[str] = None,
+        tools: Tuple[str, ...] = (),
+        cost: float = 0.0,
+        latency: float = 0.0,
+        query: str = "",
+        error: Optional[str] = None,
+    ):
+        """Appends one record. No I/O and no encoding; committing happens in the background."""
+        if not self.path:
+            return
+        with self._lock:
+            if len(self._pending) >= MAX_PENDING:
+                self.dropped += 1
+                return
+            self._pending.append((time.time(), user_id or "anonymous", route, capability, tools, cost, latency, query, error))
+            self.recorded += 1
+        if self._thread is None:
+            self._start()
+
+    def _start(self):
+        with self._commit_lock:
+            if self._thread is None:
+                self._recover()
+                self._thread = threading.Thread(target=self._run, name="aeos-audit", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        interval = self.commit_interval
+        while not self._closed:
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+                interval = self.commit_interval
+            except Exception as e:
+                # Keep the writer alive; flush() kept the failed batch pending.
+                self.errors += 1
+                self.last_error = str(e)
+                interval = RETRY_INTERVAL
+
+    def _recover(self):
+        """Rebuilds the last segment's indexes from its log, truncating a torn tail."""
+        segments = self.segments()
+        if not segments:
+            self._segment = 0
+            return
+        segment = self._segment = segments[-1]
+        with open(self._file(segment, LOG_SUFFIX), "rb") as f:
+            data = f.read()
+        blocks, users, records, valid = [], [], [], 0
+        for end, ts, payload in _frames(data):
+            records.append((valid, end, ts, json.loads(payload)["user"]))
+            valid = end
+        if valid < len(data):
+            with open(self._file(segment, LOG_SUFFIX), "r+b") as f:
+                f.truncate(valid)
+        for start in range(0, len(records), BLOCK_RECORDS):
+            block = records[start:start + BLOCK_RECORDS]
+            index = len(blocks)
+            blocks.append((block[0][0], block[-1][1] - block[0][0], len(block), block[0][2], block[-1][2]))
+            users.extend((key, index) for key in sorted({user_key(user) for _, _, _, user in block}))
+        np.array(blocks, dtype=BLOCK_DTYPE).tofile(self._file(segment, BLOCKS_SUFFIX))
+        np.array(users, dtype=USER_DTYPE).tofile(self._file(segment, USERS_SUFFIX))
+
+    def flush(self):
+        """Group-commits every pending record: one write and one fsync per segment touched."""
+        if not self.path:
+            return
+        with self._commit_lock:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            if not pending:
+                return
+            start = 0
+            try:
+                while start < len(pending):
+                    if self._segment is None:
+                        self._recover()
+                    start = self._commit(pending, start)
+            finally:
+                if start < len(pending):
+                    # Not durable yet: retried by the next flush, ahead of newer records.
+                    with self._lock:
+                        self._pending[:0] = pending[start:]
+                if start:
+                    self.commits += 1
+                    self.committed += start
+
+    def _commit(self, pending: List[Tuple], start: int) -> int:
+        """
+        Writes records from `start` into the current segment; returns where it stopped.
+        The log write is the commit point. After any failure the segment is
+        recovered before the next write.
+        """
+        log_path = self._file(self._segment, LOG_SUFFIX)
+        size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if size >= self.segment_bytes:
+            self._segment += 1
+            log_path, size = self._file(self._segment, LOG_SUFFIX), 0
+        block_count = os.path.getsize(self._file(self._segment, BLOCKS_SUFFIX)) // BLOCK_DTYPE.itemsize \
+            if os.path.exists(self._file(self._segment, BLOCKS_SUFFIX)) else 0
+
+        frames, blocks, users = [], [], []
+        offset = size
+        stop = start
+        while stop < len(pending) and offset < self.segment_bytes:
+            chunk = pending[stop:stop + BLOCK_RECORDS]
+            block_start = offset
+            keys = set()
+            for ts, user, route, capability, tools, cost, latency, query, error in chunk:
+                payload = json.dumps({
+                    "ts": ts, "user": user, "route": route, "capability": capability, "tools": list(tools),
+                    "cost": cost, "latency_ms": round(latency * 1000, 3), "query": str(query or "")[:QUERY_CHARS], "error": error,
+                }, separators=(",", ":")).encode()
+                frames.append(FRAME.pack(len(payload), zlib.crc32(payload), ts))
+                frames.append(payload)
+                offset += FRAME.size + len(payload)
+                keys.add(user_key(user))
+            index = block_count + len(blocks)
+            blocks.append((block_start, offset - block_start, len(chunk), chunk[0][0], chunk[-1][0]))
+            users.extend((key, index) for key in sorted(keys))
+            stop += len(chunk)
+
+        try:
+            with open(log_path, "ab") as f:
+                f.write(b"".join(frames))
+                f.flush()
+                if self.fsync:
+                    os.fsync(f.fileno())
+        except BaseException:
+            # Undo the write so the retry cannot duplicate records; recovery
+            # truncates whatever torn tail remains.
+            self._segment = None
+            try:
+                os.truncate(log_path, size)
+            except OSError:
+                pass
+            raise
+        try:
+            with open(self._file(self._segment, BLOCKS_SUFFIX), "ab") as f:
+                f.write(np.array(blocks, dtype=BLOCK_DTYPE).tobytes())
+            with open(self._file(self._segment, USERS_SUFFIX), "ab") as f:
+                f.write(np.array(users, dtype=USER_DTYPE).tobytes())
+        except OSError:
+            # The records are durable; recovery rebuilds the indexes from the log.
+            self._segment = None
+        return stop
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    # -- read path --------------------------------------------------------
+
+    def _load(self, directory: str, segment: int, suffix: str, dtype: np.dtype) -> np.ndarray:
+        path = self._file(segment, suffix, directory)
+        if not os.path.exists(path):
+            return np.zeros(0, dtype=dtype)
+        data = np.fromfile(path, dtype=np.uint8)
+        # A reader may catch an index mid-append; drop the partial row.
+        return data[:len(data) // dtype.itemsize * dtype.itemsize].view(dtype)
+
+    def history(
+        self,
+        user_id: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Committed records, newest first, optionally for one user and/or with
+        since <= ts < until. Only blocks the sparse indexes select are read.
+        """
+        directories = self._directories()
+        streams = [self._history(directory, user_id, since, until, limit) for directory in directories]
+        if len(streams) == 1:
+            yield from streams[0]
+            return
+        # Each partition is newest first; merge them into one timeline.
+        merged = heapq.merge(*streams, key=lambda record: record["ts"], reverse=True)
+        for count, record in enumerate(merged, 1):
+            yield record
+            if limit is not None and count >= limit:
+                return
+
+    def _history(
+        self,
+        directory: str,
+        user_id: Optional[str],
+        since: Optional[float],
+        until: Optional[float],
+        limit: Optional[int],
+    ) -> Iterator[Dict[str, Any]]:
+        """`history` for the segments in one directory."""
+        key = user_key(user_id) if user_id is not None else None
+        # Payloads are compact JSON, so most non-matching records are skipped undecoded.
+        needle = b'"user":' + json.dumps(user_id).encode() + b"," if user_id is not None else b""
+        remaining = limit
+        for segment in reversed(self.segments(directory)):
+            # Commits append blocks before users, so with users read first every
+            # block they name is already on disk when blocks are read.
+            users = self._load(directory, segment, USERS_SUFFIX, USER_DTYPE) if key is not None else None
+            blocks = self._load(directory, segment, BLOCKS_SUFFIX, BLOCK_DTYPE)
+            if since is not None and len(blocks) and blocks["max_ts"][-1] < since:
+                break  # older segments end earlier still
+            selected = np.ones(len(blocks), dtype=bool)
+            if since is not None:
+                selected &= blocks["max_ts"] >= since
+            if until is not None:
+                selected &= blocks["min_ts"] < until
+            if users is not None and selected.any():
+                rows = users["block"][users["user"] == np.uint64(key)]
+                member = np.zeros(len(blocks), dtype=bool)
+                member[rows[rows < len(blocks)]] = True
+                selected &= member
+            indices = np.flatnonzero(selected)
+            if not len(indices):
+                continue
+            with open(self._file(segment, LOG_SUFFIX, directory), "rb") as f:
+                for index in indices[::-1]:
+                    block = blocks[index]
+                    f.seek(int(block["offset"]))
+                    frames = list(_frames(f.read(int(block["size"]))))
+                    for _, ts, payload in reversed(frames):
+                        if (since is not None and ts < since) or (until is not None and ts >= until):
+                            continue
+                        if needle not in payload:
+                            continue
+                        record = json.loads(payload)
+                        if user_id is not None and record["user"] != user_id:
+                            continue
+                        yield record
+                        if remaining is not None:
+                            remaining -= 1
+                            if remaining <= 0:
+                                return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "segments": len(self.segments()),
+            "pending": pending,
+            "recorded": self.recorded,
+            "committed": self.committed,
+            "commits": self.commits,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
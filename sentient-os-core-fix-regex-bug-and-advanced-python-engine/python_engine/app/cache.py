@@ -0,0 +1,188 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_TTL = float(os.environ.get("AEOS_CACHE_TTL", "5.0"))
+DEFAULT_MAX_BYTES = int(os.environ.get("AEOS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Fixed per-entry overhead added to the payload estimate (dict, key, bookkeeping).
+ENTRY_OVERHEAD = 256
+
+_MISSING = object()
+
+
+def estimate_size(value: Any) -> int:
+    """Rough byte size of a division result, used for the memory cap."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(k) + estimate_size(v) for k, v in value.items()) + 64
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value) + 16
+    return 8
+
+
+class ResponseCache:
+    """
+    Bounded TTL/LRU cache for division results.
+    Entries expire after `ttl` seconds; when the estimated payload exceeds
+    `max_bytes` the least recently used entries are evicted. Concurrent misses
+    on the same key share one computation (single-flight), both for threads
+    (`get_or_compute`) and for coroutines (`aget_or_compute`).
+
+    With `shared` (a SharedCache, in the preforked server), local misses fall
+    through to memory shared by every worker, and stored results are published
+    there with the same expiry.
+    """
+    def __init__(self, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES, shared=None):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = ttl > 0 and max_bytes > 0
+        self.shared = shared
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight_threads: Dict[Hashable, threading.Event] = {}
+        self._inflight_tasks: Dict[Hashable, asyncio.Future] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._get_locked(key)
+        return default if value is _MISSING else value
+
+    def _get_locked(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return self._get_shared_locked(key)
+        expires_at, size, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self._bytes -= size
+            self.expirations += 1
+            return self._get_shared_locked(key)
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _get_shared_locked(self, key: Hashable) -> Any:
+        """Copies a result another worker stored into this cache, keeping its expiry."""
+        found = self.shared.get(key) if self.shared is not None else None
+        if found is None:
+            return _MISSING
+        value, expires_at = found
+        self._store_locked(key, value, expires_at, estimate_size(value) + ENTRY_OVERHEAD)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        size = estimate_size(value) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            self._store_locked(key, value, expires_at, size)
+        if self.shared is not None:
+            self.shared.put(key, value, expires_at)
+
+    def _store_locked(self, key: Hashable, value: Any, expires_at: float, size: int):
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[1]
+        self._entries[key] = (expires_at, size, value)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Thread-safe lookup; on a miss only one thread runs `compute` per key."""
+        if not self.enabled:
+            return compute()
+        while True:
+            with self._lock:
+                value = self._get_locked(key)
+                if value is not _MISSING:
+                    return value
+                event = self._inflight_threads.get(key)
+                if event is None:
+                    event = threading.Event()
+                    self._inflight_threads[key] = event
+                    self.misses += 1
+                    break
+                self.coalesced += 1
+            # Another thread is computing this key; wait, then re-check. If the
+            # leader failed, the loop makes this thread the next leader.
+            event.wait()
+
+        try:
+            value = compute()
+            self.put(key, value)
+            return value
+        finally:
+            with self._lock:
+                del self._inflight_threads[key]
+            event.set()
+
+    async def aget_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Coroutine lookup; on a miss one task computes the value and every
+        concurrent caller awaits it. Cancelling a waiter (e.g. a step timeout)
+        does not cancel the shared computation.
+        """
+        if not self.enabled:
+            return await compute()
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        task = self._inflight_tasks.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, compute))
+            # Mark a failure as retrieved even if every waiter has gone away.
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight_tasks[key] = task
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fill(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            value = await compute()
+            self.put(key, value)
+            return value
+        finally:
+            del self._inflight_tasks[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "ttl_seconds": self.ttl,
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
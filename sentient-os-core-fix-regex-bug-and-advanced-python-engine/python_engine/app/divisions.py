@@ -1,132 +1,536 @@
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Any, FrozenSet, Iterable, Optional, Tuple
+import asyncio
+import multiprocessing
 import random
+import re
+import signal
+import sys
+import time
+
+from app.routing import KeywordMatcher, route_intent, capability_intent
+from app.sentiment import SENTIMENT
+from app.tools import AGENT_WALLET, TOOL_REGISTRY, ComplianceTool
+
+# Shared pool that runs synchronous division logic off the event loop.
+DIVISION_EXECUTOR = ThreadPoolExecutor(thread_name_prefix="aeos-division")
+
+# Forked processes that run CPU-bound division steps, when started with
+# `start_process_pool`, and the divisions they were forked with, by code.
+PROCESS_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_DIVISIONS: Dict[str, "AEOSDivision"] = {}
+
+def _init_pool_process():
+    # The parent handles interrupts and shuts the pool down.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    TOOL_REGISTRY.after_fork()
+
+def _process_in_pool(code: str, query: str, intents: FrozenSet[str],
+                     context: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _POOL_DIVISIONS[code].process(query, intents, context)
+
+def start_process_pool(processes: int, divisions: Iterable["AEOSDivision"]) -> ProcessPoolExecutor:
+    """
+    Runs the CPU-bound steps of `divisions` (see `AEOSDivision.cpu_bound`) in
+    `processes` forked processes, so they use other cores instead of holding
+    the GIL of the process serving requests. Start it before any other thread:
+    the processes are forked here, sharing the divisions' loaded data.
+    """
+    global PROCESS_POOL
+    _POOL_DIVISIONS.update((division.code, division) for division in divisions)
+    PROCESS_POOL = ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("fork"),
+                                       initializer=_init_pool_process)
+    # The first submission forks every process of the pool.
+    PROCESS_POOL.submit(int).result()
+    return PROCESS_POOL
+
+# Keys of a tool_usage entry, in response order.
+TOOL_FIELDS = ("tool", "input", "output")
+
+def result_template(cost: float, response: str, tool: Optional[Tuple[str, str, str]] = None,
+                    logs: Tuple[str, ...] = ()) -> Dict[str, Any]:
+    """
+    A fixed division result, built once and returned as-is by every call.
+    Sequences are tuples and strings are interned, so all requests share one
+    copy. Division results are read-only downstream; the response cache
+    already hands the same dict to every hit.
+    """
+    return {
+        "response": sys.intern(response),
+        "tool_usage": (dict(zip(TOOL_FIELDS, map(sys.intern, tool))),) if tool else (),
+        "logs": tuple(map(sys.intern, logs)),
+        "cost": cost,
+    }
 
 class AEOSDivision:
+    # Declarative keyword tables, compiled into the orchestrator's router.
+    # `route_keywords` select the division; `branches` select a sub-capability
+    # and are evaluated in declaration order.
+    code: str = ""
+    route_keywords: Tuple[str, ...] = ()
+    branches: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+    # Capabilities whose results must never be served from the response cache.
+    uncacheable_capabilities: FrozenSet[str] = frozenset()
+    # Cost charged per processed query.
+    cost: float = 0.0
+    # Fixed results per capability (None when no capability matched), from
+    # `result_template`. Capabilities with live data are computed per call.
+    templates: Dict[Optional[str], Dict[str, Any]] = {}
+
     def __init__(self, name: str, capabilities: List[str]):
         self.name = name
         self.capabilities = capabilities
+        self.matcher = KeywordMatcher(self.intent_table())
+
+    @classmethod
+    def intent_table(cls) -> Dict[str, Tuple[str, ...]]:
+        table = {route_intent(cls.code): cls.route_keywords}
+        for capability, keywords in cls.branches:
+            table[capability_intent(cls.code, capability)] = keywords
+        return table
+
+    def match(self, query: str) -> FrozenSet[str]:
+        return self.matcher.match(query)
+
+    def select_capability(self, intents: FrozenSet[str]) -> Optional[str]:
+        """Returns the first declared branch whose keywords matched, if any."""
+        for capability, _ in self.branches:
+            if capability_intent(self.code, capability) in intents:
+                return capability
+        return None
+
+    def cache_key(self, query: str, intents: FrozenSet[str],
+                  context: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, ...]]:
+        """
+        Key under which this division's result may be cached, or None when the
+        result is uncacheable. Results depend only on the selected capability.
+        """
+        capability = self.select_capability(intents)
+        if capability in self.uncacheable_capabilities:
+            return None
+        return (self.code, capability or "")
 
     def can_handle(self, query: str) -> bool:
         raise NotImplementedError
 
-    def process(self, query: str) -> Dict[str, Any]:
+    def process(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         raise NotImplementedError
 
+    def cpu_bound(self, intents: FrozenSet[str]) -> bool:
+        """Whether processing these intents is heavy compute rather than I/O or a template."""
+        return False
+
+    async def aprocess(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                       context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Async division protocol. Divisions with native async I/O override this;
+        synchronous divisions are offloaded to the division thread pool so a slow
+        step never stalls the event loop, and CPU-bound steps to the process
+        pool when one is running.
+        """
+        loop = asyncio.get_running_loop()
+        if PROCESS_POOL is not None and _POOL_DIVISIONS.get(self.code) is self:
+            if intents is None:
+                intents = self.match(query)
+            if self.cpu_bound(intents):
+                return await loop.run_in_executor(PROCESS_POOL, _process_in_pool, self.code, query, intents, context)
+        return await loop.run_in_executor(DIVISION_EXECUTOR, self.process, query, intents, context)
+
 class EarthIntelligenceDivision(AEOSDivision):
-    def __init__(self):
+    code = "EID"
+    cost = 0.02
+    route_keywords = ("weather", "climate", "satellite", "disaster", "planet", "venus", "mars")
+    branches = (
+        ("planetary", ("planetary", "monitor")),
+        ("weather", ("weather",)),
+        ("satellite", ("satellite", "uplink")),
+        ("disaster", ("disaster", "forecast")),
+    )
+
+    # Capabilities computed from the raster dataset, when one is installed.
+    raster_capabilities = frozenset({"weather", "disaster"})
+
+    templates = {
+        "planetary": result_template(
+            cost,
+            "PLANETARY MONITORING REPORT:\n"
+            "• VENUS: Atmospheric pressure nominal. Probe V-9 active.\n"
+            "• MARS: Terraforming sim running. Colony Alpha supports life.\n"
+            "• JUPITER: Storm tracking on Great Red Spot. Radiation levels high.\n"
+            "• MOON: Lunar Gateway operational. Helium-3 mining optimized.",
+            ("Deep Space Relay", "Solar System Scan", "Data Received"),
+            logs=("Aggregating data from deployed AI probes.",),
+        ),
+        "weather": result_template(
+            cost,
+            "GLOBAL WEATHER MATRIX:\n"
+            "• NORTH AMERICA: Polar Vortex stabilizing. Temp -5°C.\n"
+            "• APAC: Monsoon season early warning. Rainfall +20%.\n"
+            "• EMEA: Heatwave detected in Southern Sector. Grid load 95%.\n"
+            "• LATAM: Amazon humidity levels optimal for regeneration.",
+            ("Global Atmos Scan", "Multi-Region", "Map Generated"),
+        ),
+        "satellite": result_template(
+            cost,
+            "SATELLITE CONSTELLATION STATUS:\n"
+            "• SAT-1 (Optics): 100% Uptime. Resolution 50cm.\n"
+            "• SAT-2 (Radar): Tracking maritime logistics in Pacific.\n"
+            "• SAT-3 (Comms): Relaying secure Masumi Block data.\n"
+            "• SAT-4 (Infrared): Wildfire detection active in Sector 4.",
+            ("Orbital Feed", "Constellation Link", "Connected"),
+        ),
+        "disaster": result_template(
+            cost,
+            "DISASTER FORECAST SYSTEM:\n"
+            "• FLOOD: Critical Risk in Delta Region. Probability 89%.\n"
+            "• FIRE: High Risk in California Sector. Drone Swarm deployed.\n"
+            "• QUAKE: Minor tremors detected in Ring of Fire. Mag 2.3.\n"
+            "• STORM: Category 1 Cyclone forming in Atlantic.",
+            ("Risk Prediction Model", "Seismic Sensors", "Alert"),
+        ),
+        None: result_template(cost, "EID is online. Select a specific capability for detailed analysis."),
+    }
+
+    def __init__(self, raster_dir: Optional[str] = None):
         super().__init__(
             "EID - Earth Intelligence",
             ["Planetary Monitoring", "Weather Analysis", "Satellite Uplink", "Disaster Forecast"]
         )
+        from app.raster import DEFAULT_RASTER_DIR, RasterStore
+
+        self.raster = RasterStore.open(raster_dir or DEFAULT_RASTER_DIR)
+
+    def region(self, query: str, context: Optional[Dict[str, Any]] = None):
+        """(label, bbox) named by the query or context, when raster data is available."""
+        if self.raster is None:
+            return None
+        from app.raster import resolve_region
+
+        return resolve_region(query, context)
+
+    def assess(self, query: str, context: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Computed risk scores for the query's region, or None without data or region."""
+        region = self.region(query, context)
+        if region is None:
+            return None
+        label, bbox = region
+        return dict(self.raster.assess(bbox), region=label)
+
+    def cache_key(self, query: str, intents: FrozenSet[str],
+                  context: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, ...]]:
+        """Raster-backed results also depend on the region."""
+        key = super().cache_key(query, intents, context)
+        if key is not None and key[1] in self.raster_capabilities:
+            region = self.region(query, context)
+            if region is not None:
+                key += (region[0],)
+        return key
 
     def can_handle(self, query: str) -> bool:
         return True # Orchestrator handles routing primarily
 
-    def process(self, query: str) -> Dict[str, Any]:
-        query_lower = query.lower()
-        tools = []
-        logs = []
-        response = ""
-
-        if "planetary" in query_lower or "monitor" in query_lower:
-             tools.append({"tool": "Deep Space Relay", "input": "Solar System Scan", "output": "Data Received"})
-             logs.append("Aggregating data from deployed AI probes.")
-             response = (
-                 "PLANETARY MONITORING REPORT:\n"
-                 "• VENUS: Atmospheric pressure nominal. Probe V-9 active.\n"
-                 "• MARS: Terraforming sim running. Colony Alpha supports life.\n"
-                 "• JUPITER: Storm tracking on Great Red Spot. Radiation levels high.\n"
-                 "• MOON: Lunar Gateway operational. Helium-3 mining optimized."
-             )
-        elif "weather" in query_lower:
-             tools.append({"tool": "Global Atmos Scan", "input": "Multi-Region", "output": "Map Generated"})
-             response = (
-                 "GLOBAL WEATHER MATRIX:\n"
-                 "• NORTH AMERICA: Polar Vortex stabilizing. Temp -5°C.\n"
-                 "• APAC: Monsoon season early warning. Rainfall +20%.\n"
-                 "• EMEA: Heatwave detected in Southern Sector. Grid load 95%.\n"
-                 "• LATAM: Amazon humidity levels optimal for regeneration."
-             )
-        elif "satellite" in query_lower or "uplink" in query_lower:
-             tools.append({"tool": "Orbital Feed", "input": "Constellation Link", "output": "Connected"})
-             response = (
-                 "SATELLITE CONSTELLATION STATUS:\n"
-                 "• SAT-1 (Optics): 100% Uptime. Resolution 50cm.\n"
-                 "• SAT-2 (Radar): Tracking maritime logistics in Pacific.\n"
-                 "• SAT-3 (Comms): Relaying secure Masumi Block data.\n"
-                 "• SAT-4 (Infrared): Wildfire detection active in Sector 4."
-             )
-        elif "disaster" in query_lower or "forecast" in query_lower:
-             tools.append({"tool": "Risk Prediction Model", "input": "Seismic Sensors", "output": "Alert"})
-             response = (
-                 "DISASTER FORECAST SYSTEM:\n"
-                 "• FLOOD: Critical Risk in Delta Region. Probability 89%.\n"
-                 "• FIRE: High Risk in California Sector. Drone Swarm deployed.\n"
-                 "• QUAKE: Minor tremors detected in Ring of Fire. Mag 2.3.\n"
-                 "• STORM: Category 1 Cyclone forming in Atlantic."
-             )
-        else:
-            response = "EID is online. Select a specific capability for detailed analysis."
-
-        return {"response": response, "tool_usage": tools, "logs": logs, "cost": 0.02}
+    def cpu_bound(self, intents: FrozenSet[str]) -> bool:
+        return self.raster is not None and self.select_capability(intents) in self.raster_capabilities
+
+    def process(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if intents is None:
+            intents = self.match(query)
+        capability = self.select_capability(intents)
+        if capability == "weather" and self.raster is not None:
+            tools = []
+            response = self._weather_matrix(query, context, tools)
+            return {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost}
+        risk = self.assess(query, context) if capability == "disaster" else None
+        if risk is not None:
+            tools = []
+            response = self._disaster_report(risk, tools)
+            return {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost, "risk": risk}
+        return self.templates[capability]
+
+    def _weather_matrix(self, query: str, context: Optional[Dict[str, Any]], tools: List[Dict[str, Any]]) -> str:
+        from app.raster import REGIONS, WEATHER_REGIONS
+
+        region = self.region(query, context)
+        regions = [region] if region else [(name, REGIONS[name]) for name in WEATHER_REGIONS]
+        lines = ["GLOBAL WEATHER MATRIX:"]
+        for label, bbox in regions:
+            stats = self.raster.assess(bbox)
+            parts = []
+            if "rainfall_mm" in stats:
+                parts.append(f"Rainfall {stats['rainfall_mm']:.1f} mm/day.")
+            if "temperature_c" in stats:
+                parts.append(f"Temp {stats['temperature_c']:.1f}°C (max {stats['temperature_max_c']:.1f}°C).")
+            if "heatwave_load" in stats:
+                parts.append(f"Heatwave load {stats['heatwave_load']:.0%}.")
+            lines.append(f"• {label.upper()}: " + (" ".join(parts) or "No data."))
+        tools.append({"tool": "Raster Weather Engine", "input": ", ".join(label for label, _ in regions), "output": "Map Generated"})
+        return "\n".join(lines)
+
+    @staticmethod
+    def _disaster_report(risk: Dict[str, Any], tools: List[Dict[str, Any]]) -> str:
+        lines = [f"DISASTER FORECAST SYSTEM ({risk['region'].upper()}):"]
+        if "flood_probability" in risk:
+            lines.append(
+                f"• FLOOD: Probability {risk['flood_probability']:.0%}. "
+                f"Rainfall {risk['rainfall_mm']:.1f} mm/day, mean elevation {risk['elevation_m']:.0f} m."
+            )
+        if "fire_risk" in risk:
+            lines.append(f"• FIRE: High risk on {risk['fire_high_share']:.0%} of the area. Mean index {risk['fire_risk']:.2f}.")
+        if "heatwave_load" in risk:
+            lines.append(f"• HEAT: Heatwave load {risk['heatwave_load']:.0%}. Peak {risk['temperature_max_c']:.1f}°C.")
+        if len(lines) == 1:
+            lines.append("• No raster coverage for this region.")
+        tools.append({"tool": "Raster Risk Engine", "input": risk["region"], "output": f"{risk['pixels']} pixels"})
+        return "\n".join(lines)
 
 class EnterpriseIntelligenceDivision(AEOSDivision):
+    code = "ENID"
+    cost = 0.015
+    route_keywords = ("marketing", "workflow", "compliance", "audit", "kyc")
+    branches = (
+        ("marketing", ("marketing",)),
+        ("workflow", ("workflow",)),
+        ("compliance", ("compliance", "kyc")),
+        ("audit", ("audit",)),
+    )
+
+    templates = {
+        "marketing": result_template(
+            cost,
+            "MARKETING OPERATIONS CENTER:\n"
+            "• EMAIL: Open rate 24%. A/B test 'Subject Line B' winning.\n"
+            "• SOCIAL: Viral trend detected on Twitter. Auto-replying.\n"
+            "• SEO: Ranking #1 for 'AI OS'. Traffic +15% WoW.\n"
+            "• ADS: CPA reduced by 12% via autonomous bid optimization.",
+            ("Campaign Manager", "Multi-Channel", "Active"),
+        ),
+        "workflow": result_template(
+            cost,
+            "WORKFLOW AUTOMATION METRICS:\n"
+            "• HR: Onboarding time reduced from 5 days to 4 hours.\n"
+            "• PROCUREMENT: Supplier invoices auto-paid via smart contract.\n"
+            "• IT: 45 support tickets resolved by Level 1 AI Agent.\n"
+            "• SALES: CRM updated with 200 new leads from web scraper.",
+            ("Process Miner", "Corporate Logs", "Optimized"),
+        ),
+        "compliance": result_template(
+            cost,
+            "COMPLIANCE & IDENTITY SHIELD:\n"
+            "• KYC: User ID verified against Interpol database.\n"
+            "• AML: No suspicious transaction patterns detected.\n"
+            "• GDPR: Data privacy request processed automatically.\n"
+            "• SANCTIONS: Wallet address clean across 15 jurisdictions.",
+            ("RegTech Scanner", "Global Database", "Verified"),
+        ),
+        "audit": result_template(
+            cost,
+            "SMART AUDIT LOGS:\n"
+            "• TX-882: Treasury payout confirmed. Block #99281.\n"
+            "• AUTH: Admin login via DID at 14:02 UTC.\n"
+            "• DATA: EID accessed sensitive satellite feed. Authorized.\n"
+            "• CONFIG: Policy update deployed to ENID-Core.",
+            ("Ledger Verifier", "Cardano Chain", "Synced"),
+        ),
+        None: result_template(cost, "ENID is online. Select a capability to view enterprise metrics."),
+    }
+
     def __init__(self):
         super().__init__(
             "ENID - Enterprise Intelligence",
             ["Workflow Automation", "Marketing GenAI", "Compliance & KYC", "Smart Audit"]
         )
+        # The orchestrator's audit log, attached by the orchestrator; None disables audit reports.
+        self.audit = None
+
+    def audit_log(self):
+        """The orchestrator's audit log, or None when it keeps none."""
+        return self.audit
+
+    @staticmethod
+    def screener():
+        """The shared sanctions screener, or None when no lists are installed."""
+        return TOOL_REGISTRY.backend(ComplianceTool).screener
+
+    def cache_key(self, query: str, intents: FrozenSet[str],
+                  context: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, ...]]:
+        """
+        Screening results also depend on the subjects and the list version;
+        audit history changes with every request, so it is never cached.
+        """
+        key = super().cache_key(query, intents, context)
+        if key is not None and key[1] == "audit" and self.audit_log() is not None:
+            return None
+        if key is not None and key[1] == "compliance":
+            screener = self.screener()
+            if screener is not None:
+                key += (f"v{screener.version}",) + tuple(screening_subjects(query, context))
+        return key
 
     def can_handle(self, query: str) -> bool:
         return True
 
-    def process(self, query: str) -> Dict[str, Any]:
-        query_lower = query.lower()
-        tools = []
-        response = ""
-
-        if "marketing" in query_lower:
-             tools.append({"tool": "Campaign Manager", "input": "Multi-Channel", "output": "Active"})
-             response = (
-                 "MARKETING OPERATIONS CENTER:\n"
-                 "• EMAIL: Open rate 24%. A/B test 'Subject Line B' winning.\n"
-                 "• SOCIAL: Viral trend detected on Twitter. Auto-replying.\n"
-                 "• SEO: Ranking #1 for 'AI OS'. Traffic +15% WoW.\n"
-                 "• ADS: CPA reduced by 12% via autonomous bid optimization."
-             )
-        elif "workflow" in query_lower:
-             tools.append({"tool": "Process Miner", "input": "Corporate Logs", "output": "Optimized"})
-             response = (
-                 "WORKFLOW AUTOMATION METRICS:\n"
-                 "• HR: Onboarding time reduced from 5 days to 4 hours.\n"
-                 "• PROCUREMENT: Supplier invoices auto-paid via smart contract.\n"
-                 "• IT: 45 support tickets resolved by Level 1 AI Agent.\n"
-                 "• SALES: CRM updated with 200 new leads from web scraper."
-             )
-        elif "compliance" in query_lower or "kyc" in query_lower:
-             tools.append({"tool": "RegTech Scanner", "input": "Global Database", "output": "Verified"})
-             response = (
-                 "COMPLIANCE & IDENTITY SHIELD:\n"
-                 "• KYC: User ID verified against Interpol database.\n"
-                 "• AML: No suspicious transaction patterns detected.\n"
-                 "• GDPR: Data privacy request processed automatically.\n"
-                 "• SANCTIONS: Wallet address clean across 15 jurisdictions."
-             )
-        elif "audit" in query_lower:
-             tools.append({"tool": "Ledger Verifier", "input": "Cardano Chain", "output": "Synced"})
-             response = (
-                 "SMART AUDIT LOGS:\n"
-                 "• TX-882: Treasury payout confirmed. Block #99281.\n"
-                 "• AUTH: Admin login via DID at 14:02 UTC.\n"
-                 "• DATA: EID accessed sensitive satellite feed. Authorized.\n"
-                 "• CONFIG: Policy update deployed to ENID-Core."
-             )
-        else:
-            response = "ENID is online. Select a capability to view enterprise metrics."
-
-        return {"response": response, "tool_usage": tools, "logs": [], "cost": 0.015}
+    def cpu_bound(self, intents: FrozenSet[str]) -> bool:
+        return self.select_capability(intents) == "compliance" and self.screener() is not None
+
+    def process(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if intents is None:
+            intents = self.match(query)
+        capability = self.select_capability(intents)
+        screener = self.screener() if capability == "compliance" else None
+        if screener is not None:
+            tools = []
+            response, blocked = self._screening_report(screening_subjects(query, context), screener, tools)
+            result = {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost}
+            if blocked:
+                result["blocked"] = blocked
+            return result
+        if capability == "audit" and self.audit_log() is not None:
+            tools = []
+            response = self._audit_report(query, context, tools)
+            return {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost}
+        return self.templates[capability]
+
+    def _audit_report(self, query: str, context: Optional[Dict[str, Any]], tools: List[Dict[str, Any]]) -> str:
+        """
+        The requester's newest audit records, optionally within a time window.
+        Requests without a requester see no records.
+        """
+        user_id = (context or {}).get(REQUESTER_FIELD)
+        since, window = None, None
+        match = AUDIT_WINDOW_PATTERN.search(query)
+        if match:
+            count, unit = int(match.group(1)), match.group(2).lower()[0]
+            since, window = time.time() - count * AUDIT_WINDOW_UNITS[unit], f"last {count}{unit}"
+        records = list(self.audit_log().history(user_id=user_id, since=since, limit=AUDIT_LINES)) if user_id else []
+
+        scope = ", ".join(part for part in (f"user {user_id}" if user_id else None, window) if part)
+        lines = [f"SMART AUDIT LOGS ({scope}):" if scope else "SMART AUDIT LOGS:"]
+        for record in records:
+            when = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(record["ts"]))
+            route = record["route"] + (f"/{record['capability']}" if record["capability"] else "")
+            outcome = f"ERROR {record['error']}" if record["error"] else f"cost {record['cost']:.3f}"
+            tool_names = f" [{', '.join(record['tools'])}]" if record["tools"] else ""
+            lines.append(f"• {when} UTC {record['user']}: {route or 'unrouted'}{tool_names} {outcome}, {record['latency_ms']:.1f} ms.")
+        if not records:
+            lines.append("• No audit records match.")
+        tools.append({"tool": "Audit Log", "input": scope or "all", "output": f"{len(records)} records"})
+        return "\n".join(lines)
+
+    @staticmethod
+    def _screening_report(subjects: List[str], screener, tools: List[Dict[str, Any]]):
+        """Screens `subjects`; returns the report and the block reason, if any."""
+        stats = screener.stats()
+        matches = screener.screen_all(subjects)
+        lines = ["COMPLIANCE & IDENTITY SHIELD:"]
+        if not subjects:
+            lines.append("• SANCTIONS: No user id or wallet address in the request to screen.")
+        elif not matches:
+            lines.append(
+                f"• SANCTIONS: {len(subjects)} subject(s) clean against {stats['entries']:,} entries "
+                f"on {len(stats['lists'])} list(s)."
+            )
+        for match in matches:
+            lines.append(
+                f"• SANCTIONS: MATCH for {match['subject']} on {match['list']} "
+                f"({match['name']}, {match['match']} score {match['score']:.2f})."
+            )
+        tools.append({"tool": "Sanctions Screener", "input": ", ".join(subjects) or "none",
+                      "output": "Match" if matches else "Clear"})
+        blocked = None
+        if matches:
+            blocked = "sanctions match for " + ", ".join(sorted({match["subject"] for match in matches}))
+        return "\n".join(lines), blocked
+
+# "audit last 2 hours"
+AUDIT_WINDOW_PATTERN = re.compile(r"\blast\s+(\d+)\s*(m|min|minutes?|h|hours?|d|days?)\b", re.IGNORECASE)
+AUDIT_WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400}
+# Audit records shown per report, newest first.
+AUDIT_LINES = 10
+
+# "send 50 ADA to bob", "pay 12.5 djed to addr1_merchant"
+TRANSFER_PATTERN = re.compile(r"(\d+(?:\.\d+)?)\s*([a-z]+)\s+to\s+([\w-]+)", re.IGNORECASE)
+# Cardano-style wallet addresses mentioned anywhere in a query.
+ADDRESS_PATTERN = re.compile(r"\baddr(?:_test)?1\w+", re.IGNORECASE)
+# Context field holding the authenticated requester (AgentRequest.user_id).
+# Only the orchestrator sets it, see `with_requester`.
+REQUESTER_FIELD = "requester"
+# Request context fields naming a party to screen; the requester always is.
+SCREENING_CONTEXT_FIELDS = (REQUESTER_FIELD, "user_id", "wallet", "counterparty", "name")
+
+def with_requester(context: Optional[Dict[str, Any]], user_id: Optional[str]) -> Dict[str, Any]:
+    """Division context for a request by `user_id`; a client-supplied requester field is dropped."""
+    context = dict(context or {})
+    context.pop(REQUESTER_FIELD, None)
+    if user_id:
+        context[REQUESTER_FIELD] = user_id
+    return context
+
+def screening_subjects(query: str, context: Optional[Dict[str, Any]] = None) -> List[str]:
+    """Parties to screen: the requester, context fields, wallet addresses and the transfer recipient."""
+    subjects = [str(context[field]) for field in SCREENING_CONTEXT_FIELDS if context and context.get(field)]
+    subjects += ADDRESS_PATTERN.findall(query)
+    transfer = TRANSFER_PATTERN.search(query)
+    if transfer:
+        subjects.append(transfer.group(3))
+    return list(dict.fromkeys(subjects))
 
 class DeFiTransactionDivision(AEOSDivision):
+    code = "DTAD"
+    cost = 0.03
+    route_keywords = ("yield", "treasury", "risk", "pay", "transaction", "send")
+    branches = (
+        ("yield", ("yield",)),
+        ("treasury", ("treasury",)),
+        ("risk", ("risk",)),
+        ("payments", ("pay", "transaction")),
+    )
+    # Payments move funds and must always execute.
+    uncacheable_capabilities = frozenset({"payments"})
+
+    templates = {
+        "yield": result_template(
+            cost,
+            "YIELD FARMING OPPORTUNITIES:\n"
+            "• ADA/MIN: 12.5% APY. Low impermanent loss risk.\n"
+            "• ADA/AGIX: 8.2% APY. High volume pool.\n"
+            "• STABLE/ADA: 4.5% APY. Safe haven allocation.\n"
+            "• LENDING: Supply rate 3.1% on Liqwid Protocol.",
+            ("Liquidity Scanner", "DEX Aggregator", "Found"),
+        ),
+        "treasury": result_template(
+            cost,
+            "TREASURY ALLOCATION:\n"
+            "• NATIVE (ADA): 60% - Staked for network security.\n"
+            "• STABLES: 25% - Dry powder for dips.\n"
+            "• GOVERNANCE: 10% - Voting power in partner DAOs.\n"
+            "• RWA: 5% - Tokenized real estate bonds.",
+            ("Asset Manager", "DAO Vault", "Balanced"),
+        ),
+        "risk": result_template(
+            cost,
+            "RISK ASSESSMENT PROFILE:\n"
+            "• CREDIT SCORE: 850 (Excellent). Eligible for under-collateral loans.\n"
+            "• VOLATILITY: Portfolio Beta 0.85 (Lower than market).\n"
+            "• LIQUIDATION: Health factor 2.4. Safe from margin calls.\n"
+            "• DIVERSIFICATION: High. Exposure to 12 asset classes.",
+            ("Credit Engine", "Wallet Graph", "Scored"),
+        ),
+        # Payment requests without a parseable transfer show recent activity.
+        "payments": result_template(
+            cost,
+            "PAYMENT ACTIVITY LOG:\n"
+            "• SENT: 50 ADA to User-Alice (Settled < 1s).\n"
+            "• RECEIVED: 200 DJED from Merchant-Bob.\n"
+            "• SUBSCRIPTION: Paid 5 ADA for Oracle Feed (Auto-renew).\n"
+            "• PENDING: Multisig approval needed for 10k ADA transfer.",
+            ("Payment Rail", "Hydra Head", "Settled"),
+        ),
+        None: result_template(cost, "DTAD is online. Select a financial capability."),
+    }
+
     def __init__(self):
         super().__init__(
             "DTAD - DeFi & Transactions",
@@ -136,104 +540,137 @@ class DeFiTransactionDivision(AEOSDivision):
     def can_handle(self, query: str) -> bool:
         return True
 
-    def process(self, query: str) -> Dict[str, Any]:
-        query_lower = query.lower()
-        tools = []
-        response = ""
-
-        if "yield" in query_lower:
-             tools.append({"tool": "Liquidity Scanner", "input": "DEX Aggregator", "output": "Found"})
-             response = (
-                 "YIELD FARMING OPPORTUNITIES:\n"
-                 "• ADA/MIN: 12.5% APY. Low impermanent loss risk.\n"
-                 "• ADA/AGIX: 8.2% APY. High volume pool.\n"
-                 "• STABLE/ADA: 4.5% APY. Safe haven allocation.\n"
-                 "• LENDING: Supply rate 3.1% on Liqwid Protocol."
-             )
-        elif "treasury" in query_lower:
-             tools.append({"tool": "Asset Manager", "input": "DAO Vault", "output": "Balanced"})
-             response = (
-                 "TREASURY ALLOCATION:\n"
-                 "• NATIVE (ADA): 60% - Staked for network security.\n"
-                 "• STABLES: 25% - Dry powder for dips.\n"
-                 "• GOVERNANCE: 10% - Voting power in partner DAOs.\n"
-                 "• RWA: 5% - Tokenized real estate bonds."
-             )
-        elif "risk" in query_lower:
-             tools.append({"tool": "Credit Engine", "input": "Wallet Graph", "output": "Scored"})
-             response = (
-                 "RISK ASSESSMENT PROFILE:\n"
-                 "• CREDIT SCORE: 850 (Excellent). Eligible for under-collateral loans.\n"
-                 "• VOLATILITY: Portfolio Beta 0.85 (Lower than market).\n"
-                 "• LIQUIDATION: Health factor 2.4. Safe from margin calls.\n"
-                 "• DIVERSIFICATION: High. Exposure to 12 asset classes."
-             )
-        elif "pay" in query_lower or "transaction" in query_lower:
-             tools.append({"tool": "Payment Rail", "input": "Hydra Head", "output": "Settled"})
-             response = (
-                 "PAYMENT ACTIVITY LOG:\n"
-                 "• SENT: 50 ADA to User-Alice (Settled < 1s).\n"
-                 "• RECEIVED: 200 DJED from Merchant-Bob.\n"
-                 "• SUBSCRIPTION: Paid 5 ADA for Oracle Feed (Auto-renew).\n"
-                 "• PENDING: Multisig approval needed for 10k ADA transfer."
-             )
-        else:
-            response = "DTAD is online. Select a financial capability."
-
-        return {"response": response, "tool_usage": tools, "logs": [], "cost": 0.03}
+    def process(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if intents is None:
+            intents = self.match(query)
+        capability = self.select_capability(intents)
+        transfer = TRANSFER_PATTERN.search(query) if capability == "payments" else None
+        if transfer:
+            tools = []
+            blocked = self._screen(screening_subjects(query, context), tools)
+            if blocked:
+                response = f"PAYMENT BLOCKED:\n• Transfer refused: {blocked}. No funds moved."
+                return {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost, "blocked": blocked}
+            response = self._transfer(*transfer.groups(), tools)
+            return {"response": response, "tool_usage": tools, "logs": [], "cost": self.cost}
+        return self.templates[capability]
+
+    @staticmethod
+    def _screen(subjects: List[str], tools: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        Every transfer screens its parties (requester, recipient, addresses),
+        whether or not the request asked for a compliance check; returns the
+        block reason on a sanctions match. Without installed lists, transfers
+        are not screened.
+        """
+        screener = EnterpriseIntelligenceDivision.screener()
+        if screener is None:
+            return None
+        matches = screener.screen_all(subjects)
+        tools.append({"tool": "Sanctions Screener", "input": ", ".join(subjects) or "none",
+                      "output": "Match" if matches else "Clear"})
+        if not matches:
+            return None
+        return "sanctions match for " + ", ".join(sorted({match["subject"] for match in matches}))
+
+    def _transfer(self, amount: str, asset: str, recipient: str, tools: List[Dict[str, Any]]) -> str:
+        """Executes a transfer from the agent wallet on the settlement engine."""
+        asset = asset.upper()
+        try:
+            receipt = TOOL_REGISTRY.invoke("DeFi Transfer", float(amount), asset, recipient)
+        except ValueError as e:
+            receipt = f"Transfer rejected: {e}."
+        try:
+            balance = TOOL_REGISTRY.invoke("Check Balance", AGENT_WALLET, asset)
+        except ValueError:
+            # Unsupported assets have no ledger, hence no balance.
+            balance = None
+        tools.append({"tool": "Payment Rail", "input": "Hydra Head", "output": receipt})
+        response = f"PAYMENT SUBMITTED:\n• {receipt}"
+        return response if balance is None else f"{response}\n• {balance}"
+
+def voice_report(cost: float, tone: str) -> Dict[str, Any]:
+    return result_template(
+        cost,
+        "VOICE INTERFACE METRICS:\n"
+        "• ACCURACY: 98.2% Word Error Rate.\n"
+        "• LANGUAGE: English (US) detected. Dialect: West Coast.\n"
+        f"• SENTIMENT: {tone} tone analyzed.\n"
+        "• SECURITY: Voiceprint matches User-Admin-01.",
+        ("Voice Biometrics", "Audio Stream", "Secure"),
+    )
 
 class HumanInteractionDivision(AEOSDivision):
+    code = "HID"
+    cost = 0.005
+    route_keywords = ("support", "personal", "ticket", "voice")
+    branches = (
+        ("support", ("support",)),
+        ("personal", ("personal",)),
+        ("tickets", ("ticket", "resol")),
+        ("voice", ("voice",)),
+    )
+
+    templates = {
+        "support": result_template(
+            cost,
+            "ACTIVE SUPPORT SESSIONS:\n"
+            "• USER-1: Requesting API key reset. Handling...\n"
+            "• USER-2: Asking about staking APY. Answered.\n"
+            "• USER-3: Reporting bug in mobile UI. Logged.\n"
+            "• SYSTEM: All agents operating at 99.9% uptime.",
+            ("Chat Engine", "Queue", "Active"),
+        ),
+        "personal": result_template(
+            cost,
+            "USER PERSONALIZATION PROFILE:\n"
+            "• PREFERENCE: Dark Mode, High Density Data.\n"
+            "• INTERESTS: DeFi, Space Tech, Governance.\n"
+            "• ACTIVITY: High frequency trader (Asia Timezone).\n"
+            "• SUGGESTION: Enable 'Pro Mode' for advanced charts.",
+            ("User Graph", "Behavior", "Mapped"),
+        ),
+        "tickets": result_template(
+            cost,
+            "TICKET RESOLUTION STATS:\n"
+            "• OPEN: 3 (Low Priority).\n"
+            "• RESOLVED: 142 today (Auto-closed by AI).\n"
+            "• ESCALATED: 0 requiring human intervention.\n"
+            "• CSAT SCORE: 4.8/5.0 based on recent feedback.",
+            ("Ticket Master", "CRM", "Updated"),
+        ),
+        None: result_template(cost, "HID is online. Select an interaction capability."),
+    }
+    # Voice reports by the sentiment label of the transcript (the query).
+    voice_templates = {
+        "positive": voice_report(cost, "Positive/Upbeat"),
+        "neutral": voice_report(cost, "Calm/Professional"),
+        "negative": voice_report(cost, "Negative/Frustrated"),
+    }
+
     def __init__(self):
         super().__init__(
             "HID - Human Interaction",
             ["24/7 Support", "Personalization", "Ticket Resolution", "Voice Interface"]
         )
 
+    def cache_key(self, query: str, intents: FrozenSet[str],
+                  context: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, ...]]:
+        """Voice reports also depend on the tone of the query."""
+        key = super().cache_key(query, intents, context)
+        if key is not None and key[1] == "voice":
+            key += (SENTIMENT.label(query),)
+        return key
+
     def can_handle(self, query: str) -> bool:
         return True
 
-    def process(self, query: str) -> Dict[str, Any]:
-        query_lower = query.lower()
-        tools = []
-        response = ""
-
-        if "support" in query_lower:
-             tools.append({"tool": "Chat Engine", "input": "Queue", "output": "Active"})
-             response = (
-                 "ACTIVE SUPPORT SESSIONS:\n"
-                 "• USER-1: Requesting API key reset. Handling...\n"
-                 "• USER-2: Asking about staking APY. Answered.\n"
-                 "• USER-3: Reporting bug in mobile UI. Logged.\n"
-                 "• SYSTEM: All agents operating at 99.9% uptime."
-             )
-        elif "personal" in query_lower:
-             tools.append({"tool": "User Graph", "input": "Behavior", "output": "Mapped"})
-             response = (
-                 "USER PERSONALIZATION PROFILE:\n"
-                 "• PREFERENCE: Dark Mode, High Density Data.\n"
-                 "• INTERESTS: DeFi, Space Tech, Governance.\n"
-                 "• ACTIVITY: High frequency trader (Asia Timezone).\n"
-                 "• SUGGESTION: Enable 'Pro Mode' for advanced charts."
-             )
-        elif "ticket" in query_lower or "resol" in query_lower:
-             tools.append({"tool": "Ticket Master", "input": "CRM", "output": "Updated"})
-             response = (
-                 "TICKET RESOLUTION STATS:\n"
-                 "• OPEN: 3 (Low Priority).\n"
-                 "• RESOLVED: 142 today (Auto-closed by AI).\n"
-                 "• ESCALATED: 0 requiring human intervention.\n"
-                 "• CSAT SCORE: 4.8/5.0 based on recent feedback."
-             )
-        elif "voice" in query_lower:
-             tools.append({"tool": "Voice Biometrics", "input": "Audio Stream", "output": "Secure"})
-             response = (
-                 "VOICE INTERFACE METRICS:\n"
-                 "• ACCURACY: 98.2% Word Error Rate.\n"
-                 "• LANGUAGE: English (US) detected. Dialect: West Coast.\n"
-                 "• SENTIMENT: Calm/Professional tone analyzed.\n"
-                 "• SECURITY: Voiceprint matches User-Admin-01."
-             )
-        else:
-            response = "HID is online. Select an interaction capability."
-
-        return {"response": response, "tool_usage": tools, "logs": [], "cost": 0.005}
+    def process(self, query: str, intents: Optional[FrozenSet[str]] = None,
+                context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        if intents is None:
+            intents = self.match(query)
+        capability = self.select_capability(intents)
+        if capability == "voice":
+            return self.voice_templates[SENTIMENT.label(query)]
+        return self.templates[capability]
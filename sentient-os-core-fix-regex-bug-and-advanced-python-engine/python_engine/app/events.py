@@ -0,0 +1,36 @@
+import json
+from typing import Any, Callable, Dict, Optional
+
+# Callback through which the orchestrator publishes progress as it happens:
+# emit(event_type, payload). Event types are "log", "tool", "partial",
+# "result" and "error".
+Emit = Callable[[str, Dict[str, Any]], None]
+
+
+def emit_logs(emit: Optional[Emit], lines, source: str):
+    if emit is None:
+        return
+    for line in lines:
+        emit("log", {"source": source, "message": line})
+
+
+def emit_division_result(emit: Optional[Emit], division: str, result: Dict[str, Any], step: Optional[str] = None):
+    """Publishes a finished division step: its logs, each tool call, then the partial response."""
+    if emit is None:
+        return
+    emit_logs(emit, result.get("logs", []), division)
+    for usage in result.get("tool_usage", []):
+        emit("tool", {"division": division, "step": step, **usage})
+    emit("partial", {
+        "division": division,
+        "step": step,
+        "response": result["response"],
+        "cost": result.get("cost", 0.0),
+    })
+
+
+def format_sse(event: str, data: Any) -> bytes:
+    """Encodes one Server-Sent Events frame."""
+    payload = data if isinstance(data, str) else json.dumps(data)
+    lines = "".join(f"data: {line}\n" for line in payload.split("\n"))
+    return f"event: {event}\n{lines}\n".encode()
@@ -1,37 +1,352 @@
-from fastapi import FastAPI, HTTPException
-from app.models import AgentRequest, AgentResponse, MasumiAgentConfig
+import asyncio
+import hmac
+import json
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Set, Union
+
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import ValidationError
+from app.models import AgentRequest, AgentResponse, BatchItemResult, MasumiAgentConfig, to_json_bytes
+from app.admission import AdmissionRejected
 from app.agent import MasumiAgent
+from app.events import format_sse
+from app.tools import TOOL_REGISTRY, ComplianceTool
+from app.metrics import PROFILER, REGISTRY, SERIALIZE_SECONDS, MetricsMiddleware, collect_cache, collect_stats
+
+# Defaults, overridable per deployment through the environment.
+# Items of one /interact/batch request processed at a time.
+BATCH_CONCURRENCY = int(os.environ.get("AEOS_BATCH_CONCURRENCY", "16"))
+# Token for administrative endpoints (X-Admin-Token); unset disables them.
+ADMIN_TOKEN = os.environ.get("AEOS_ADMIN_TOKEN", "")
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Keep warm sessions across restarts when a snapshot path is configured.
+    agent.sessions.snapshot()
+    agent.audit.close()
+    # Flushes buffered metering records; every prefork worker runs this on shutdown.
+    agent.meter.close()
 
 app = FastAPI(
     title="Masumi AI Agent Engine",
     description="Advanced Python-based AI Engine for AEOS, compliant with Masumi Network.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 agent = MasumiAgent()
 
+REGISTRY.register_collector(collect_cache("aeos_response_cache", agent.orchestrator.cache.stats))
+REGISTRY.register_collector(collect_stats(
+    "aeos_admission", agent.admission.stats,
+    counters=("admitted", "rate_limited", "overloaded"),
+    gauges=("active", "queued", "tracked_users", "estimated_wait_seconds"),
+))
+REGISTRY.register_collector(collect_stats(
+    "aeos_sessions", agent.sessions.stats,
+    counters=("pinned", "reused", "evictions", "expirations"),
+    gauges=("sessions", "bytes"),
+))
+REGISTRY.register_collector(collect_stats(
+    "aeos_sentiment", agent.orchestrator.sentiment.stats,
+    counters=("hits", "misses"),
+    gauges=("entries",),
+))
+REGISTRY.register_collector(collect_stats(
+    "aeos_audit", agent.audit.stats,
+    counters=("recorded", "committed", "commits", "dropped", "errors"),
+    gauges=("pending", "segments"),
+))
+app.add_middleware(
+    MetricsMiddleware,
+    handlers=("/", "/config", "/cache/stats", "/admission/stats", "/sessions/stats", "/screening/stats", "/sentiment/stats", "/metering/spend", "/audit/history", "/metrics", "/interact", "/interact/stream", "/interact/batch"),
+)
+
 @app.get("/")
 async def root():
     return {"status": "online", "service": "Masumi AI Engine"}
 
-@app.get("/config")
+AGENT_CONFIG = MasumiAgentConfig(
+    name="Veritas-X",
+    did="did:masumi:agent:veritas-x-99",
+    capabilities=["DeFi", "Compliance", "Analysis"],
+    price_per_request=0.005,
+    wallet_address="addr1_masumi_agent_vault"
+)
+# The config never changes at runtime, so its body is encoded once.
+AGENT_CONFIG_BODY = to_json_bytes(AGENT_CONFIG)
+
+@app.get("/config", response_model=MasumiAgentConfig)
 async def get_agent_config():
-    return MasumiAgentConfig(
-        name="Veritas-X",
-        did="did:masumi:agent:veritas-x-99",
-        capabilities=["DeFi", "Compliance", "Analysis"],
-        price_per_request=0.005,
-        wallet_address="addr1_masumi_agent_vault"
+    return Response(content=AGENT_CONFIG_BODY, media_type="application/json")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return agent.orchestrator.cache.stats()
+
+@app.get("/admission/stats")
+async def get_admission_stats():
+    return agent.admission.stats()
+
+@app.get("/sessions/stats")
+async def get_session_stats():
+    return agent.sessions.stats()
+
+@app.get("/screening/stats")
+async def get_screening_stats():
+    return TOOL_REGISTRY.backend(ComplianceTool).stats()
+
+@app.get("/sentiment/stats")
+async def get_sentiment_stats():
+    return agent.orchestrator.sentiment.stats()
+
+def _too_many_requests(e: AdmissionRejected) -> Response:
+    return Response(
+        content=json.dumps({"detail": str(e), "reason": e.reason}),
+        status_code=429,
+        media_type="application/json",
+        headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
     )
 
+# A plain def: FastAPI runs it in its threadpool, off the event loop, while
+# the ledger's columns are aggregated.
+@app.get("/metering/spend")
+def get_metered_spend(
+    group_by: str = "user",
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    user_id: Optional[str] = None,
+):
+    """
+    Aggregated spend from the metering ledger, grouped by `user` or `division`,
+    for records with start <= timestamp < end (Unix seconds).
+    """
+    if group_by == "user":
+        totals = agent.meter.spend_by_user(start, end, user_id)
+    elif group_by == "division":
+        totals = agent.meter.spend_by_division(start, end, user_id)
+    else:
+        raise HTTPException(status_code=400, detail="group_by must be 'user' or 'division'")
+    return {"group_by": group_by, "start": start, "end": end, "totals": totals}
+
+def _require_admin(token: Optional[str]):
+    if not ADMIN_TOKEN or token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="admin token required")
+
+@app.get("/audit/history")
+async def get_audit_history(
+    user_id: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 1000,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """
+    Committed audit records of one user, newest first, streamed as NDJSON,
+    optionally those with since <= timestamp < until (Unix seconds).
+    Any user's history is readable, so the endpoint requires the admin token.
+    """
+    _require_admin(x_admin_token)
+    records = agent.audit.history(user_id, since, until, limit)
+    return StreamingResponse((json.dumps(record).encode() + b"\n" for record in records), media_type=NDJSON_MEDIA_TYPE)
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus text exposition of engine metrics."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+INTERACT_SERIALIZE_SECONDS = SERIALIZE_SECONDS.labels("/interact")
+
 @app.post("/interact", response_model=AgentResponse)
 async def interact_with_agent(request: AgentRequest):
     try:
-        response = agent.process(request.query)
-        return response
+        ticket = await agent.admit(request.query, request.user_id)
+    except AdmissionRejected as e:
+        return _too_many_requests(e)
+    token = PROFILER.start()
+    try:
+        response = await agent.aprocess(request.query, user_id=request.user_id, ticket=ticket, context=request.context)
+        started = time.perf_counter()
+        body = to_json_bytes(response)
+        INTERACT_SERIALIZE_SECONDS.observe(time.perf_counter() - started)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        PROFILER.stop(token, "interact")
+
+@app.post("/interact/stream")
+async def interact_with_agent_stream(request: AgentRequest):
+    """
+    Server-Sent Events variant of /interact. Orchestrator and division log lines,
+    tool calls and partial division responses are sent as they are produced;
+    the final `result` event carries the complete AgentResponse.
+    """
+    try:
+        ticket = await agent.admit(request.query, request.user_id)
+    except AdmissionRejected as e:
+        return _too_many_requests(e)
+    queue: "asyncio.Queue" = asyncio.Queue()
+
+    def emit(event: str, data):
+        queue.put_nowait((event, data))
+
+    async def run():
+        try:
+            response = await agent.aprocess(request.query, emit, request.user_id, ticket, request.context)
+            emit("result", response.model_dump_json())
+        except Exception as e:
+            emit("error", {"detail": str(e)})
+        finally:
+            queue.put_nowait(None)
+
+    # Started here rather than in the generator, so the admission ticket is
+    # released even if the client goes away before the stream begins.
+    task = asyncio.ensure_future(run())
+
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield format_sse(*item)
+        finally:
+            task.cancel()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def _parse_batch_lines(lines: List[bytes]) -> List[Union[AgentRequest, str]]:
+    """AgentRequests from NDJSON lines, with a per-item error message in place of any invalid one."""
+    items: List[Union[AgentRequest, str]] = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            items.append(AgentRequest.model_validate_json(line))
+        except ValidationError as e:
+            items.append(str(e))
+    return items
+
+def _parse_batch_array(body: bytes) -> List[Union[AgentRequest, str]]:
+    """A JSON array batch body, parsed like `_parse_batch_lines`."""
+    try:
+        raw_items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(raw_items, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON stream")
+    items: List[Union[AgentRequest, str]] = []
+    for raw in raw_items:
+        try:
+            items.append(AgentRequest.model_validate(raw))
+        except ValidationError as e:
+            items.append(str(e))
+    return items
+
+async def _stream_batch_lines(request: Request) -> AsyncIterator[List[Union[AgentRequest, str]]]:
+    """Parses an NDJSON body as it arrives, yielding the items of each chunk's complete lines."""
+    partial = b""
+    async for chunk in request.stream():
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        items = _parse_batch_lines(lines)
+        if items:
+            yield items
+    items = _parse_batch_lines([partial])
+    if items:
+        yield items
+
+async def _single_chunk(items: List[Union[AgentRequest, str]]) -> AsyncIterator[List[Union[AgentRequest, str]]]:
+    yield items
+
+async def _process_batch_item(index: int, item: Union[AgentRequest, str]) -> bytes:
+    """One item's result line. Each item is admitted like a single /interact call."""
+    if isinstance(item, str):
+        result = BatchItemResult(index=index, status=422, error=item)
+    else:
+        try:
+            ticket = await agent.admit(item.query, item.user_id)
+        except AdmissionRejected as e:
+            result = BatchItemResult(index=index, status=429, error=str(e), retry_after=e.retry_after)
+        else:
+            try:
+                response = await agent.aprocess(item.query, user_id=item.user_id, ticket=ticket, context=item.context)
+                result = BatchItemResult(index=index, result=response)
+            except Exception as e:
+                result = BatchItemResult(index=index, status=500, error=str(e))
+    return to_json_bytes(result) + b"\n"
+
+async def _run_batch(chunks: AsyncIterator[List[Union[AgentRequest, str]]]) -> AsyncIterator[bytes]:
+    """
+    Runs the items of `chunks` with up to BATCH_CONCURRENCY in flight and
+    yields each result line as it completes. Reading stops while the limit is
+    reached, so a large body is never held in memory.
+    """
+    running: Set["asyncio.Future[bytes]"] = set()
+    index = 0
+    try:
+        async for items in chunks:
+            # Score the chunk in one vectorized pass; each item then reads its cached score.
+            agent.orchestrator.sentiment.score_many([item.query for item in items if not isinstance(item, str)])
+            for item in items:
+                while len(running) >= BATCH_CONCURRENCY:
+                    done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        yield task.result()
+                running.add(asyncio.ensure_future(_process_batch_item(index, item)))
+                index += 1
+            done = {task for task in running if task.done()}
+            running -= done
+            for task in done:
+                yield task.result()
+        while running:
+            done, running = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in running:
+            task.cancel()
+
+class BodyStreamingResponse(StreamingResponse):
+    """
+    A StreamingResponse whose content still reads the request body. Starlette
+    would otherwise listen for a disconnect on the same receive channel and
+    swallow body chunks; a disconnect surfaces through request.stream() instead.
+    """
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+@app.post("/interact/batch")
+async def interact_with_agent_batch(request: Request):
+    """
+    Processes a batch of requests (NDJSON or a JSON array) and streams back
+    one NDJSON line per item as it finishes, in completion order; each line
+    carries the item's `index`. NDJSON bodies are parsed and run as they
+    arrive; a JSON array is read whole first. A failing item is reported on its
+    own line, with its `status`, instead of failing the whole batch; items over
+    the user's rate limit or shed under overload get status 429.
+    """
+    if request.headers.get("content-type", "").startswith(NDJSON_MEDIA_TYPE):
+        return BodyStreamingResponse(_run_batch(_stream_batch_lines(request)), media_type=NDJSON_MEDIA_TYPE)
+    items = _parse_batch_array(await request.body())
+    return StreamingResponse(_run_batch(_single_chunk(items)), media_type=NDJSON_MEDIA_TYPE)
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # One process by default; AEOS_WORKERS > 1 preforks warm workers.
+    from app.prefork import serve
+
+    serve(app, agent)
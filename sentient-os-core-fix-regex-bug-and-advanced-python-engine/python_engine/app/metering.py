@@ -0,0 +1,302 @@
+import os
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_METERING_DIR = os.environ.get("AEOS_METERING_DIR", os.path.join("data", "metering"))
+FLUSH_ROWS = 65536          # buffered records that trigger a flush
+FLUSH_INTERVAL = 1.0        # seconds between background flushes
+SEGMENT_ROWS = 8_000_000    # rows per segment before rotating to a new one
+
+# Column name -> (array typecode, numpy dtype). Users and divisions are stored
+# as dictionary-encoded integer ids.
+COLUMNS = (
+    ("user", "I", "<u4"),
+    ("division", "B", "u1"),
+    ("ts", "d", "<f8"),
+    ("cost", "d", "<f8"),
+)
+
+
+class _Dictionary:
+    """Append-only string <-> id mapping persisted one value per line."""
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.ids: Dict[str, int] = {}
+        self.values: List[str] = []
+        # Bytes of the file already read.
+        self._read = 0
+        self.refresh()
+        self._persisted = len(self.values)
+
+    def refresh(self):
+        """Reads values appended to the file since the last call, e.g. by another process."""
+        if not self.path or not os.path.exists(self.path) or os.path.getsize(self.path) <= self._read:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._read)
+            data = f.read()
+        # A line still being written is read by a later call.
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.decode("utf-8").split("\n")[:-1]:
+            self.intern(line)
+        self._read += len(data)
+
+    def intern(self, value: str) -> int:
+        index = self.ids.get(value)
+        if index is None:
+            index = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return index
+
+    def persist(self):
+        if self.path and self._persisted < len(self.values):
+            pending = self.values[self._persisted:]
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(v.replace("\n", " ") + "\n" for v in pending))
+            self._persisted += len(pending)
+
+
+class MeteringLedger:
+    """
+    In-process cost metering: one (user_id, division, timestamp, cost) record
+    per charged division step.
+
+    Records are appended to array-backed columns under a short lock, so the
+    request path never does I/O. A background thread flushes them in batches
+    to column files inside rotating segment directories, and queries memory-map
+    those files and aggregate with vectorized NumPy reductions. Timestamps are
+    taken under the append lock and never decrease, even when the wall clock
+    steps back, so each segment is sorted by time and a time window is
+    resolved with a binary search.
+
+    Each process of a preforked server writes its own partition, a
+    subdirectory of `path` with its own dictionaries (see `partition`);
+    queries add up `path` and every partition, through read-only ledgers
+    that are kept and only read what was appended since the last query.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = DEFAULT_METERING_DIR,
+        flush_rows: int = FLUSH_ROWS,
+        flush_interval: float = FLUSH_INTERVAL,
+        segment_rows: int = SEGMENT_ROWS,
+    ):
+        self.path = path
+        self.root = path
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.segment_rows = segment_rows
+
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        self._buffer = self._new_buffer()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+        self.users = _Dictionary(os.path.join(path, "users.txt") if path else None)
+        self.divisions = _Dictionary(os.path.join(path, "divisions.txt") if path else None)
+        # Segment directory -> rows durably written to every column file.
+        self._segments: List[Tuple[str, int]] = self._load_segments() if path else []
+        self._last_ts = self._load_last_ts()
+        # Read-only ledgers of the other partitions, by directory.
+        self._readers: Dict[str, "MeteringLedger"] = {}
+        self._readers_lock = threading.Lock()
+
+    def partition(self, name: str):
+        """Writes to `<root>/<name>` from now on. Call before the first record."""
+        if self.root:
+            self.path = os.path.join(self.root, name)
+            os.makedirs(self.path, exist_ok=True)
+            self.users = _Dictionary(os.path.join(self.path, "users.txt"))
+            self.divisions = _Dictionary(os.path.join(self.path, "divisions.txt"))
+            self._segments = self._load_segments()
+            self._last_ts = self._load_last_ts()
+
+    def _others(self) -> List["MeteringLedger"]:
+        """Read-only ledgers for the root and the partitions this instance does not write."""
+        if not self.root or not os.path.isdir(self.root):
+            return []
+        directories = [self.root] + [os.path.join(self.root, name) for name in sorted(os.listdir(self.root))
+                                     if not name.startswith("seg-") and os.path.isdir(os.path.join(self.root, name))]
+        readers = []
+        with self._readers_lock:
+            for directory in directories:
+                if directory == self.path:
+                    continue
+                reader = self._readers.get(directory)
+                if reader is None:
+                    reader = self._readers[directory] = MeteringLedger(directory)
+                else:
+                    reader._refresh()
+                readers.append(reader)
+        return readers
+
+    def _refresh(self):
+        """Picks up what another process appended to this (read-only) ledger's directory."""
+        # Segments first: every id in the rows they cover is already persisted.
+        self._segments = self._load_segments()
+        self.users.refresh()
+        self.divisions.refresh()
+
+    @staticmethod
+    def _new_buffer() -> Dict[str, array]:
+        return {name: array(code) for name, code, _ in COLUMNS}
+
+    def _load_segments(self) -> List[Tuple[str, int]]:
+        segments = []
+        for name in sorted(os.listdir(self.path)):
+            directory = os.path.join(self.path, name)
+            if not name.startswith("seg-") or not os.path.isdir(directory):
+                continue
+            rows = min(
+                os.path.getsize(os.path.join(directory, column)) // array(code).itemsize
+                if os.path.exists(os.path.join(directory, column)) else 0
+                for column, code, _ in COLUMNS
+            )
+            segments.append((directory, rows))
+        return segments
+
+    def _load_last_ts(self) -> float:
+        """The newest flushed timestamp, so records appended after a restart stay sorted."""
+        for directory, rows in reversed(self._segments):
+            if rows:
+                ts = array("d")
+                with open(os.path.join(directory, "ts"), "rb") as f:
+                    f.seek((rows - 1) * ts.itemsize)
+                    ts.frombytes(f.read(ts.itemsize))
+                return ts[0]
+        return 0.0
+
+    # -- write path -------------------------------------------------------
+
+    def record(self, user_id: Optional[str], division: str, cost: float):
+        """Appends one record. O(1), no I/O; flushing happens in the background."""
+        with self._lock:
+            buffer = self._buffer
+            buffer["user"].append(self.users.intern(user_id or "anonymous"))
+            buffer["division"].append(self.divisions.intern(division))
+            # Clamped, as the wall clock can step back; queries rely on sorted segments.
+            now = time.time()
+            if now < self._last_ts:
+                now = self._last_ts
+            self._last_ts = now
+            buffer["ts"].append(now)
+            buffer["cost"].append(cost)
+            pending = len(buffer["cost"])
+        if self._thread is None and self.path:
+            self._start()
+        if pending >= self.flush_rows:
+            self._wakeup.set()
+
+    def _start(self):
+        with self._flush_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="aeos-metering", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Moves buffered records into the current segment's column files."""
+        if not self.path:
+            return
+        with self._flush_lock:
+            with self._lock:
+                buffer, self._buffer = self._buffer, self._new_buffer()
+                self.users.persist()
+                self.divisions.persist()
+            rows = len(buffer["cost"])
+            offset = 0
+            while offset < rows:
+                directory, written = self._current_segment()
+                take = min(rows - offset, self.segment_rows - written)
+                for column, _, _ in COLUMNS:
+                    with open(os.path.join(directory, column), "ab") as f:
+                        f.write(buffer[column][offset:offset + take].tobytes())
+                self._segments[-1] = (directory, written + take)
+                offset += take
+
+    def _current_segment(self) -> Tuple[str, int]:
+        if not self._segments or self._segments[-1][1] >= self.segment_rows:
+            directory = os.path.join(self.path, f"seg-{len(self._segments):06d}")
+            os.makedirs(directory, exist_ok=True)
+            self._segments.append((directory, 0))
+        return self._segments[-1]
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    # -- read path --------------------------------------------------------
+
+    def _chunks(self):
+        """Yields column dicts of NumPy arrays: each flushed segment, then the live buffer."""
+        import numpy as np
+
+        with self._flush_lock:
+            segments = list(self._segments)
+        for directory, rows in segments:
+            if rows:
+                yield {
+                    column: np.memmap(os.path.join(directory, column), dtype=dtype, mode="r", shape=(rows,))
+                    for column, _, dtype in COLUMNS
+                }
+        with self._lock:
+            live = {column: self._buffer[column][:] for column, _, _ in COLUMNS}
+        if live["cost"]:
+            yield {column: np.frombuffer(live[column], dtype=dtype) for column, _, dtype in COLUMNS}
+
+    def _aggregate(self, group_by: str, start: Optional[float], end: Optional[float], user_id: Optional[str]) -> Dict[str, float]:
+        import numpy as np
+
+        size = len(self.users.values) if group_by == "user" else len(self.divisions.values)
+        user_filter = None
+        if user_id is not None:
+            user_filter = self.users.ids.get(user_id)
+            if user_filter is None:
+                return {}
+        totals = np.zeros(size, dtype=np.float64)
+        for chunk in self._chunks():
+            ts = chunk["ts"]
+            lo = 0 if start is None else int(np.searchsorted(ts, start, side="left"))
+            hi = len(ts) if end is None else int(np.searchsorted(ts, end, side="left"))
+            if lo >= hi:
+                continue
+            keys = chunk[group_by][lo:hi]
+            cost = chunk["cost"][lo:hi]
+            if user_filter is not None:
+                mask = chunk["user"][lo:hi] == user_filter
+                keys, cost = keys[mask], cost[mask]
+            totals += np.bincount(keys, weights=cost, minlength=size)[:size]
+        names = self.users.values if group_by == "user" else self.divisions.values
+        return {names[i]: float(totals[i]) for i in np.flatnonzero(totals)}
+
+    def _total(self, group_by: str, start: Optional[float], end: Optional[float], user_id: Optional[str]) -> Dict[str, float]:
+        totals = self._aggregate(group_by, start, end, user_id)
+        for ledger in self._others():
+            for name, cost in ledger._aggregate(group_by, start, end, user_id).items():
+                totals[name] = totals.get(name, 0.0) + cost
+        return totals
+
+    def spend_by_user(self, start: Optional[float] = None, end: Optional[float] = None,
+                      user_id: Optional[str] = None) -> Dict[str, float]:
+        """Total cost per user_id for records with start <= timestamp < end."""
+        return self._total("user", start, end, user_id)
+
+    def spend_by_division(self, start: Optional[float] = None, end: Optional[float] = None,
+                          user_id: Optional[str] = None) -> Dict[str, float]:
+        """Total cost per division for records with start <= timestamp < end."""
+        return self._total("division", start, end, user_id)
@@ -0,0 +1,462 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Latency buckets in seconds, from 50µs up to 10s.
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Seconds between publications of a worker's metrics to shared memory.
+PUBLISH_INTERVAL = 1.0
+# Routing and response construction take microseconds per request, so only
+# one call in this many is timed.
+STAGE_SAMPLE_EVERY = int(os.environ.get("AEOS_STAGE_SAMPLE_EVERY", "8"))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Series:
+    """
+    One labelled series, bound once with `metric.labels(...)` so hot paths skip
+    the label lookup. Values live in per-thread shards: a thread only ever
+    updates its own, so updates take no lock, and reads sum the shards.
+    """
+    __slots__ = ("_registry", "_local", "_shards", "_width")
+
+    def __init__(self, registry: "Registry", width: int):
+        self._registry = registry
+        self._local = threading.local()
+        # Shards outlive their threads, so no update is ever lost.
+        self._shards: List[List[float]] = []
+        self._width = width
+
+    def _new_shard(self) -> List[float]:
+        shard = self._local.shard = [0] * self._width
+        self._shards.append(shard)
+        return shard
+
+    def _totals(self) -> List[float]:
+        shards = list(self._shards)
+        return [sum(column) for column in zip(*shards)] if shards else [0] * self._width
+
+
+class CounterSeries(_Series):
+    __slots__ = ()
+
+    def inc(self, amount: float = 1.0):
+        if self._registry.enabled:
+            try:
+                shard = self._local.shard
+            except AttributeError:
+                shard = self._new_shard()
+            shard[0] += amount
+
+    def value(self) -> float:
+        return self._totals()[0]
+
+
+class GaugeSeries(CounterSeries):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+
+class HistogramSeries(_Series):
+    """Shards hold per-bucket counts (+Inf last), then the sum."""
+    __slots__ = ("_buckets",)
+
+    def __init__(self, registry: "Registry", buckets: Tuple[float, ...]):
+        super().__init__(registry, len(buckets) + 2)
+        self._buckets = buckets
+
+    def observe(self, value: float):
+        if self._registry.enabled:
+            try:
+                shard = self._local.shard
+            except AttributeError:
+                shard = self._new_shard()
+            shard[bisect_left(self._buckets, value)] += 1
+            shard[-1] += value
+
+    def count(self) -> int:
+        return int(sum(self._totals()[:-1]))
+
+
+class SampledSeries:
+    """Passes one observation in `every` on to a HistogramSeries."""
+    __slots__ = ("_series", "_every", "_left")
+
+    def __init__(self, series: HistogramSeries, every: int = STAGE_SAMPLE_EVERY):
+        self._series = series
+        self._every = max(1, every)
+        self._left = 1
+
+    def observe(self, value: float):
+        # Unlocked: a race only shifts which call gets sampled.
+        self._left -= 1
+        if self._left <= 0:
+            self._left = self._every
+            self._series.observe(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, registry: "Registry", name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._series: Dict[Tuple[str, ...], _Series] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        """The series for these label values, to bind once and update directly."""
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = self._new_series()
+        return series
+
+    def _new_series(self) -> _Series:
+        raise NotImplementedError
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], List[float]]]:
+        with self._lock:
+            items = list(self._series.items())
+        return [(labels, series._totals()) for labels, series in items]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, k)} {v[0]}" for k, v in self._items()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self) -> CounterSeries:
+        return CounterSeries(self.registry, 1)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self.labels(*labels).inc(amount)
+
+    def value(self, *labels: str) -> float:
+        series = self._series.get(labels)
+        return series.value() if series is not None else 0.0
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_series(self) -> GaugeSeries:
+        return GaugeSeries(self.registry, 1)
+
+    def inc(self, *labels: str):
+        self.labels(*labels).inc()
+
+    def dec(self, *labels: str):
+        self.labels(*labels).dec()
+
+    def add(self, amount: float, *labels: str):
+        self.labels(*labels).inc(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Iterable[float] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+
+    def _new_series(self) -> HistogramSeries:
+        return HistogramSeries(self.registry, self.buckets)
+
+    def observe(self, value: float, *labels: str):
+        self.labels(*labels).observe(value)
+
+    def count(self, *labels: str) -> int:
+        series = self._series.get(labels)
+        return series.count() if series is not None else 0
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, state in self._items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.label_names, labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {state[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """
+    Process-local metric registry rendered in the Prometheus text format.
+    Collectors are callables returning extra exposition lines at scrape time.
+
+    In the preforked server each worker also publishes its exposition to its
+    own shared-memory region (`share`), every PUBLISH_INTERVAL seconds and on
+    each scrape, and `render` merges all workers' samples, so any worker can
+    answer for the whole server.
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], List[str]]] = []
+        self._shared = None
+        self._publisher: Optional[threading.Thread] = None
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(self, name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(self, name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (), **kwargs) -> Histogram:
+        return self._add(Histogram(self, name, documentation, labels, **kwargs))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], List[str]]):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        text = self._render_local()
+        if self._shared is None:
+            return text
+        regions, index = self._shared
+        regions.write(index, text.encode())
+        return merge_expositions(regions.read(i).decode() for i in range(regions.count))
+
+    def _render_local(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            lines.extend(collector())
+        return "\n".join(lines) + "\n"
+
+    def share(self, regions, index: int):
+        """Publishes this process's metrics as region `index` of a SharedRegions."""
+        self._shared = (regions, index)
+        if self._publisher is None:
+            self._publisher = threading.Thread(target=self._publish, name="aeos-metrics", daemon=True)
+            self._publisher.start()
+
+    def _publish(self):
+        while True:
+            regions, index = self._shared
+            regions.write(index, self._render_local().encode())
+            time.sleep(PUBLISH_INTERVAL)
+
+
+def merge_expositions(texts: Iterable[str]) -> str:
+    """
+    Merges Prometheus text expositions from several workers. Samples of the
+    same series are summed: counters, histogram buckets and sums, and the
+    engine's gauges, which all count things. Each metric family is emitted
+    once, with its comments, in first-seen order.
+    """
+    families: Dict[Optional[str], Tuple[List[str], Dict[str, float]]] = {}
+    for text in texts:
+        family = None
+        for line in text.splitlines():
+            if line.startswith("# HELP ") or line.startswith("# TYPE "):
+                family = line.split(" ", 3)[2]
+                comments = families.setdefault(family, ([], {}))[0]
+                if line not in comments:
+                    comments.append(line)
+            elif line and not line.startswith("#"):
+                series, _, value = line.rpartition(" ")
+                samples = families.setdefault(family, ([], {}))[1]
+                samples[series] = samples.get(series, 0.0) + float(value)
+    lines: List[str] = []
+    for comments, samples in families.values():
+        lines.extend(comments)
+        lines.extend(f"{series} {value}" for series, value in samples.items())
+    return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry(enabled=os.environ.get("AEOS_METRICS", "1") != "0")
+
+# Its `_count` series are the request counts by handler and status.
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "aeos_http_request_seconds", "Time from request start to the last response byte.", ("handler", "status"))
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "aeos_http_requests_in_flight", "HTTP requests currently being served.", ("handler",))
+SERIALIZE_SECONDS = REGISTRY.histogram(
+    "aeos_serialize_seconds", "Time spent serializing responses.", ("handler",))
+# Recorded through SampledSeries: their `_count` is the number of sampled calls.
+ROUTING_SECONDS = REGISTRY.histogram(
+    "aeos_routing_seconds", "Time spent matching intents and selecting a route, sampled.")
+RESPONSE_BUILD_SECONDS = REGISTRY.histogram(
+    "aeos_response_build_seconds", "Time spent constructing AgentResponse models, sampled.")
+DIVISION_SECONDS = REGISTRY.histogram(
+    "aeos_division_seconds", "Division process() latency, cache misses only.", ("division", "capability"))
+DIVISION_ERRORS = REGISTRY.counter(
+    "aeos_division_errors_total", "Division process() calls that raised.", ("division", "capability"))
+DIVISION_IN_FLIGHT = REGISTRY.gauge(
+    "aeos_division_in_flight", "Division process() calls currently running.", ("division",))
+DIVISION_COST = REGISTRY.counter(
+    "aeos_cost_incurred_total", "Sum of cost_incurred charged per division.", ("division", "capability"))
+WORKFLOW_SECONDS = REGISTRY.histogram(
+    "aeos_workflow_seconds", "End-to-end latency of multi-division workflows.", ("workflow",))
+ADMISSION_REJECTED = REGISTRY.counter(
+    "aeos_admission_rejected_total", "Requests shed by admission control.", ("reason",))
+ADMISSION_WAIT_SECONDS = REGISTRY.histogram(
+    "aeos_admission_wait_seconds", "Time admitted requests spent queued for a concurrency slot.")
+
+
+def collect_stats(
+    prefix: str,
+    stats: Callable[[], Dict[str, object]],
+    counters: Iterable[str] = (),
+    gauges: Iterable[str] = (),
+) -> Callable[[], List[str]]:
+    """Builds a collector exposing selected `stats()` values as counters and gauges."""
+    counters, gauges = tuple(counters), tuple(gauges)
+
+    def collect() -> List[str]:
+        values = stats()
+        lines = []
+        for name in counters:
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total {values[name]}")
+        for name in gauges:
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {values[name]}")
+        return lines
+
+    return collect
+
+
+def collect_cache(prefix: str, stats: Callable[[], Dict[str, object]]) -> Callable[[], List[str]]:
+    """Builds a collector exposing a cache's `stats()` counters and sizes."""
+    return collect_stats(
+        prefix, stats,
+        counters=("hits", "misses", "coalesced", "evictions", "expirations"),
+        gauges=("entries", "bytes"),
+    )
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency (including streamed bodies), status
+    counts and in-flight requests per route. Paths outside `handlers` are
+    reported as "other" to keep label cardinality bounded.
+    """
+    def __init__(self, app, handlers: Iterable[str]):
+        self.app = app
+        # handler -> in-flight series, bound once.
+        self.in_flight = {handler: HTTP_IN_FLIGHT.labels(handler) for handler in tuple(handlers) + ("other",)}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not REGISTRY.enabled:
+            await self.app(scope, receive, send)
+            return
+        path = scope.get("path", "")
+        handler = path if path in self.in_flight else "other"
+        in_flight = self.in_flight[handler]
+        status = "500"
+        started = time.perf_counter()
+        in_flight.inc()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_SECONDS.labels(handler, status).observe(time.perf_counter() - started)
+
+
+class TailProfiler:
+    """
+    Opt-in sampling profiler for tail requests.
+    A `sample_rate` fraction of requests runs under cProfile; a profile is kept
+    (written to `output_dir`) only when the request took at least `threshold`
+    seconds. Only one request is profiled at a time.
+
+    The profiler is enabled on the event-loop thread from `start` to `stop`,
+    across the request's awaits, so a profile also contains whatever other
+    requests ran on the loop meanwhile. Read it as what the loop was doing
+    during a slow request, not as that request's own cost. Division steps run
+    in executor threads, which (before Python 3.12) are not profiled at all.
+    """
+    def __init__(self, sample_rate: float = 0.0, threshold: float = 0.25, output_dir: str = "profiles"):
+        self.sample_rate = sample_rate
+        self.threshold = threshold
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self.captured = 0
+
+    @classmethod
+    def from_env(cls) -> "TailProfiler":
+        return cls(
+            sample_rate=float(os.environ.get("AEOS_PROFILE_SAMPLE_RATE", "0")),
+            threshold=float(os.environ.get("AEOS_PROFILE_THRESHOLD_MS", "250")) / 1000.0,
+            output_dir=os.environ.get("AEOS_PROFILE_DIR", "profiles"),
+        )
+
+    def start(self) -> Optional[Tuple[cProfile.Profile, float]]:
+        """Returns a token when this request was sampled, else None."""
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._lock.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this interpreter.
+            self._lock.release()
+            return None
+        return profile, time.perf_counter()
+
+    def stop(self, token: Optional[Tuple[cProfile.Profile, float]], label: str = "request"):
+        if token is None:
+            return
+        profile, started = token
+        profile.disable()
+        elapsed = time.perf_counter() - started
+        try:
+            if elapsed >= self.threshold:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, f"{label}-{int(time.time() * 1000)}-{elapsed * 1000:.0f}ms.prof")
+                profile.dump_stats(path)
+                self.captured += 1
+        finally:
+            self._lock.release()
+
+
+PROFILER = TailProfiler.from_env()
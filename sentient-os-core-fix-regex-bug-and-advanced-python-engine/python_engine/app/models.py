@@ -8,13 +8,31 @@ class AgentRequest(BaseModel):
 
 class AgentResponse(BaseModel):
     response: str
+    division: Optional[str] = None
     tool_usage: List[Dict[str, Any]] = []
+    collaboration_log: List[str] = []
     sentiment: str = "neutral"
     cost_incurred: float = 0.0
 
+class BatchItemResult(BaseModel):
+    index: int
+    # HTTP-style outcome of the item: 200, 422 (invalid), 429 (shed) or 500.
+    status: int = 200
+    result: Optional[AgentResponse] = None
+    error: Optional[str] = None
+    # Seconds to wait before retrying a shed (429) item.
+    retry_after: Optional[float] = None
+
 class MasumiAgentConfig(BaseModel):
     name: str
     did: str
     capabilities: List[str]
     price_per_request: float = 0.0
     wallet_address: str
+
+def to_json_bytes(model: BaseModel) -> bytes:
+    """
+    UTF-8 JSON body for `model`, encoded in a single pass by pydantic-core.
+    The model is not re-validated and no intermediate str is built.
+    """
+    return model.__pydantic_serializer__.to_json(model)
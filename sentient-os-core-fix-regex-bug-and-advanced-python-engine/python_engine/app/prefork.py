@@ -0,0 +1,195 @@
+import argparse
+import gc
+import multiprocessing
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from multiprocessing.managers import BaseManager
+from typing import Dict
+
+import uvicorn
+
+from app.divisions import start_process_pool
+from app.metrics import REGISTRY
+from app.shared import DEFAULT_SHARED_SESSION_BYTES, SESSION_SLOT_BYTES, SharedBuckets, SharedCache, SharedRegions
+from app.tools import TOOL_REGISTRY, DeFiTransactionTool
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_WORKERS = int(os.environ.get("AEOS_WORKERS", "1"))
+DEFAULT_DIVISION_PROCESSES = int(os.environ.get("AEOS_DIVISION_PROCESSES", "0"))
+DEFAULT_HOST = os.environ.get("AEOS_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("AEOS_PORT", "8000"))
+
+# Listen backlog of the socket shared by the workers.
+BACKLOG = 2048
+# Pause before replacing a worker that died, so one failing at start-up does not spin.
+RESPAWN_DELAY = 1.0
+# Seconds workers get to finish in-flight requests on shutdown before being killed.
+SHUTDOWN_TIMEOUT = 30.0
+# Seconds between checks of the workers' status.
+POLL_INTERVAL = 0.2
+
+
+def _settlement() -> DeFiTransactionTool:
+    return TOOL_REGISTRY.backend(DeFiTransactionTool)
+
+
+class SettlementManager(BaseManager):
+    """
+    Serves one DeFiTransactionTool to every worker, so balances and the
+    settlement batches live in a single process instead of one per worker.
+    """
+
+
+SettlementManager.register("settlement", callable=_settlement, exposed=("transfer_assets", "check_balance"))
+
+
+def _ignore_interrupts():
+    # Ctrl-C reaches the whole process group; the supervisor shuts helpers down in order.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    # An explicit IPPROTO_TCP: asyncio only sets TCP_NODELAY on accepted sockets that declare it.
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(app, agent, sock: socket.socket, index: int, regions: SharedRegions,
+                manager: SettlementManager, division_processes: int):
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+    # Forked workers would otherwise share the supervisor's random state.
+    random.seed()
+    # Forked before this worker starts any thread of its own.
+    if division_processes > 0:
+        start_process_pool(division_processes, agent.orchestrator.divisions)
+    agent.after_fork(f"worker-{index}")
+    REGISTRY.share(regions, index)
+    TOOL_REGISTRY.use_backend(DeFiTransactionTool, manager.settlement())
+    uvicorn.Server(uvicorn.Config(app)).run(sockets=[sock])
+
+
+def _spawn(index: int, app, agent, sock: socket.socket, regions: SharedRegions,
+           manager: SettlementManager, division_processes: int) -> int:
+    pid = os.fork()
+    if pid:
+        return pid
+    code = 1
+    try:
+        _run_worker(app, agent, sock, index, regions, manager, division_processes)
+        code = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def _reap(children: Dict[int, int]) -> Dict[int, int]:
+    """Removes the workers that exited from `children`; returns them, pid to index."""
+    exited = {}
+    for pid in list(children):
+        try:
+            done, _ = os.waitpid(pid, os.WNOHANG)
+        except ChildProcessError:
+            done = pid
+        if done:
+            exited[pid] = children.pop(pid)
+    return exited
+
+
+def serve(app, agent, workers: int = DEFAULT_WORKERS, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+          division_processes: int = DEFAULT_DIVISION_PROCESSES):
+    """
+    Serves `app` from `workers` processes forked from this one.
+
+    The agent is warmed first (divisions, raster and screening data, tool
+    backends) and the heap frozen, so every worker starts ready and shares
+    those pages with the supervisor copy-on-write. Workers accept on one
+    shared socket. Across workers, division results and each user's last
+    route (for follow-up queries) are shared through SharedCaches, admission
+    token buckets through SharedBuckets, metrics through SharedRegions, and
+    transfers settle in one SettlementManager process; audit, metering and
+    session snapshots are partitioned per worker and read back together. The
+    admission concurrency limit and queue are per worker. With
+    `division_processes`, each worker runs its CPU-bound division steps in
+    that many forked processes.
+
+    The supervisor replaces workers that die and, on SIGTERM or SIGINT, stops
+    them and then the settlement manager.
+    """
+    if workers <= 1:
+        if division_processes > 0:
+            start_process_pool(division_processes, agent.warm())
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    agent.warm()
+    regions = SharedRegions(workers)
+    agent.orchestrator.cache.shared = SharedCache()
+    agent.sessions.shared = SharedCache(DEFAULT_SHARED_SESSION_BYTES, SESSION_SLOT_BYTES)
+    agent.admission.shared = SharedBuckets()
+    manager = SettlementManager(ctx=multiprocessing.get_context("fork"))
+    manager.start(_ignore_interrupts)
+    sock = _bind(host, port)
+    # Objects created so far are never collected, so the collector does not
+    # touch (and copy) the pages the workers share.
+    gc.collect()
+    gc.freeze()
+
+    args = (app, agent, sock, regions, manager, division_processes)
+    children = {_spawn(index, *args): index for index in range(workers)}
+    print(f"AEOS supervisor {os.getpid()}: {workers} workers on {host}:{port}", file=sys.stderr)
+
+    stopping = []
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    try:
+        while not stopping:
+            for pid, index in _reap(children).items():
+                print(f"AEOS worker {index} (pid {pid}) exited; restarting", file=sys.stderr)
+                time.sleep(RESPAWN_DELAY)
+                children[_spawn(index, *args)] = index
+            time.sleep(POLL_INTERVAL)
+    finally:
+        for pid in children:
+            os.kill(pid, signal.SIGTERM)
+        deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+        while children and time.monotonic() < deadline:
+            _reap(children)
+            time.sleep(POLL_INTERVAL)
+        for pid in children:
+            os.kill(pid, signal.SIGKILL)
+        _reap(children)
+        manager.shutdown()
+        sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the AEOS engine from preforked workers.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--division-processes", type=int, default=DEFAULT_DIVISION_PROCESSES)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    from app.main import agent, app
+
+    serve(app, agent, args.workers, args.host, args.port, args.division_processes)
+
+
+if __name__ == "__main__":
+    main()
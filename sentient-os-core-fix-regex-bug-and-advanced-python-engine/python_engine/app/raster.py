@@ -0,0 +1,317 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_RASTER_DIR = os.environ.get("AEOS_RASTER_DIR", os.path.join("data", "rasters"))
+DEFAULT_TILE_CACHE_BYTES = int(os.environ.get("AEOS_RASTER_TILE_CACHE_BYTES", str(64 * 1024 * 1024)))
+
+# Region assessments memoized per store (datasets are immutable once written).
+ASSESSMENT_CACHE_SIZE = 256
+
+MANIFEST = "manifest.json"
+TILE_SUFFIX = ".tiles"
+
+# (west, south, east, north) in degrees.
+BBox = Tuple[float, float, float, float]
+
+# Named regions recognised in queries and `context["region"]`.
+REGIONS: Dict[str, BBox] = {
+    "north america": (-170.0, 5.0, -50.0, 75.0),
+    "latam": (-85.0, -56.0, -33.0, 13.0),
+    "south america": (-85.0, -56.0, -33.0, 13.0),
+    "europe": (-25.0, 34.0, 45.0, 72.0),
+    "emea": (-25.0, -35.0, 60.0, 72.0),
+    "africa": (-20.0, -35.0, 52.0, 38.0),
+    "apac": (60.0, -50.0, 180.0, 55.0),
+    "asia": (60.0, -10.0, 150.0, 55.0),
+    "oceania": (110.0, -50.0, 180.0, 0.0),
+    "australia": (112.0, -44.0, 154.0, -10.0),
+    "california": (-125.0, 32.0, -114.0, 42.0),
+    "amazon": (-75.0, -15.0, -50.0, 5.0),
+    "sahel": (-17.0, 10.0, 40.0, 20.0),
+    "ganges delta": (88.0, 21.0, 92.0, 24.5),
+    "mekong delta": (104.0, 8.5, 107.0, 11.0),
+    "nile delta": (29.5, 30.0, 32.5, 31.6),
+}
+
+# Regions reported by the weather matrix when the query names none.
+WEATHER_REGIONS = ("north america", "apac", "emea", "latam")
+
+_REGION_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(name) for name in sorted(REGIONS, key=len, reverse=True)) + r")\b",
+    re.IGNORECASE,
+)
+_NUMBER = r"(-?\d+(?:\.\d+)?)"
+_BBOX_PATTERN = re.compile(r"\bbbox\s*[:=]?\s*\(?" + r"\s*,?\s*".join([_NUMBER] * 4), re.IGNORECASE)
+
+# Risk model parameters.
+FLOOD_RAIN_ONSET = 30.0      # mm/day where flood risk starts
+FLOOD_RAIN_FULL = 100.0      # mm/day where rainfall alone saturates the risk
+FLOOD_LOWLAND = 50.0         # metres; land below this is fully exposed
+HEATWAVE_CELSIUS = 35.0      # pixel temperature counted towards heatwave load
+FIRE_HIGH = 0.7              # fire-risk index counted as high
+
+
+def resolve_region(query: str, context: Optional[Dict[str, Any]] = None) -> Optional[Tuple[str, BBox]]:
+    """
+    Region to analyse, as (label, bbox): `context["bbox"]` or `context["region"]`
+    first, then a "bbox: w,s,e,n" or a named region in the query. A malformed
+    bbox (not four numbers with west < east and south < north) is ignored.
+    """
+    if context:
+        bbox = _parse_bbox(context.get("bbox"))
+        if bbox is not None:
+            return _bbox_label(bbox), bbox
+        region = str(context.get("region") or "").lower()
+        if region in REGIONS:
+            return region, REGIONS[region]
+    match = _BBOX_PATTERN.search(query)
+    bbox = _parse_bbox(match.groups()) if match else None
+    if bbox is not None:
+        return _bbox_label(bbox), bbox
+    match = _REGION_PATTERN.search(query)
+    if match:
+        name = match.group(1).lower()
+        return name, REGIONS[name]
+    return None
+
+
+def _parse_bbox(values: Any) -> Optional[BBox]:
+    """(west, south, east, north) from a sequence of four numbers, or None when malformed."""
+    if not isinstance(values, (list, tuple)) or len(values) != 4:
+        return None
+    try:
+        west, south, east, north = (float(v) for v in values)
+    except (TypeError, ValueError):
+        return None
+    if not (west < east and south < north):
+        return None
+    return west, south, east, north
+
+
+def _bbox_label(bbox: BBox) -> str:
+    return "bbox(" + ",".join(f"{v:g}" for v in bbox) + ")"
+
+
+class TileCache:
+    """LRU of decoded tiles (float32, nodata as NaN), bounded by bytes."""
+    def __init__(self, max_bytes: int = DEFAULT_TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._tiles: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, key: Tuple[str, int, int], load: Callable[[], np.ndarray]) -> np.ndarray:
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+                self.hits += 1
+                return tile
+            self.misses += 1
+        tile = load()
+        if tile.nbytes > self.max_bytes:
+            return tile
+        with self._lock:
+            if key not in self._tiles:
+                self._tiles[key] = tile
+                self._bytes += tile.nbytes
+            while self._bytes > self.max_bytes:
+                _, evicted = self._tiles.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return tile
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"tiles": len(self._tiles), "bytes": self._bytes, "hits": self.hits, "misses": self.misses}
+
+
+class RasterStore:
+    """
+    Gridded datasets stored as tiled, memory-mapped array files.
+
+    A dataset directory holds `manifest.json` describing one lon/lat grid
+    (width, height, tile size, bounds) and its layers, and one
+    `<layer>.tiles` file per layer laid out tile-major as
+    (tile_rows, tile_cols, tile_size, tile_size), so each tile is a contiguous
+    read. Region statistics are reduced tile by tile, so memory use is bounded
+    by the tile cache regardless of region size.
+    """
+    def __init__(self, root: str, tile_cache: Optional[TileCache] = None):
+        self.root = root
+        with open(os.path.join(root, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.width = manifest["width"]
+        self.height = manifest["height"]
+        self.tile_size = manifest["tile_size"]
+        self.bounds: BBox = tuple(manifest["bounds"])
+        self.layers: Dict[str, Dict[str, Any]] = manifest["layers"]
+        self.tile_rows = -(-self.height // self.tile_size)
+        self.tile_cols = -(-self.width // self.tile_size)
+        self.tiles = tile_cache if tile_cache is not None else TileCache()
+        self._maps: Dict[str, np.memmap] = {}
+        self._assessments: "OrderedDict[BBox, Dict[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, root: Optional[str] = DEFAULT_RASTER_DIR) -> Optional["RasterStore"]:
+        """The dataset at `root`, or None when no dataset is installed there."""
+        if not root or not os.path.exists(os.path.join(root, MANIFEST)):
+            return None
+        return cls(root)
+
+    def _map(self, layer: str) -> np.memmap:
+        mapped = self._maps.get(layer)
+        if mapped is None:
+            with self._lock:
+                mapped = self._maps.get(layer)
+                if mapped is None:
+                    mapped = self._maps[layer] = np.memmap(
+                        os.path.join(self.root, layer + TILE_SUFFIX),
+                        dtype=self.layers[layer]["dtype"], mode="r",
+                        shape=(self.tile_rows, self.tile_cols, self.tile_size, self.tile_size),
+                    )
+        return mapped
+
+    def tile(self, layer: str, row: int, col: int) -> np.ndarray:
+        def load() -> np.ndarray:
+            tile = np.array(self._map(layer)[row, col], dtype=np.float32)
+            nodata = self.layers[layer].get("nodata")
+            if nodata is not None:
+                tile[tile == nodata] = np.nan
+            return tile
+        return self.tiles.get_or_load((layer, row, col), load)
+
+    def pixel_window(self, bbox: BBox) -> Tuple[int, int, int, int]:
+        """(row0, row1, col0, col1) of the pixels covering `bbox`, clipped to the grid."""
+        west, south, east, north = self.bounds
+        x_scale = self.width / (east - west)
+        y_scale = self.height / (north - south)
+        col0 = int(np.floor((bbox[0] - west) * x_scale))
+        col1 = int(np.ceil((bbox[2] - west) * x_scale))
+        row0 = int(np.floor((north - bbox[3]) * y_scale))
+        row1 = int(np.ceil((north - bbox[1]) * y_scale))
+        return (max(row0, 0), min(row1, self.height), max(col0, 0), min(col1, self.width))
+
+    def chunks(self, layers: List[str], bbox: BBox) -> Iterator[Dict[str, np.ndarray]]:
+        """Yields aligned per-tile windows of `layers` covering `bbox`."""
+        row0, row1, col0, col1 = self.pixel_window(bbox)
+        size = self.tile_size
+        for tile_row in range(row0 // size, -(-row1 // size)):
+            r0 = max(row0 - tile_row * size, 0)
+            r1 = min(row1 - tile_row * size, size)
+            for tile_col in range(col0 // size, -(-col1 // size)):
+                c0 = max(col0 - tile_col * size, 0)
+                c1 = min(col1 - tile_col * size, size)
+                yield {layer: self.tile(layer, tile_row, tile_col)[r0:r1, c0:c1] for layer in layers}
+
+    def assess(self, bbox: BBox) -> Dict[str, float]:
+        """
+        Region risk scores from whichever layers are installed:
+        `flood_probability` (rainfall + elevation), `heatwave_load`
+        (temperature), `fire_risk` (fire_risk) and layer means.
+        """
+        bbox = tuple(bbox)
+        with self._lock:
+            result = self._assessments.get(bbox)
+            if result is not None:
+                self._assessments.move_to_end(bbox)
+                return result
+        result = self._assess(bbox)
+        with self._lock:
+            self._assessments[bbox] = result
+            if len(self._assessments) > ASSESSMENT_CACHE_SIZE:
+                self._assessments.popitem(last=False)
+        return result
+
+    def _assess(self, bbox: BBox) -> Dict[str, float]:
+        layers = [name for name in ("rainfall", "elevation", "temperature", "fire_risk") if name in self.layers]
+        sums: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        peak_temperature = -np.inf
+
+        def add(name: str, values: np.ndarray):
+            sums[name] = sums.get(name, 0.0) + float(values.sum())
+            counts[name] = counts.get(name, 0) + int(values.size)
+
+        for chunk in self.chunks(layers, bbox):
+            for name in layers:
+                values = chunk[name]
+                valid = values[~np.isnan(values)]
+                add(name, valid)
+            if "rainfall" in chunk and "elevation" in chunk:
+                rain, elevation = chunk["rainfall"], chunk["elevation"]
+                valid = ~(np.isnan(rain) | np.isnan(elevation))
+                rain_factor = np.clip((rain[valid] - FLOOD_RAIN_ONSET) / (FLOOD_RAIN_FULL - FLOOD_RAIN_ONSET), 0.0, 1.0)
+                lowland = np.clip(1.0 - elevation[valid] / FLOOD_LOWLAND, 0.0, 1.0)
+                add("flood", rain_factor * (0.3 + 0.7 * lowland))
+            if "temperature" in chunk:
+                temperature = chunk["temperature"]
+                temperature = temperature[~np.isnan(temperature)]
+                if temperature.size:
+                    peak_temperature = max(peak_temperature, float(temperature.max()))
+                add("heatwave", (temperature >= HEATWAVE_CELSIUS).astype(np.float32))
+            if "fire_risk" in chunk:
+                fire = chunk["fire_risk"]
+                add("fire_high", (fire[~np.isnan(fire)] >= FIRE_HIGH).astype(np.float32))
+
+        def mean(name: str) -> Optional[float]:
+            return sums[name] / counts[name] if counts.get(name) else None
+
+        result = {
+            "flood_probability": mean("flood"),
+            "heatwave_load": mean("heatwave"),
+            "fire_risk": mean("fire_risk"),
+            "fire_high_share": mean("fire_high"),
+            "rainfall_mm": mean("rainfall"),
+            "elevation_m": mean("elevation"),
+            "temperature_c": mean("temperature"),
+            "temperature_max_c": peak_temperature if np.isfinite(peak_temperature) else None,
+            "pixels": max(counts.values(), default=0),
+        }
+        return {k: v for k, v in result.items() if v is not None}
+
+
+def create_dataset(root: str, width: int, height: int, tile_size: int = 256,
+                   bounds: BBox = (-180.0, -90.0, 180.0, 90.0)):
+    """Writes an empty manifest for a new dataset grid at `root`."""
+    os.makedirs(root, exist_ok=True)
+    manifest = {"width": width, "height": height, "tile_size": tile_size, "bounds": list(bounds), "layers": {}}
+    with open(os.path.join(root, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def write_layer(root: str, name: str, rows: Callable[[int, int], np.ndarray],
+                units: str = "", dtype: str = "float32", nodata: float = -9999.0):
+    """
+    Adds layer `name` to the dataset at `root`. `rows(start, stop)` returns the
+    pixel rows [start, stop) as a (stop - start, width) array with NaN for
+    missing data; the layer is written one band of tiles at a time.
+    """
+    path = os.path.join(root, MANIFEST)
+    with open(path, encoding="utf-8") as f:
+        manifest = json.load(f)
+    width, height, size = manifest["width"], manifest["height"], manifest["tile_size"]
+    tile_rows, tile_cols = -(-height // size), -(-width // size)
+
+    with open(os.path.join(root, name + TILE_SUFFIX), "wb") as out:
+        for tile_row in range(tile_rows):
+            start = tile_row * size
+            stop = min(start + size, height)
+            band = np.full((size, tile_cols * size), nodata, dtype=dtype)
+            values = np.asarray(rows(start, stop), dtype=dtype)
+            band[:stop - start, :width] = np.where(np.isnan(values), nodata, values)
+            # (size, cols * size) -> (cols, size, size): tile-major order.
+            out.write(band.reshape(size, tile_cols, size).transpose(1, 0, 2).tobytes())
+
+    manifest["layers"][name] = {"dtype": dtype, "nodata": nodata, "units": units}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
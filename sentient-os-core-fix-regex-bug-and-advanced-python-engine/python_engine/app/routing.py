@@ -0,0 +1,86 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+
+class KeywordMatcher:
+    """
+    Single-pass keyword automaton used for intent routing.
+    Compiled once from an intent -> keywords table; one scan of the lowercased
+    query returns every intent whose keywords occur in it (substring semantics,
+    identical to the `k in query_lower` checks it replaces).
+    """
+    def __init__(self, table: Dict[str, Iterable[str]]):
+        self.table = {intent: tuple(keywords) for intent, keywords in table.items()}
+
+        intents_by_keyword: Dict[str, set] = {}
+        for intent, keywords in self.table.items():
+            for keyword in keywords:
+                intents_by_keyword.setdefault(keyword.lower(), set()).add(intent)
+
+        keywords = sorted(intents_by_keyword, key=len, reverse=True)
+
+        # The lookahead alternation reports the longest keyword starting at each
+        # position, so every keyword also carries the intents of the shorter
+        # keywords it contains ("planetary" implies "planet").
+        self._intents_for: Dict[str, FrozenSet[str]] = {}
+        for keyword in keywords:
+            implied = set()
+            for other in keywords:
+                if other in keyword:
+                    implied |= intents_by_keyword[other]
+            self._intents_for[keyword] = frozenset(implied)
+
+        if keywords:
+            alternation = "|".join(re.escape(k) for k in keywords)
+            self._pattern = re.compile(f"(?=({alternation}))")
+        else:
+            self._pattern = None
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """Returns the set of intents triggered by `text`."""
+        if self._pattern is None:
+            return frozenset()
+        intents_for = self._intents_for
+        found = {m.group(1) for m in self._pattern.finditer(text.lower())}
+        if not found:
+            return frozenset()
+        if len(found) == 1:
+            return intents_for[found.pop()]
+        return frozenset().union(*(intents_for[k] for k in found))
+
+
+def route_intent(code: str) -> str:
+    """Intent emitted when a query mentions one of a division's routing keywords."""
+    return f"route:{code}"
+
+
+def capability_intent(code: str, capability: str) -> str:
+    """Intent emitted when a query selects a division's sub-capability."""
+    return f"cap:{code}:{capability}"
+
+
+def trigger_intent(name: str, group: int) -> str:
+    """Intent emitted for one keyword group of a collaboration trigger."""
+    return f"collab:{name}:{group}"
+
+
+def build_router(
+    divisions: Iterable,
+    triggers: Iterable[Tuple[str, Tuple[Tuple[str, ...], ...]]] = (),
+) -> KeywordMatcher:
+    """
+    Builds the shared matcher from the declared keyword tables of the division
+    classes and the orchestrator's collaboration triggers.
+    """
+    table: Dict[str, List[str]] = {}
+    for division in divisions:
+        table.update(division.intent_table())
+    for name, groups in triggers:
+        for index, keywords in enumerate(groups):
+            table[trigger_intent(name, index)] = list(keywords)
+    return KeywordMatcher(table)
+
+
+def triggered(intents: FrozenSet[str], name: str, groups: Tuple[Tuple[str, ...], ...]) -> bool:
+    """A collaboration trigger fires when every one of its keyword groups matched."""
+    return all(trigger_intent(name, index) in intents for index in range(len(groups)))
@@ -0,0 +1,434 @@
+import csv
+import hashlib
+import json
+import multiprocessing
+import mmap
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_SCREENING_DIR = os.environ.get("AEOS_SCREENING_DIR", os.path.join("data", "screening"))
+DEFAULT_NAME_THRESHOLD = float(os.environ.get("AEOS_SCREENING_NAME_THRESHOLD", "0.85"))
+DEFAULT_RELOAD_INTERVAL = float(os.environ.get("AEOS_SCREENING_RELOAD_S", "30"))
+
+# <root>/lists/<list name>.csv holds the source lists, one "identifier,name"
+# row per entry (either may be empty); <root>/index/v<N>/ holds built indexes.
+SOURCES = "lists"
+INDEXES = "index"
+MANIFEST = "manifest.json"
+
+# ~1% Bloom filter false positives.
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+# Phonetic candidates scored per name before giving up on the rest.
+FUZZY_CANDIDATES = 64
+
+# Key kinds: exact identifier, normalized name, phonetic name skeleton.
+ID, NAME, PHONETIC = "i", "n", "p"
+
+# Honorifics and legal-form suffixes ignored when comparing names.
+NAME_NOISE = frozenset({"mr", "mrs", "ms", "dr", "the", "ltd", "llc", "inc", "co", "corp", "company", "gmbh", "sa"})
+
+_NON_WORD = re.compile(r"[\W_]+")
+_SKELETON_DROP = str.maketrans("", "", "aeiouhwy")
+_REPEATS = re.compile(r"(.)\1+")
+_MASK32 = 0xFFFFFFFF
+_blake2b = hashlib.blake2b
+
+
+def normalize_id(identifier: str) -> str:
+    return identifier.strip().casefold()
+
+
+def normalize_name(name: str) -> str:
+    """Case-, accent-, punctuation- and word-order-insensitive form of a name."""
+    text = name.casefold()
+    if not text.isascii():
+        text = "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+    tokens = [t for t in _NON_WORD.sub(" ", text).split() if t not in NAME_NOISE]
+    return " ".join(sorted(tokens))
+
+
+def phonetic_key(normalized: str) -> str:
+    """
+    Coarse spelling-variant key: each token keeps its first letter and its
+    consonants, with repeats collapsed ("mohammed", "muhammad" -> "md").
+    """
+    skeletons = sorted(token[0] + token[1:].translate(_SKELETON_DROP) for token in normalized.split())
+    return _REPEATS.sub(r"\1", " ".join(skeletons))
+
+
+def key_hash(kind: str, value: str) -> int:
+    return int.from_bytes(_blake2b((kind + value).encode(), digest_size=8).digest(), "little")
+
+
+def _bloom_positions(hashes: np.ndarray, bits: int, count: int) -> np.ndarray:
+    """(len(hashes), count) bit positions by double hashing."""
+    h1 = hashes & np.uint64(_MASK32)
+    h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+    steps = np.arange(count, dtype=np.uint64)
+    return (h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(bits)
+
+
+def fingerprint(sources: str) -> str:
+    """Changes whenever a source list is added, removed or rewritten."""
+    entries = []
+    if os.path.isdir(sources):
+        for name in sorted(os.listdir(sources)):
+            if name.endswith(".csv"):
+                stat = os.stat(os.path.join(sources, name))
+                entries.append((name, stat.st_size, stat.st_mtime_ns))
+    return hashlib.blake2b(json.dumps(entries).encode(), digest_size=16).hexdigest()
+
+
+def build_index(sources: str, out: str, version: int = 1) -> Dict[str, Any]:
+    """
+    Builds an index of every list in `sources` into the directory `out`:
+    - keys.npy / rows.npy: sorted 64-bit key hashes and the entry each belongs to
+    - bloom.bin: Bloom filter over the key hashes
+    - lists.npy: list id per entry; names.bin / name_offsets.npy: entry names
+    """
+    os.makedirs(out, exist_ok=True)
+    fp = fingerprint(sources)
+    lists = sorted(name[:-4] for name in os.listdir(sources) if name.endswith(".csv")) if os.path.isdir(sources) else []
+    hashes, rows, list_ids = array("Q"), array("I"), array("H")
+    names = bytearray()
+    offsets = array("Q", [0])
+
+    for list_id, list_name in enumerate(lists):
+        with open(os.path.join(sources, list_name + ".csv"), newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            for record in reader:
+                if not record or record[0].startswith("#"):
+                    continue
+                identifier = record[0].strip()
+                name = record[1].strip() if len(record) > 1 else ""
+                if reader.line_num == 1 and (identifier.lower(), name.lower()) == ("identifier", "name"):
+                    continue
+                row = len(list_ids)
+                list_ids.append(list_id)
+                names += name.encode("utf-8")
+                offsets.append(len(names))
+                if identifier:
+                    hashes.append(key_hash(ID, normalize_id(identifier)))
+                    rows.append(row)
+                normalized = normalize_name(name)
+                if normalized:
+                    hashes.append(key_hash(NAME, normalized))
+                    rows.append(row)
+                    hashes.append(key_hash(PHONETIC, phonetic_key(normalized)))
+                    rows.append(row)
+
+    keys = np.frombuffer(hashes, dtype=np.uint64) if hashes else np.zeros(0, dtype=np.uint64)
+    order = np.argsort(keys, kind="stable")
+    np.save(os.path.join(out, "keys.npy"), keys[order])
+    np.save(os.path.join(out, "rows.npy"), np.frombuffer(rows, dtype=np.uint32)[order] if rows else np.zeros(0, np.uint32))
+    np.save(os.path.join(out, "lists.npy"), np.frombuffer(list_ids, dtype=np.uint16) if list_ids else np.zeros(0, np.uint16))
+    np.save(os.path.join(out, "name_offsets.npy"), np.frombuffer(offsets, dtype=np.uint64))
+    with open(os.path.join(out, "names.bin"), "wb") as f:
+        f.write(names)
+
+    bloom_bits = max(64, -(-len(keys) * BLOOM_BITS_PER_KEY // 8) * 8)
+    bloom = np.zeros(bloom_bits // 8, dtype=np.uint8)
+    for start in range(0, len(keys), 1 << 20):
+        positions = _bloom_positions(keys[start:start + (1 << 20)], bloom_bits, BLOOM_HASHES).ravel()
+        np.bitwise_or.at(bloom, positions >> np.uint64(3), (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+    with open(os.path.join(out, "bloom.bin"), "wb") as f:
+        f.write(bloom.tobytes())
+
+    manifest = {
+        "version": version,
+        "fingerprint": fp,
+        "lists": lists,
+        "entries": len(list_ids),
+        "keys": len(keys),
+        "bloom_bits": bloom_bits,
+        "bloom_hashes": BLOOM_HASHES,
+        "built": time.time(),
+    }
+    with open(os.path.join(out, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def _map_bytes(path: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ScreeningIndex:
+    """
+    A built index opened read-only. Every array is memory-mapped, so opening
+    is cheap and the page cache is shared between processes. Lookups hash the
+    key, reject most misses in the Bloom filter and binary-search the sorted
+    key table for the rest.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.version: int = manifest["version"]
+        self.fingerprint: str = manifest["fingerprint"]
+        self.lists: List[str] = manifest["lists"]
+        self.entries: int = manifest["entries"]
+        self.bloom_bits: int = manifest["bloom_bits"]
+        self.bloom_hashes: int = manifest["bloom_hashes"]
+        # Plain ndarray views of the maps: np.memmap wraps every result it returns.
+        self.keys = self._load("keys.npy")
+        self.rows = self._load("rows.npy")
+        self.list_ids = self._load("lists.npy")
+        self.name_offsets = self._load("name_offsets.npy")
+        self._names = _map_bytes(os.path.join(path, "names.bin"))
+        self._bloom = _map_bytes(os.path.join(path, "bloom.bin"))
+        self._bloom_array = np.frombuffer(self._bloom, dtype=np.uint8)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.asarray(np.load(os.path.join(self.path, name), mmap_mode="r"))
+
+    def _might_contain(self, h: int) -> bool:
+        bits, bloom = self.bloom_bits, self._bloom
+        h1, h2 = h & _MASK32, (h >> 32) | 1
+        for i in range(self.bloom_hashes):
+            position = (h1 + i * h2) % bits
+            if not (bloom[position >> 3] >> (position & 7)) & 1:
+                return False
+        return True
+
+    def _lookup(self, kind: str, value: str) -> np.ndarray:
+        """Entry rows stored under a key."""
+        h = key_hash(kind, value)
+        if not self._might_contain(h):
+            return self.rows[:0]
+        keys, needle = self.keys, np.uint64(h)
+        lo = hi = int(keys.searchsorted(needle))
+        while hi < len(keys) and keys[hi] == needle:
+            hi += 1
+        return self.rows[lo:hi]
+
+    def name(self, row: int) -> str:
+        return bytes(self._names[int(self.name_offsets[row]):int(self.name_offsets[row + 1])]).decode("utf-8")
+
+    def _match(self, subject: str, row: int, kind: str, score: float) -> Dict[str, Any]:
+        return {"subject": subject, "list": self.lists[int(self.list_ids[row])], "name": self.name(row),
+                "match": kind, "score": round(score, 3)}
+
+    def check_id(self, identifier: str) -> List[Dict[str, Any]]:
+        """Exact matches of a user id or wallet address."""
+        return [self._match(identifier, row, "id", 1.0) for row in self._lookup(ID, normalize_id(identifier))]
+
+    def match_name(self, name: str, threshold: float = DEFAULT_NAME_THRESHOLD) -> List[Dict[str, Any]]:
+        """Exact normalized-name matches, else phonetic candidates scored by similarity."""
+        normalized = normalize_name(name)
+        if not normalized:
+            return []
+        exact = self._lookup(NAME, normalized)
+        if len(exact):
+            return [self._match(name, row, "name", 1.0) for row in exact]
+        matches = []
+        for row in self._lookup(PHONETIC, phonetic_key(normalized))[:FUZZY_CANDIDATES]:
+            matcher = SequenceMatcher(None, normalized, normalize_name(self.name(row)))
+            # Cheap upper bounds first; ratio() is quadratic in name length.
+            if matcher.real_quick_ratio() >= threshold and matcher.quick_ratio() >= threshold:
+                score = matcher.ratio()
+                if score >= threshold:
+                    matches.append(self._match(name, row, "fuzzy", score))
+        return matches
+
+    def contains_ids(self, identifiers: Sequence[str]) -> np.ndarray:
+        """Vectorized exact-id screening: a boolean hit mask over `identifiers`."""
+        if not len(identifiers) or not len(self.keys):
+            return np.zeros(len(identifiers), dtype=bool)
+        hashes = np.fromiter((key_hash(ID, normalize_id(i)) for i in identifiers), np.uint64, len(identifiers))
+        positions = _bloom_positions(hashes, self.bloom_bits, self.bloom_hashes)
+        bits = (self._bloom_array[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        hits = bits.all(axis=1)
+        candidates = np.flatnonzero(hits)
+        found = self.keys.searchsorted(hashes[candidates])
+        hits[candidates] = self.keys[np.minimum(found, len(self.keys) - 1)] == hashes[candidates]
+        return hits
+
+
+class Screener:
+    """
+    Sanctions/KYC screening against the lists in `<root>/lists`.
+
+    The newest index under `<root>/index` is opened at start-up and rebuilt
+    when the source lists change: a background thread polls the lists every
+    `reload_interval` seconds, builds a new index version beside the current
+    one and swaps it in with a single reference assignment. Requests already
+    screening against the old index finish on it; nothing waits on a rebuild.
+
+    In a forked worker, `follow()` replaces the rebuilding thread with one that
+    only opens the newer versions the supervisor builds.
+    """
+    def __init__(
+        self,
+        root: str = DEFAULT_SCREENING_DIR,
+        threshold: float = DEFAULT_NAME_THRESHOLD,
+        reload_interval: float = DEFAULT_RELOAD_INTERVAL,
+    ):
+        self.root = root
+        self.sources = os.path.join(root, SOURCES)
+        self.indexes = os.path.join(root, INDEXES)
+        self.threshold = threshold
+        self.reload_interval = reload_interval
+        self._reload_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.checks = 0
+        self.hits = 0
+        self.reloads = 0
+        self.reload_errors = 0
+        self.last_error: Optional[str] = None
+
+        self.index: Optional[ScreeningIndex] = self._open_latest()
+        if self.index is None or self.index.fingerprint != fingerprint(self.sources):
+            self.reload()
+        if reload_interval > 0:
+            self._thread = threading.Thread(target=self._run, name="aeos-screening", daemon=True)
+            self._thread.start()
+
+    @classmethod
+    def open(cls, root: Optional[str] = DEFAULT_SCREENING_DIR) -> Optional["Screener"]:
+        """The screener for `root`, or None when no lists or index are installed there."""
+        if not root or not (os.path.isdir(os.path.join(root, SOURCES)) or os.path.isdir(os.path.join(root, INDEXES))):
+            return None
+        return cls(root)
+
+    def _versions(self) -> List[int]:
+        if not os.path.isdir(self.indexes):
+            return []
+        return sorted(
+            int(name[1:]) for name in os.listdir(self.indexes)
+            if name.startswith("v") and name[1:].isdigit()
+            and os.path.exists(os.path.join(self.indexes, name, MANIFEST))
+        )
+
+    def _open_latest(self) -> Optional[ScreeningIndex]:
+        versions = self._versions()
+        return ScreeningIndex(os.path.join(self.indexes, f"v{versions[-1]}")) if versions else None
+
+    def reload(self) -> bool:
+        """Rebuilds and swaps in the index if the source lists changed."""
+        with self._reload_lock:
+            current = self.index
+            if not os.path.isdir(self.sources) or (current is not None and current.fingerprint == fingerprint(self.sources)):
+                return False
+            version = max(self._versions(), default=0) + 1
+            final = os.path.join(self.indexes, f"v{version}")
+            staging = final + ".tmp"
+            shutil.rmtree(staging, ignore_errors=True)
+            if current is None:
+                build_index(self.sources, staging, version)
+            else:
+                # Rebuilds run in a child process so they never hold this
+                # process's GIL while requests are screened.
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    pool.submit(build_index, self.sources, staging, version).result()
+            os.replace(staging, final)
+            self.index = ScreeningIndex(final)
+            self.reloads += 1
+            # Open maps keep superseded files readable until their last reader is done.
+            for old in self._versions():
+                if old < version:
+                    shutil.rmtree(os.path.join(self.indexes, f"v{old}"), ignore_errors=True)
+            return True
+
+    def _run(self):
+        while not self._closed.wait(self.reload_interval):
+            try:
+                self.reload()
+            except Exception as e:
+                # Keep screening against the last good index.
+                self.reload_errors += 1
+                self.last_error = str(e)
+
+    def follow(self):
+        """
+        Called in a process forked from the one running this screener: its
+        thread did not survive the fork, so poll for index versions built by
+        the parent instead of rebuilding them here as well.
+        """
+        self._reload_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._thread = None
+        if self.reload_interval > 0:
+            self._thread = threading.Thread(target=self._follow, name="aeos-screening", daemon=True)
+            self._thread.start()
+
+    def _follow(self):
+        while not self._closed.wait(self.reload_interval):
+            try:
+                versions = self._versions()
+                if versions and versions[-1] > (self.version or 0):
+                    self.index = ScreeningIndex(os.path.join(self.indexes, f"v{versions[-1]}"))
+                    self.reloads += 1
+            except Exception as e:
+                # The parent may be swapping versions; retry on the next poll.
+                self.reload_errors += 1
+                self.last_error = str(e)
+
+    def screen(self, subject: str, name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Matches for one subject: `subject` as an exact user id or wallet
+        address, and `name` (default: `subject`) as a fuzzy name.
+        """
+        index = self.index
+        if index is None:
+            return []
+        matches = index.check_id(subject) + index.match_name(name or subject, self.threshold)
+        self.checks += 1
+        self.hits += bool(matches)
+        return matches
+
+    def screen_many(self, identifiers: Sequence[str]) -> Dict[int, List[Dict[str, Any]]]:
+        """
+        Batch exact-id screening. Returns the matches of each hit, keyed by its
+        position in `identifiers`; clean identifiers are omitted.
+        """
+        index = self.index
+        if index is None:
+            return {}
+        hits = np.flatnonzero(index.contains_ids(identifiers))
+        self.checks += len(identifiers)
+        self.hits += len(hits)
+        return {int(i): index.check_id(identifiers[i]) for i in hits}
+
+    def screen_all(self, subjects: Iterable[str]) -> List[Dict[str, Any]]:
+        return [match for subject in subjects for match in self.screen(subject)]
+
+    @property
+    def version(self) -> Optional[int]:
+        index = self.index
+        return index.version if index is not None else None
+
+    def close(self):
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        index = self.index
+        return {
+            "version": index.version if index else None,
+            "lists": index.lists if index else [],
+            "entries": index.entries if index else 0,
+            "checks": self.checks,
+            "hits": self.hits,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,224 @@
+import os
+import re
+import threading
+from itertools import repeat
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Defaults, overridable per deployment through the environment.
+# Optional `token<TAB>weight` file whose entries extend or override LEXICON.
+DEFAULT_LEXICON_PATH = os.environ.get("AEOS_SENTIMENT_LEXICON") or None
+DEFAULT_CACHE_SIZE = int(os.environ.get("AEOS_SENTIMENT_CACHE_SIZE", "65536"))
+
+# Token valences, from -3 (very negative) to +3 (very positive), for how
+# users feel about the service. Domain vocabulary (floods, refunds, risk,
+# sanctions, treasury optimization...) is deliberately absent: routine
+# requests that mention it are neutral.
+LEXICON: Dict[str, float] = {
+    # Positive
+    "thanks": 2.0, "thank": 1.5, "thx": 1.5, "appreciate": 2.0, "appreciated": 2.0,
+    "great": 2.5, "good": 1.5, "nice": 1.5, "excellent": 3.0, "awesome": 3.0,
+    "amazing": 3.0, "perfect": 2.5, "love": 2.5, "like": 1.0, "happy": 2.5,
+    "glad": 2.0, "pleased": 2.0, "helpful": 2.0, "useful": 1.5, "fast": 1.0,
+    "quick": 1.0, "easy": 1.5, "smooth": 1.5, "reliable": 1.5, "success": 2.0,
+    "successful": 2.0, "resolved": 1.5, "fixed": 1.5, "works": 1.0, "working": 0.5,
+    "welcome": 1.5, "please": 0.5, "fine": 0.5, "wonderful": 3.0, "fantastic": 3.0,
+    "best": 2.5, "better": 1.5,
+    # Negative
+    "bad": -2.0, "terrible": -3.0, "awful": -3.0, "horrible": -3.0, "worst": -3.0,
+    "worse": -2.0, "hate": -3.0, "angry": -2.5, "furious": -3.0, "upset": -2.0,
+    "annoyed": -2.0, "frustrated": -2.5, "frustrating": -2.5, "disappointed": -2.5,
+    "disappointing": -2.5, "unacceptable": -3.0, "useless": -2.5, "ridiculous": -2.0,
+    "broken": -2.0, "bug": -1.5, "bugs": -1.5, "crash": -2.0, "crashed": -2.0,
+    "error": -1.5, "errors": -1.5, "fail": -2.0, "failed": -2.0, "failing": -2.0,
+    "failure": -2.0, "problem": -1.5, "problems": -1.5, "wrong": -1.5, "stuck": -1.5,
+    "slow": -1.5, "lost": -2.0, "stolen": -3.0, "fraud": -3.0, "scam": -3.0,
+    "hacked": -3.0, "denied": -2.0, "rejected": -1.5, "complaint": -2.0,
+    "complain": -2.0, "worried": -2.0, "confused": -1.0, "outage": -2.0,
+    "never": -0.5, "cannot": -0.5, "sad": -2.0, "sorry": -0.5, "poor": -2.0,
+}
+# Tokens that flip the valence of the words after them ("not good").
+NEGATORS = frozenset({
+    "not", "no", "never", "without", "cannot", "can't", "don't", "doesn't", "didn't",
+    "isn't", "wasn't", "aren't", "won't", "wouldn't", "shouldn't", "haven't", "hasn't",
+})
+# Tokens that strengthen the word right after them ("very slow").
+BOOSTERS = frozenset({
+    "very", "really", "so", "extremely", "super", "totally", "completely", "absolutely",
+    "incredibly", "highly", "too",
+})
+
+# How far negation reaches, in tokens, and the factor applied to negated
+# valences (a negated word is weaker than its opposite: "not bad" is mildly
+# positive).
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.74
+BOOST_FACTOR = 1.3
+# Normalization of the summed valence into (-1, 1): s / sqrt(s^2 + alpha).
+ALPHA = 15.0
+# Scores at or beyond these thresholds are labelled positive or negative.
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+TOKEN_PATTERN = re.compile(r"[a-z]+(?:'[a-z]+)?|\n")
+
+# Token kinds in the compiled table.
+_PLAIN, _NEGATOR, _BOOSTER, _SEPARATOR = 0, 1, 2, 3
+
+
+def normalize(text: str) -> str:
+    """Cache key for `text`: lowercased with runs of whitespace collapsed."""
+    return " ".join(text.lower().split())
+
+
+def load_lexicon(path: str) -> Dict[str, float]:
+    lexicon = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            token, _, weight = line.strip().partition("\t")
+            if token and not token.startswith("#"):
+                lexicon[token.lower()] = float(weight)
+    return lexicon
+
+
+class SentimentScorer:
+    """
+    Lexicon-based sentiment of user queries.
+
+    The lexicon is compiled once into a hashed table from token to a row of
+    NumPy weight and kind arrays (plain, negator, booster). A query's score is
+    the sum of its token valences, each boosted by a preceding booster and
+    flipped by a negator within NEGATION_SCOPE tokens, squashed into (-1, 1).
+    `score` handles one query in a few microseconds; `score_many` scores a
+    whole batch in one pass of array operations. Scores are cached by
+    normalized text, up to `cache_size` entries (oldest dropped first).
+    """
+    def __init__(self, lexicon: Optional[Dict[str, float]] = None, cache_size: int = DEFAULT_CACHE_SIZE):
+        lexicon = dict(LEXICON if lexicon is None else lexicon)
+        tokens = sorted(set(lexicon) | NEGATORS | BOOSTERS)
+        # Row 0 is every unknown token, the last row the batch separator.
+        self._rows: Dict[str, int] = {token: row for row, token in enumerate(tokens, 1)}
+        self._rows["\n"] = len(tokens) + 1
+        self._weights = np.zeros(len(tokens) + 2)
+        self._kinds = np.zeros(len(tokens) + 2, dtype=np.int8)
+        for token, row in self._rows.items():
+            self._weights[row] = lexicon.get(token, 0.0)
+            self._kinds[row] = (_NEGATOR if token in NEGATORS else _BOOSTER if token in BOOSTERS
+                                else _SEPARATOR if token == "\n" else _PLAIN)
+        # The single-query path reads (weight, kind) tuples from the same table.
+        self._table: Dict[str, Tuple[float, int]] = {
+            token: (float(self._weights[row]), int(self._kinds[row])) for token, row in self._rows.items()
+        }
+        self.cache_size = cache_size
+        self._cache: Dict[str, float] = {}
+        # Serializes cache writes across request and division threads; reads take no lock.
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "SentimentScorer":
+        lexicon = dict(LEXICON)
+        if DEFAULT_LEXICON_PATH:
+            lexicon.update(load_lexicon(DEFAULT_LEXICON_PATH))
+        return cls(lexicon)
+
+    def _compute(self, text: str) -> float:
+        table = self._table
+        total = 0.0
+        boost = 1.0
+        negated_until = -1
+        for position, token in enumerate(TOKEN_PATTERN.findall(text)):
+            weight, kind = table.get(token, (0.0, _PLAIN))
+            if weight:
+                if position <= negated_until:
+                    weight *= NEGATION_FACTOR
+                total += weight * boost
+            boost = BOOST_FACTOR if kind == _BOOSTER else 1.0
+            if kind == _NEGATOR:
+                negated_until = position + NEGATION_SCOPE
+        return total / (total * total + ALPHA) ** 0.5
+
+    def _store(self, key: str, score: float):
+        cache = self._cache
+        with self._lock:
+            if len(cache) >= self.cache_size:
+                cache.pop(next(iter(cache), None), None)
+            cache[key] = score
+
+    def score(self, text: str) -> float:
+        """Sentiment of `text` in (-1, 1)."""
+        key = normalize(text)
+        score = self._cache.get(key)
+        if score is None:
+            self.misses += 1
+            score = self._compute(key)
+            if self.cache_size > 0:
+                self._store(key, score)
+        else:
+            self.hits += 1
+        return score
+
+    def score_many(self, texts: Sequence[str]) -> np.ndarray:
+        """Sentiment of each of `texts`, computing every uncached one in a single vectorized pass."""
+        keys = [normalize(text) for text in texts]
+        cached = self._cache
+        missing = list(dict.fromkeys(key for key in keys if key not in cached))
+        computed = dict(zip(missing, self._compute_many(missing))) if missing else {}
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+        if self.cache_size > 0:
+            for key, score in computed.items():
+                self._store(key, score)
+        return np.array([computed[key] if key in computed else cached.get(key, 0.0) for key in keys])
+
+    def _compute_many(self, keys: List[str]) -> np.ndarray:
+        # Normalized texts hold no newlines, so one separates them in a single token stream.
+        tokens = TOKEN_PATTERN.findall("\n".join(keys))
+        rows = np.fromiter(map(self._rows.get, tokens, repeat(0)), dtype=np.intp, count=len(tokens))
+        kinds = self._kinds[rows]
+        document = np.cumsum(kinds == _SEPARATOR)
+
+        weights = self._weights[rows]
+        boosted = np.zeros(len(rows), dtype=bool)
+        boosted[1:] = kinds[:-1] == _BOOSTER
+        weights[boosted] *= BOOST_FACTOR
+
+        negators = kinds == _NEGATOR
+        negated = np.zeros(len(rows), dtype=bool)
+        for distance in range(1, NEGATION_SCOPE + 1):
+            negated[distance:] |= negators[:-distance] & (document[distance:] == document[:-distance])
+        weights[negated] *= NEGATION_FACTOR
+
+        totals = np.bincount(document, weights=weights, minlength=len(keys))
+        return totals / np.sqrt(totals * totals + ALPHA)
+
+    @staticmethod
+    def label_of(score: float) -> str:
+        if score >= POSITIVE_THRESHOLD:
+            return "positive"
+        if score <= NEGATIVE_THRESHOLD:
+            return "negative"
+        return "neutral"
+
+    def label(self, text: str) -> str:
+        """Label of `text`: positive, negative or neutral."""
+        return self.label_of(self.score(text))
+
+    def label_many(self, texts: Sequence[str]) -> List[str]:
+        return [self.label_of(score) for score in self.score_many(texts).tolist()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "vocabulary": len(self._rows) - 1,
+            "cache_size": self.cache_size,
+            "entries": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Shared by the orchestrator and HID: the lexicon is compiled once per process.
+SENTIMENT = SentimentScorer.from_env()
@@ -0,0 +1,272 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.cache import ENTRY_OVERHEAD, estimate_size
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_MAX_BYTES = int(os.environ.get("AEOS_SESSION_MAX_BYTES", str(32 * 1024 * 1024)))
+DEFAULT_IDLE_TTL = float(os.environ.get("AEOS_SESSION_TTL", "1800"))
+DEFAULT_RESULT_TTL = float(os.environ.get("AEOS_SESSION_RESULT_TTL", "300"))
+DEFAULT_SNAPSHOT_PATH = os.environ.get("AEOS_SESSION_SNAPSHOT") or None
+# Seconds after a route during which a follow-up query may continue it.
+DEFAULT_PIN_WINDOW = float(os.environ.get("AEOS_SESSION_PIN_WINDOW", "120"))
+
+# Division results kept per session; the oldest is dropped first.
+MAX_RESULTS = 8
+# Cues marking a query as continuing the previous one ("and tomorrow?").
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:and|also|again|same|instead|too|more|what about|how about|tomorrow|next)\b", re.IGNORECASE)
+
+
+class Session:
+    """
+    Compact per-user context: the division and capability of the last
+    single-division route, the last workflow (recorded at wall-clock time
+    `routed`), and recent division results keyed by the division's cache key,
+    each with the wall-clock time it was produced.
+    """
+    __slots__ = ("division", "capability", "workflow", "routed", "results", "updated", "size")
+
+    def __init__(self, updated: float):
+        self.division: Optional[str] = None
+        self.capability: Optional[str] = None
+        self.workflow: Optional[str] = None
+        self.routed = 0.0
+        self.results: Dict[Tuple[str, ...], Tuple[float, Dict[str, Any]]] = {}
+        self.updated = updated
+        self.size = ENTRY_OVERHEAD
+
+    def measure(self) -> int:
+        self.size = ENTRY_OVERHEAD + sum(estimate_size(key) + estimate_size(result) for key, (_, result) in self.results.items())
+        return self.size
+
+
+class SessionStore:
+    """
+    Per-user_id session context with a hard memory cap.
+    Sessions idle for `idle_ttl` seconds expire, and the least recently used
+    sessions are evicted while the estimated size exceeds `max_bytes`. Stored
+    results are reusable for `result_ttl` seconds. A query continues the last
+    route (`follow_up`) only with a follow-up cue, within `pin_window` seconds. With `snapshot_path`, the
+    store is loaded at construction and written back by `snapshot()`. Workers
+    of a preforked server snapshot to their own `<snapshot_path>.<partition>`
+    files, which are loaded together with the main one.
+
+    With `shared` (a SharedCache, in the preforked server), each user's last
+    route is also published to memory shared by every worker, and a worker
+    adopts it when it is newer than its own. A follow-up query can therefore
+    land on any worker. Stored results stay per worker; cacheable steps of a
+    re-run still hit the shared response cache.
+    """
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        idle_ttl: float = DEFAULT_IDLE_TTL,
+        result_ttl: float = DEFAULT_RESULT_TTL,
+        snapshot_path: Optional[str] = DEFAULT_SNAPSHOT_PATH,
+        shared=None,
+        pin_window: float = DEFAULT_PIN_WINDOW,
+    ):
+        self.max_bytes = max_bytes
+        self.idle_ttl = idle_ttl
+        self.result_ttl = result_ttl
+        self.pin_window = pin_window
+        self.snapshot_path = snapshot_path
+        self._snapshot_root = snapshot_path
+        self.shared = shared
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.pinned = 0
+        self.reused = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if snapshot_path:
+            self._load()
+
+    def _touch(self, user_id: str, now: float) -> Session:
+        """Returns the live session for `user_id`, creating it if needed. Lock held."""
+        session = self._sessions.get(user_id)
+        if session is None:
+            session = self._sessions[user_id] = Session(now)
+            self._bytes += session.size
+        else:
+            session.updated = now
+            self._sessions.move_to_end(user_id)
+        return session
+
+    def _resize(self, session: Session):
+        previous = session.size
+        self._bytes += session.measure() - previous
+        while self._bytes > self.max_bytes and self._sessions:
+            _, evicted = self._sessions.popitem(last=False)
+            self._bytes -= evicted.size
+            self.evictions += 1
+
+    def _expire(self, now: float):
+        while self._sessions:
+            user_id, session = next(iter(self._sessions.items()))
+            if now - session.updated < self.idle_ttl:
+                break
+            del self._sessions[user_id]
+            self._bytes -= session.size
+            self.expirations += 1
+
+    def _adopt(self, user_id: str):
+        """Takes over a newer route another worker published for `user_id`. Lock held."""
+        found = self.shared.get(user_id)
+        if found is None:
+            return
+        division, capability, workflow, routed = found[0]
+        session = self._sessions.get(user_id)
+        if session is not None and session.routed >= routed:
+            return
+        session = self._touch(user_id, max(routed, session.updated if session is not None else routed))
+        session.division, session.capability, session.workflow, session.routed = division, capability, workflow, routed
+        self._resize(session)
+
+    def get(self, user_id: Optional[str]) -> Optional[Session]:
+        if not user_id:
+            return None
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if self.shared is not None:
+                self._adopt(user_id)
+            return self._sessions.get(user_id)
+
+    def follow_up(self, user_id: Optional[str], query: str) -> Optional[Session]:
+        """The session `query` continues: it needs a follow-up cue and a route under `pin_window` seconds old."""
+        if not user_id or not FOLLOW_UP_PATTERN.search(query):
+            return None
+        session = self.get(user_id)
+        if session is None or time.time() - session.routed >= self.pin_window:
+            return None
+        return session
+
+    def remember_route(self, user_id: Optional[str], division: Optional[str] = None,
+                       capability: Optional[str] = None, workflow: Optional[str] = None):
+        """Records the route taken for `user_id`'s latest query."""
+        if not user_id:
+            return
+        now = time.time()
+        with self._lock:
+            if self.shared is not None:
+                self._adopt(user_id)
+            session = self._touch(user_id, now)
+            session.workflow = workflow
+            session.routed = now
+            if division is not None:
+                session.division = division
+                session.capability = capability
+            if self.shared is not None:
+                route = (session.division, session.capability, session.workflow, now)
+                self.shared.put(user_id, route, time.monotonic() + self.idle_ttl)
+
+    def remember_result(self, user_id: Optional[str], key: Tuple[str, ...], result: Dict[str, Any]):
+        if not user_id:
+            return
+        now = time.time()
+        with self._lock:
+            session = self._touch(user_id, now)
+            session.results.pop(key, None)
+            session.results[key] = (now, result)
+            while len(session.results) > MAX_RESULTS:
+                del session.results[next(iter(session.results))]
+            self._resize(session)
+            self._expire(now)
+
+    def result(self, user_id: Optional[str], key: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """A result stored under `key` for `user_id`, if it is still fresh."""
+        session = self.get(user_id)
+        if session is None:
+            return None
+        entry = session.results.get(key)
+        if entry is None or time.time() - entry[0] >= self.result_ttl:
+            return None
+        self.reused += 1
+        return entry[1]
+
+    # -- snapshots --------------------------------------------------------
+
+    def partition(self, name: str):
+        """Snapshots to `<snapshot_path>.<name>` from now on."""
+        if self._snapshot_root:
+            self.snapshot_path = f"{self._snapshot_root}.{name}"
+
+    def snapshot(self):
+        """Writes live sessions to `snapshot_path` (atomically replaced)."""
+        if not self.snapshot_path:
+            return
+        with self._lock:
+            self._expire(time.time())
+            data = {
+                user_id: {
+                    "division": s.division,
+                    "capability": s.capability,
+                    "workflow": s.workflow,
+                    "updated": s.updated,
+                    "results": [[list(key), ts, result] for key, (ts, result) in s.results.items()],
+                }
+                for user_id, s in self._sessions.items()
+            }
+        directory = os.path.dirname(self.snapshot_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temporary = self.snapshot_path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temporary, self.snapshot_path)
+
+    def _snapshot_files(self):
+        directory = os.path.dirname(self._snapshot_root) or "."
+        base = os.path.basename(self._snapshot_root)
+        if not os.path.isdir(directory):
+            return []
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if (name == base or name.startswith(base + ".")) and not name.endswith(".tmp")]
+
+    def _load(self):
+        data: Dict[str, Any] = {}
+        for path in self._snapshot_files():
+            with open(path, encoding="utf-8") as f:
+                for user_id, raw in json.load(f).items():
+                    # A user served by several workers keeps the newest session.
+                    if user_id not in data or raw["updated"] > data[user_id]["updated"]:
+                        data[user_id] = raw
+        now = time.time()
+        # Oldest first, so LRU order survives the round trip.
+        for user_id, raw in sorted(data.items(), key=lambda item: item[1]["updated"]):
+            if now - raw["updated"] >= self.idle_ttl:
+                continue
+            session = self._touch(user_id, raw["updated"])
+            session.division = raw["division"]
+            session.capability = raw["capability"]
+            session.workflow = raw["workflow"]
+            session.routed = raw["updated"]
+            session.results = {tuple(key): (ts, result) for key, ts, result in raw["results"]}
+            self._resize(session)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_bytes": self.max_bytes,
+                "idle_ttl_seconds": self.idle_ttl,
+                "result_ttl_seconds": self.result_ttl,
+                "pin_window_seconds": self.pin_window,
+                "snapshot_path": self.snapshot_path,
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "pinned": self.pinned,
+                "reused": self.reused,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "shared": self.shared.stats() if self.shared is not None else None,
+            }
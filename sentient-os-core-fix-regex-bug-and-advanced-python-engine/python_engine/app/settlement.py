@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+from array import array
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_INITIAL_BALANCE = float(os.environ.get("AEOS_SETTLEMENT_INITIAL_BALANCE", "1000.0"))
+DEFAULT_BATCH_SIZE = int(os.environ.get("AEOS_SETTLEMENT_BATCH_SIZE", "65536"))
+DEFAULT_INTERVAL = float(os.environ.get("AEOS_SETTLEMENT_INTERVAL_MS", "5")) / 1000.0
+
+# Amounts are held as integer base units (lovelace for ADA) so totals are exact.
+UNITS_PER_COIN = 1_000_000
+# Transaction statuses kept for lookups; older transaction ids report "expired".
+STATUS_RETENTION = 1 << 22
+# Vectorized settlement passes per batch before the remaining overdrafting
+# senders are resolved one transfer at a time.
+MAX_PASSES = 16
+
+PENDING, SETTLED, REJECTED = 0, 1, 2
+STATUS_NAMES = {PENDING: "pending", SETTLED: "settled", REJECTED: "rejected"}
+
+
+def to_units(amount: float) -> int:
+    return int(round(amount * UNITS_PER_COIN))
+
+
+class SettlementEngine:
+    """
+    In-memory ledger standing in for the chain in simulations and load tests.
+
+    Balances live in a NumPy int64 array indexed by wallet. Transfers are
+    appended to an array-backed queue and settled in micro-batches, in the
+    style of a Hydra head snapshot: within a batch each sender's transfers are
+    applied in submission order against the sender's balance at the start of
+    the batch, a transfer that would overdraw is rejected, and all accepted
+    debits and credits are applied at once. Credits received in a batch become
+    spendable from the next one.
+
+    A background thread settles every `interval` seconds, or as soon as
+    `batch_size` transfers are queued; `settle()` can also be called directly.
+    """
+    def __init__(
+        self,
+        initial_balance: float = DEFAULT_INITIAL_BALANCE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        interval: float = DEFAULT_INTERVAL,
+    ):
+        self.initial_balance = to_units(initial_balance)
+        self.batch_size = batch_size
+        self.interval = interval
+
+        self.wallets: Dict[str, int] = {}
+        self._balances = np.zeros(1024, dtype=np.int64)
+        self._queue = self._new_queue()
+        self._statuses = np.zeros(STATUS_RETENTION, dtype=np.int8)
+        self._next_tx = 0
+
+        self._lock = threading.Lock()
+        self._settle_lock = threading.Lock()
+        self._settled = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+
+        self.batches = 0
+        self.settled = 0
+        self.rejected = 0
+
+    @staticmethod
+    def _new_queue() -> Dict[str, array]:
+        return {"tx": array("q"), "sender": array("q"), "recipient": array("q"), "amount": array("q")}
+
+    # -- wallets ----------------------------------------------------------
+
+    def _wallet(self, address: str) -> int:
+        """Index of `address`, opening it with the initial balance. Lock held."""
+        index = self.wallets.get(address)
+        if index is None:
+            index = self.wallets[address] = len(self.wallets)
+            if index >= len(self._balances):
+                grown = np.zeros(len(self._balances) * 2, dtype=np.int64)
+                grown[:len(self._balances)] = self._balances
+                self._balances = grown
+            self._balances[index] = self.initial_balance
+        return index
+
+    def balance(self, address: str) -> float:
+        """Settled balance of `address` in coins."""
+        with self._lock:
+            index = self.wallets.get(address)
+            units = self.initial_balance if index is None else int(self._balances[index])
+        return units / UNITS_PER_COIN
+
+    def total_supply(self) -> float:
+        with self._lock:
+            return int(self._balances[:len(self.wallets)].sum()) / UNITS_PER_COIN
+
+    # -- submission -------------------------------------------------------
+
+    def submit(self, sender: str, recipient: str, amount: float) -> int:
+        """Queues a transfer and returns its transaction id."""
+        units = to_units(amount)
+        if units <= 0:
+            raise ValueError("Transfer amount must be positive")
+        with self._lock:
+            tx = self._next_tx
+            self._next_tx += 1
+            self._statuses[tx % STATUS_RETENTION] = PENDING
+            queue = self._queue
+            queue["tx"].append(tx)
+            queue["sender"].append(self._wallet(sender))
+            queue["recipient"].append(self._wallet(recipient))
+            queue["amount"].append(units)
+            pending = len(queue["tx"])
+        self._ensure_running(pending)
+        return tx
+
+    def submit_many(self, senders, recipients, amounts) -> Tuple[int, int]:
+        """
+        Queues transfers from parallel sequences of wallet addresses and coin
+        amounts. Returns the half-open range of their transaction ids.
+        """
+        units = np.rint(np.asarray(amounts, dtype=np.float64) * UNITS_PER_COIN).astype(np.int64)
+        if len(units) and units.min() <= 0:
+            raise ValueError("Transfer amounts must be positive")
+        with self._lock:
+            first = self._next_tx
+            count = len(units)
+            self._next_tx += count
+            ids = np.arange(first, first + count, dtype=np.int64)
+            self._statuses[ids % STATUS_RETENTION] = PENDING
+            wallet = self._wallet
+            queue = self._queue
+            queue["tx"].frombytes(ids.tobytes())
+            queue["sender"].frombytes(np.fromiter((wallet(a) for a in senders), np.int64, count).tobytes())
+            queue["recipient"].frombytes(np.fromiter((wallet(a) for a in recipients), np.int64, count).tobytes())
+            queue["amount"].frombytes(units.tobytes())
+            pending = len(queue["tx"])
+        self._ensure_running(pending)
+        return first, first + count
+
+    def status(self, tx: int) -> str:
+        with self._lock:
+            if tx < 0 or tx >= self._next_tx:
+                return "unknown"
+            if tx < self._next_tx - STATUS_RETENTION:
+                return "expired"
+            return STATUS_NAMES[int(self._statuses[tx % STATUS_RETENTION])]
+
+    def wait(self, tx: int, timeout: float) -> str:
+        """Waits up to `timeout` seconds for `tx` to leave the pending state."""
+        deadline = time.monotonic() + timeout
+        with self._lock:
+            while self._statuses[tx % STATUS_RETENTION] == PENDING and tx >= self._next_tx - STATUS_RETENTION:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.set()
+                self._settled.wait(remaining)
+        return self.status(tx)
+
+    # -- settlement -------------------------------------------------------
+
+    def _ensure_running(self, pending: int):
+        if self._thread is None:
+            with self._settle_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="aeos-settlement", daemon=True)
+                    self._thread.start()
+        if pending >= self.batch_size:
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.settle()
+
+    def settle(self) -> int:
+        """Settles every queued transfer in micro-batches; returns how many were processed."""
+        processed = 0
+        with self._settle_lock:
+            with self._lock:
+                queue, self._queue = self._queue, self._new_queue()
+            columns = {name: np.frombuffer(values, dtype=np.int64) for name, values in queue.items()}
+            total = len(columns["tx"])
+            for start in range(0, total, self.batch_size):
+                batch = {name: values[start:start + self.batch_size] for name, values in columns.items()}
+                self._settle_batch(batch["tx"], batch["sender"], batch["recipient"], batch["amount"])
+                processed += len(batch["tx"])
+        return processed
+
+    def _settle_batch(self, tx: np.ndarray, sender: np.ndarray, recipient: np.ndarray, amount: np.ndarray):
+        with self._lock:
+            size = len(self.wallets)
+            available = self._balances[:size].copy()
+
+        # Group each sender's transfers together, keeping submission order.
+        order = np.argsort(sender, kind="stable")
+        by_sender = sender[order]
+        debits = amount[order]
+        group_start = np.empty(len(order), dtype=bool)
+        group_start[:1] = True
+        group_start[1:] = by_sender[1:] != by_sender[:-1]
+        starts = np.flatnonzero(group_start)
+        group = np.cumsum(group_start) - 1
+
+        # Sequential greedy semantics, vectorized: per pass, the first transfer
+        # of each sender whose running total overdraws is rejected, and running
+        # totals are recomputed without it. Transfers before it are unaffected.
+        rejected = np.zeros(len(order), dtype=bool)
+        for attempt in range(MAX_PASSES + 1):
+            live = np.where(rejected, 0, debits)
+            running = np.cumsum(live)
+            running -= (running[starts] - live[starts])[group]
+            over = (running > available[by_sender]) & ~rejected
+            if not over.any():
+                break
+            first_over = np.flatnonzero(over)
+            first_over = first_over[np.r_[True, group[first_over[1:]] != group[first_over[:-1]]]]
+            if attempt == MAX_PASSES:
+                # Senders with many overdrafts in one batch: finish them sequentially.
+                ends = np.r_[starts[1:], len(order)]
+                for i in first_over:
+                    remaining = int(available[by_sender[i]] - (running[i] - live[i]))
+                    for j in range(i, ends[group[i]]):
+                        if rejected[j]:
+                            continue
+                        if debits[j] > remaining:
+                            rejected[j] = True
+                        else:
+                            remaining -= int(debits[j])
+                break
+            rejected[first_over] = True
+
+        accepted = np.empty(len(order), dtype=bool)
+        accepted[order] = ~rejected
+        debit = np.bincount(sender[accepted], weights=amount[accepted], minlength=size)
+        credit = np.bincount(recipient[accepted], weights=amount[accepted], minlength=size)
+
+        with self._lock:
+            # Balances are int64 base units; bincount sums are exact below 2**53.
+            self._balances[:size] += np.rint(credit - debit).astype(np.int64)
+            self._statuses[tx % STATUS_RETENTION] = np.where(accepted, SETTLED, REJECTED)
+            settled = int(accepted.sum())
+            self.settled += settled
+            self.rejected += len(tx) - settled
+            self.batches += 1
+            self._settled.notify_all()
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.settle()
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "wallets": len(self.wallets),
+                "pending": len(self._queue["tx"]),
+                "batches": self.batches,
+                "settled": self.settled,
+                "rejected": self.rejected,
+            }
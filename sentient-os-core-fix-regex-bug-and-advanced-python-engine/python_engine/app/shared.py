@@ -0,0 +1,250 @@
+import hashlib
+import mmap
+import multiprocessing
+import os
+import pickle
+import struct
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Defaults, overridable per deployment through the environment.
+DEFAULT_SHARED_CACHE_BYTES = int(os.environ.get("AEOS_SHARED_CACHE_BYTES", str(16 * 1024 * 1024)))
+DEFAULT_REGION_BYTES = int(os.environ.get("AEOS_METRICS_REGION_BYTES", str(2 * 1024 * 1024)))
+DEFAULT_BUCKET_SLOTS = int(os.environ.get("AEOS_SHARED_BUCKET_SLOTS", "65536"))
+DEFAULT_SHARED_SESSION_BYTES = int(os.environ.get("AEOS_SHARED_SESSION_BYTES", str(4 * 1024 * 1024)))
+
+# Bytes per shared cache slot; larger entries are only cached per worker.
+SLOT_BYTES = 8192
+# Locks guarding the shared cache slots, striped by slot. Lookups run on the
+# event loop and never wait for a lock: a busy stripe, or one left held by a
+# killed worker, falls back to the worker's own tier. Only clear() waits, for
+# at most LOCK_TIMEOUT.
+LOCK_STRIPES = 64
+LOCK_TIMEOUT = 0.1
+# Reads of a region retried while its writer is mid-write.
+READ_ATTEMPTS = 1000
+
+# Region header: write sequence (odd while a write is in progress), payload length.
+REGION_HEADER = struct.Struct("<QI")
+# Slot header: key hash, expiry (time.monotonic, shared by every process on the
+# host), key length, value length.
+SLOT_HEADER = struct.Struct("<QdII")
+# Bytes per shared session slot: a user's last route, not its results.
+SESSION_SLOT_BYTES = 256
+# Token bucket slot: user hash (0 = free), tokens, last update (time.monotonic).
+BUCKET_SLOT = struct.Struct("<Qdd")
+# Slots a user's bucket may occupy; they form one group under one lock.
+BUCKET_GROUP = 8
+
+
+def _shared_map(size: int) -> mmap.mmap:
+    """Anonymous MAP_SHARED memory, inherited by every process forked afterwards."""
+    return mmap.mmap(-1, size)
+
+
+class SharedRegions:
+    """
+    One fixed-size region per worker in a single shared mapping, created
+    before the workers are forked. Each worker overwrites its own region with
+    a blob; any worker can read every region. Writers bump a per-region
+    sequence number around each write, so readers detect a concurrent write and
+    retry instead of taking a lock.
+    """
+    def __init__(self, count: int, size: int = DEFAULT_REGION_BYTES):
+        self.count = count
+        self.size = size
+        self._map = _shared_map(count * size)
+        # Serializes writers within a process; each region has one writing process.
+        self._lock = threading.Lock()
+        self.overflows = 0
+
+    def write(self, index: int, data: bytes) -> bool:
+        """Publishes `data` in region `index`; False when it does not fit."""
+        if REGION_HEADER.size + len(data) > self.size:
+            self.overflows += 1
+            return False
+        base = index * self.size
+        with self._lock:
+            seq = REGION_HEADER.unpack_from(self._map, base)[0] & ~1
+            REGION_HEADER.pack_into(self._map, base, seq + 1, 0)
+            self._map[base + REGION_HEADER.size:base + REGION_HEADER.size + len(data)] = data
+            REGION_HEADER.pack_into(self._map, base, seq + 2, len(data))
+        return True
+
+    def read(self, index: int) -> bytes:
+        """The last blob published in region `index` (empty when none was, or its writer died mid-write)."""
+        base = index * self.size
+        for _ in range(READ_ATTEMPTS):
+            seq, length = REGION_HEADER.unpack_from(self._map, base)
+            data = self._map[base + REGION_HEADER.size:base + REGION_HEADER.size + length]
+            if not seq & 1 and REGION_HEADER.unpack_from(self._map, base)[0] == seq:
+                return data
+            time.sleep(0)
+        return b""
+
+
+class SharedCache:
+    """
+    Fixed-size cache shared by forked worker processes.
+
+    The mapping is split into `SLOT_BYTES` slots; a key hashes to exactly one
+    slot, and a new entry replaces whatever occupied it. Entries hold the
+    pickled key (compared on lookup, so hash collisions never return a wrong
+    value) and the pickled value with an absolute expiry. Slots are guarded by
+    striped process-shared locks. It backs ResponseCache as a second tier, so
+    a result computed by one worker is reused by the others.
+    """
+    def __init__(self, max_bytes: int = DEFAULT_SHARED_CACHE_BYTES, slot_bytes: int = SLOT_BYTES):
+        self.slot_bytes = slot_bytes
+        self.slots = max(1, max_bytes // slot_bytes)
+        self._map = _shared_map(self.slots * slot_bytes)
+        context = multiprocessing.get_context("fork")
+        self._locks = [context.Lock() for _ in range(min(LOCK_STRIPES, self.slots))]
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.oversized = 0
+        self.contended = 0
+
+    def _lock(self, slot: int):
+        lock = self._locks[slot % len(self._locks)]
+        if lock.acquire(False):
+            return lock
+        self.contended += 1
+        return None
+
+    def _slot(self, key: Hashable) -> Tuple[bytes, int, int]:
+        raw = pickle.dumps(key, pickle.HIGHEST_PROTOCOL)
+        digest = int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), "little")
+        return raw, digest, digest % self.slots
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """(value, monotonic expiry) for `key`, or None when absent or expired."""
+        raw, digest, slot = self._slot(key)
+        base = slot * self.slot_bytes
+        lock = self._lock(slot)
+        if lock is None:
+            self.misses += 1
+            return None
+        try:
+            stored, expires_at, key_length, value_length = SLOT_HEADER.unpack_from(self._map, base)
+            start = base + SLOT_HEADER.size
+            if stored != digest or expires_at <= time.monotonic() or self._map[start:start + key_length] != raw:
+                self.misses += 1
+                return None
+            data = self._map[start + key_length:start + key_length + value_length]
+        finally:
+            lock.release()
+        self.hits += 1
+        return pickle.loads(data), expires_at
+
+    def put(self, key: Hashable, value: Any, expires_at: float) -> bool:
+        raw, digest, slot = self._slot(key)
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if SLOT_HEADER.size + len(raw) + len(data) > self.slot_bytes:
+            self.oversized += 1
+            return False
+        base = slot * self.slot_bytes
+        lock = self._lock(slot)
+        if lock is None:
+            return False
+        try:
+            stored, stored_expiry, _, _ = SLOT_HEADER.unpack_from(self._map, base)
+            if stored and stored != digest and stored_expiry > time.monotonic():
+                self.evictions += 1
+            start = base + SLOT_HEADER.size
+            self._map[start:start + len(raw)] = raw
+            self._map[start + len(raw):start + len(raw) + len(data)] = data
+            SLOT_HEADER.pack_into(self._map, base, digest, expires_at, len(raw), len(data))
+        finally:
+            lock.release()
+        return True
+
+    def clear(self):
+        for slot in range(self.slots):
+            lock = self._locks[slot % len(self._locks)]
+            if lock.acquire(timeout=LOCK_TIMEOUT):
+                SLOT_HEADER.pack_into(self._map, slot * self.slot_bytes, 0, 0.0, 0, 0)
+                lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "slot_bytes": self.slot_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "oversized": self.oversized,
+            "contended": self.contended,
+        }
+
+
+class SharedBuckets:
+    """
+    Per-user token buckets in memory shared by forked worker processes, so a
+    user's rate limit holds for the whole server instead of once per worker.
+
+    A user hashes to a group of BUCKET_GROUP slots guarded by one striped
+    process-shared lock. Its bucket is the slot holding its hash or, for a
+    user without one, a free slot or the least recently updated one in the
+    group. A user whose slot was taken starts over with a full bucket, so a
+    full table only loosens the limits of its least active users. `take`
+    never waits for the lock; when the group is busy it returns None and the
+    caller uses its own bucket.
+    """
+    def __init__(self, slots: int = DEFAULT_BUCKET_SLOTS):
+        self.groups = max(1, slots // BUCKET_GROUP)
+        self.slots = self.groups * BUCKET_GROUP
+        self._map = _shared_map(self.slots * BUCKET_SLOT.size)
+        context = multiprocessing.get_context("fork")
+        self._locks = [context.Lock() for _ in range(min(LOCK_STRIPES, self.groups))]
+
+        self.evictions = 0
+        self.contended = 0
+
+    def take(self, user_id: str, weight: float, now: float, rate: float, burst: float) -> Optional[float]:
+        """
+        Refills `user_id`'s bucket at `rate` up to `burst` and takes `weight`
+        tokens from it. Returns the tokens missing, 0.0 when they were taken,
+        or None when the bucket's lock is held elsewhere.
+        """
+        digest = int.from_bytes(hashlib.blake2b(user_id.encode(), digest_size=8).digest(), "little") or 1
+        group = digest % self.groups
+        lock = self._locks[group % len(self._locks)]
+        if not lock.acquire(False):
+            self.contended += 1
+            return None
+        try:
+            target, tokens = None, burst
+            stalest, stalest_updated = None, float("inf")
+            for slot in range(group * BUCKET_GROUP, (group + 1) * BUCKET_GROUP):
+                stored, stored_tokens, updated = BUCKET_SLOT.unpack_from(self._map, slot * BUCKET_SLOT.size)
+                if stored == digest:
+                    target = slot
+                    tokens = min(burst, stored_tokens + (now - updated) * rate)
+                    break
+                if not stored:
+                    updated = float("-inf")
+                if updated < stalest_updated:
+                    stalest, stalest_updated = slot, updated
+            if target is None:
+                target = stalest
+                # A bucket idle for burst / rate seconds was full anyway.
+                if (now - stalest_updated) * rate < burst:
+                    self.evictions += 1
+            missing = max(weight - tokens, 0.0)
+            if not missing:
+                tokens -= weight
+            BUCKET_SLOT.pack_into(self._map, target * BUCKET_SLOT.size, digest, tokens, now)
+            return missing
+        finally:
+            lock.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "evictions": self.evictions,
+            "contended": self.contended,
+        }
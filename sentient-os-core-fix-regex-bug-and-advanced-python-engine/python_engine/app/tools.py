@@ -1,39 +1,191 @@
-from langchain_core.tools import Tool
-from typing import Optional
+import os
+import threading
+from typing import Any, Callable, Dict, FrozenSet, List, Optional
+
+# Wallet that funds transfers when no sender is given.
+AGENT_WALLET = "addr1_masumi_agent_vault"
+# How long transfer_assets waits for its micro-batch to settle.
+SETTLEMENT_WAIT = float(os.environ.get("AEOS_SETTLEMENT_WAIT_MS", "50")) / 1000.0
+# Assets with a settlement ledger; each runs its own engine and flush thread.
+SETTLEMENT_ASSETS = frozenset(
+    asset.strip().upper() for asset in os.environ.get("AEOS_SETTLEMENT_ASSETS", "ADA,DJED,USDM").split(",")
+    if asset.strip()
+)
 
 class DeFiTransactionTool:
-    def transfer_assets(self, amount: float, asset: str, recipient: str) -> str:
-        """Simulates a DeFi asset transfer on the Masumi Network."""
-        # In a real implementation, this would interact with the blockchain
-        return f"Transaction Initiated: Transfer {amount} {asset} to {recipient}. Status: Pending Verification."
+    """
+    Transfers and balances backed by the local settlement engine, one ledger
+    per asset in `assets`, standing in for the chain. Other assets raise
+    ValueError, so a query cannot create ledgers (and their threads) at will.
+    """
+    def __init__(self, assets: FrozenSet[str] = SETTLEMENT_ASSETS):
+        self.assets = assets
+        self.ledgers: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def ledger(self, asset: str):
+        asset = asset.upper()
+        if asset not in self.assets:
+            raise ValueError(f"unsupported asset {asset}")
+        ledger = self.ledgers.get(asset)
+        if ledger is None:
+            from app.settlement import SettlementEngine
+
+            with self._lock:
+                ledger = self.ledgers.get(asset)
+                if ledger is None:
+                    ledger = self.ledgers[asset] = SettlementEngine()
+        return ledger
+
+    def transfer_assets(self, amount: float, asset: str, recipient: str, sender: str = AGENT_WALLET) -> str:
+        """Submits an asset transfer and reports its settlement status."""
+        ledger = self.ledger(asset)
+        tx = ledger.submit(sender, recipient, amount)
+        status = ledger.wait(tx, SETTLEMENT_WAIT)
+        return f"Transaction {tx}: Transfer {amount} {asset} to {recipient}. Status: {status.capitalize()}."
 
-    def check_balance(self, wallet: str) -> str:
-        """Checks the balance of a wallet."""
-        return f"Wallet {wallet} Balance: 1000.0 ADA"
+    def check_balance(self, wallet: str, asset: str = "ADA") -> str:
+        """Checks the settled balance of a wallet."""
+        return f"Wallet {wallet} Balance: {self.ledger(asset).balance(wallet)} {asset.upper()}"
 
 class ComplianceTool:
+    """
+    KYC and sanctions checks against the local screening lists, when any are
+    installed (see app/screening.py).
+    """
+    def __init__(self):
+        from app.screening import Screener
+
+        self.screener = Screener.open()
+
     def verify_kyc(self, user_id: str) -> str:
         """Verifies KYC status for Masumi compliance."""
+        matches = self.screen([user_id])
+        if matches:
+            lists = ", ".join(sorted({match["list"] for match in matches}))
+            return f"User {user_id} KYC Status: BLOCKED (listed on {lists})"
         return f"User {user_id} KYC Status: VERIFIED (Tier 2)"
 
-def get_masumi_tools():
-    defi = DeFiTransactionTool()
-    compliance = ComplianceTool()
-
-    return [
-        Tool(
-            name="DeFi Transfer",
-            func=defi.transfer_assets,
-            description="Useful for transferring assets like ADA."
-        ),
-        Tool(
-            name="Check Balance",
-            func=defi.check_balance,
-            description="Useful for checking wallet balances."
-        ),
-        Tool(
-            name="Compliance Check",
-            func=compliance.verify_kyc,
-            description="Verifies if a user is compliant with Masumi Network regulations."
-        )
-    ]
+    def screen(self, subjects: List[str]) -> List[Dict[str, Any]]:
+        """Sanctions matches for user ids, wallet addresses or names."""
+        return self.screener.screen_all(subjects) if self.screener is not None else []
+
+    def after_fork(self):
+        if self.screener is not None:
+            self.screener.follow()
+
+    def stats(self) -> Dict[str, Any]:
+        if self.screener is None:
+            return {"installed": False}
+        return {"installed": True, **self.screener.stats()}
+
+class ToolSpec:
+    """
+    Lightweight description of a tool: its name, description and the backend
+    method that implements it. Nothing is instantiated or imported until the
+    tool is first used.
+    """
+    def __init__(self, name: str, description: str, backend: type, method: str):
+        self.name = name
+        self.description = description
+        self.backend = backend
+        self.method = method
+
+TOOL_SPECS = [
+    ToolSpec("DeFi Transfer", "Useful for transferring assets like ADA.",
+             DeFiTransactionTool, "transfer_assets"),
+    ToolSpec("Check Balance", "Useful for checking wallet balances.",
+             DeFiTransactionTool, "check_balance"),
+    ToolSpec("Compliance Check", "Verifies if a user is compliant with Masumi Network regulations.",
+             ComplianceTool, "verify_kyc"),
+    ToolSpec("Sanctions Screen", "Screens user ids, wallet addresses or names against sanctions lists.",
+             ComplianceTool, "screen"),
+]
+
+class ToolRegistry:
+    """
+    Registry of Masumi tools described by ToolSpec metadata.
+    Backends are instantiated once, on first use, and shared between the tools
+    they implement; the langchain Tool wrapper (and the langchain import) is
+    only built when a tool is first invoked through langchain.
+    """
+    def __init__(self, specs: Optional[List[ToolSpec]] = None):
+        self.specs: Dict[str, ToolSpec] = {spec.name: spec for spec in (specs or TOOL_SPECS)}
+        self._backends: Dict[type, Any] = {}
+        self._tools: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def backend(self, backend_type: type) -> Any:
+        instance = self._backends.get(backend_type)
+        if instance is None:
+            # Divisions run on a thread pool; backends must be created once.
+            with self._lock:
+                instance = self._backends.get(backend_type)
+                if instance is None:
+                    instance = self._backends[backend_type] = backend_type()
+        return instance
+
+    def use_backend(self, backend_type: type, instance: Any):
+        """Serves the tools of `backend_type` from `instance`, e.g. a proxy to another process."""
+        with self._lock:
+            self._backends[backend_type] = instance
+            self._tools.clear()
+
+    def after_fork(self):
+        """Lets backends created before a fork restart what did not survive it."""
+        for instance in list(self._backends.values()):
+            after_fork = getattr(instance, "after_fork", None)
+            if after_fork is not None:
+                after_fork()
+
+    def func(self, name: str) -> Callable[..., Any]:
+        spec = self.specs[name]
+        return getattr(self.backend(spec.backend), spec.method)
+
+    def langchain_tool(self, name: str):
+        tool = self._tools.get(name)
+        if tool is None:
+            from langchain_core.tools import Tool
+
+            spec = self.specs[name]
+            tool = self._tools[name] = Tool(name=spec.name, func=self.func(name), description=spec.description)
+        return tool
+
+    def invoke(self, name: str, *args, **kwargs) -> Any:
+        """Calls a tool's backend directly, without going through langchain."""
+        return self.func(name)(*args, **kwargs)
+
+class LazyTool:
+    """
+    Stand-in for a langchain Tool that exposes its metadata immediately and
+    builds the real Tool the first time it is run.
+    """
+    def __init__(self, registry: ToolRegistry, spec: ToolSpec):
+        self._registry = registry
+        self.name = spec.name
+        self.description = spec.description
+
+    @property
+    def tool(self):
+        return self._registry.langchain_tool(self.name)
+
+    @property
+    def func(self) -> Callable[..., Any]:
+        return self._registry.func(self.name)
+
+    def run(self, *args, **kwargs) -> Any:
+        return self.tool.run(*args, **kwargs)
+
+    def invoke(self, *args, **kwargs) -> Any:
+        return self.tool.invoke(*args, **kwargs)
+
+    def __getattr__(self, attr: str) -> Any:
+        # Anything else is served by the real langchain Tool.
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.tool, attr)
+
+TOOL_REGISTRY = ToolRegistry()
+
+def get_masumi_tools() -> List[LazyTool]:
+    return [LazyTool(TOOL_REGISTRY, spec) for spec in TOOL_REGISTRY.specs.values()]
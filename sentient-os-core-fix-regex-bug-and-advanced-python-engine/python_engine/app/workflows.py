@@ -0,0 +1,390 @@
+import asyncio
+import os
+import re
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from app.events import Emit, emit_division_result, emit_logs
+from app.metrics import RESPONSE_BUILD_SECONDS, WORKFLOW_SECONDS, SampledSeries
+from app.models import AgentResponse
+
+
+class WorkflowStep:
+    """
+    One division call inside a workflow.
+    `query=None` forwards the user's original query (and its matched intents);
+    a fixed string issues that query to the division instead, with `{query}`
+    replaced by the user's query.
+    """
+    def __init__(
+        self,
+        name: str,
+        division: str,
+        log: str,
+        query: Optional[str] = None,
+        depends_on: Tuple[str, ...] = (),
+    ):
+        self.name = name
+        self.division = division
+        self.log = log
+        self.query = query
+        self.depends_on = tuple(depends_on)
+
+
+class RiskTrigger:
+    """
+    Computed workflow gate. Every keyword group in `intent` must match at the
+    start of a word ("refund" is not "fund"), with or without data. With data
+    for the query's region, `metric` from `division.assess(query, context)`
+    must also reach `threshold`; when the division cannot assess the query
+    (no data or no region), the intent words alone decide.
+    """
+    def __init__(self, division: str, metric: str, threshold: float, intent: Tuple[Tuple[str, ...], ...]):
+        self.division = division
+        self.metric = metric
+        self.threshold = threshold
+        self.intent = intent
+        # A keyword matches at the start of a word, so "flooding" and "funds" still count.
+        self._patterns = [
+            re.compile(r"\b(?:" + "|".join(map(re.escape, group)) + ")", re.IGNORECASE) for group in intent
+        ]
+
+    def matches(self, query: str) -> bool:
+        return all(pattern.search(query) for pattern in self._patterns)
+
+    def fired(self, assessment: Optional[Dict[str, Any]]) -> Optional[bool]:
+        if assessment is None or self.metric not in assessment:
+            return None
+        return assessment[self.metric] >= self.threshold
+
+
+class Workflow:
+    """
+    A multi-division collaboration declared as a DAG of steps. A step whose
+    result carries a "blocked" reason (e.g. a sanctions match) halts the
+    workflow: steps depending on it are skipped.
+    The workflow is selected when every keyword group in `trigger` matches;
+    a `risk` trigger additionally requires its intent words and, when the risk
+    can be computed, the risk to reach its threshold.
+    """
+    def __init__(
+        self,
+        name: str,
+        title: str,
+        division: str,
+        trigger: Tuple[Tuple[str, ...], ...],
+        steps: List[WorkflowStep],
+        response_prefix: str,
+        success_log: str,
+        risk: Optional[RiskTrigger] = None,
+    ):
+        self.name = name
+        self.title = title
+        self.division = division
+        self.trigger = trigger
+        self.steps = steps
+        self.response_prefix = response_prefix
+        self.success_log = success_log
+        self.risk = risk
+        self.order = self._topological_order()
+        self.seconds = WORKFLOW_SECONDS.labels(name)
+
+    def _topological_order(self) -> List[WorkflowStep]:
+        by_name = {step.name: step for step in self.steps}
+        if len(by_name) != len(self.steps):
+            raise ValueError(f"Workflow '{self.name}' has duplicate step names")
+        order: List[WorkflowStep] = []
+        state: Dict[str, str] = {}
+
+        def visit(step: WorkflowStep):
+            if state.get(step.name) == "done":
+                return
+            if state.get(step.name) == "visiting":
+                raise ValueError(f"Workflow '{self.name}' has a dependency cycle at '{step.name}'")
+            state[step.name] = "visiting"
+            for dependency in step.depends_on:
+                if dependency not in by_name:
+                    raise ValueError(f"Workflow '{self.name}' step '{step.name}' depends on unknown step '{dependency}'")
+                visit(by_name[dependency])
+            state[step.name] = "done"
+            order.append(step)
+
+        for step in self.steps:
+            visit(step)
+        return order
+
+
+# Response prefix of a workflow halted by a blocked step.
+HALTED_PREFIX = "Workflow Halted"
+
+# Regional flood probability at which disaster relief payments are released.
+FLOOD_PAYOUT_THRESHOLD = float(os.environ.get("AEOS_FLOOD_PAYOUT_THRESHOLD", "0.6"))
+
+# Registered collaborations, in trigger precedence order.
+WORKFLOWS = [
+    Workflow(
+        name="eid_dtad",
+        title="Disaster Response + Financial Settlement",
+        division="AEOS Collaborative Core (EID + DTAD)",
+        trigger=(("flood", "disaster"), ("pay", "fund")),
+        steps=[
+            WorkflowStep("verify", "EID", "Step 1: Activating EID for disaster verification...",
+                         query="disaster forecast: {query}"),
+            # The fund release does not use the EID result, so it runs in parallel.
+            WorkflowStep("release", "DTAD", "Step 2: Activating DTAD for emergency fund release...",
+                         query="pay emergency relief funds"),
+        ],
+        response_prefix="Collaborative Workflow Complete",
+        success_log="COLLABORATION SUCCESS: Verified disaster data on-chain, triggered smart contract release.",
+        # With raster data for the query's region, a disaster payment request
+        # also needs the computed flood probability to reach the threshold.
+        risk=RiskTrigger("EID", "flood_probability", FLOOD_PAYOUT_THRESHOLD,
+                         intent=(("flood", "disaster"), ("pay", "fund"))),
+    ),
+    Workflow(
+        name="enid_dtad_hid",
+        title="Compliance Check + Payment + Notification",
+        division="AEOS Collaborative Core (ENID + DTAD + HID)",
+        trigger=(("compliance",), ("pay",), ("notify", "notification")),
+        steps=[
+            WorkflowStep("screen", "ENID", "Step 1: Activating ENID for KYC/AML check..."),
+            WorkflowStep("settle", "DTAD", "Step 2: Activating DTAD for secure settlement...",
+                         depends_on=("screen",)),
+            WorkflowStep("notify", "HID", "Step 3: Activating HID to notify the customer...",
+                         query="open ticket for payment confirmation", depends_on=("settle",)),
+        ],
+        response_prefix="Secure Transaction Complete",
+        success_log="COLLABORATION SUCCESS: Identity proof minted, transaction executed, customer notified.",
+    ),
+    Workflow(
+        name="enid_dtad",
+        title="Compliance Check + Payment",
+        division="AEOS Collaborative Core (ENID + DTAD)",
+        trigger=(("compliance",), ("pay",)),
+        steps=[
+            WorkflowStep("screen", "ENID", "Step 1: Activating ENID for KYC/AML check..."),
+            # Pass original query to capture amount; settlement must follow the compliance check.
+            WorkflowStep("settle", "DTAD", "Step 2: Activating DTAD for secure settlement...",
+                         depends_on=("screen",)),
+        ],
+        response_prefix="Secure Transaction Complete",
+        success_log="COLLABORATION SUCCESS: Identity proof minted, transaction executed.",
+    ),
+]
+
+
+# runner(division, query, intents, user_id, context) -> division result
+_StepArgs = [Any, str, Optional[FrozenSet[str]], Optional[str], Optional[Dict[str, Any]]]
+StepRunner = Callable[_StepArgs, Dict[str, Any]]
+AsyncStepRunner = Callable[_StepArgs, Awaitable[Dict[str, Any]]]
+StepReuser = Callable[_StepArgs, Optional[Dict[str, Any]]]
+
+
+class WorkflowEngine:
+    """
+    Executes workflows against the orchestrator's divisions.
+    Identical steps (same division and query) run once per request, independent
+    branches run concurrently in `arun`, and tool usage, logs and cost are merged
+    automatically. When `reuse_step` returns a result for a step (e.g. from the
+    user's session), that result is used instead of running the step.
+    `sentiment` labels the merged response from the request's query.
+    """
+    def __init__(
+        self,
+        division: Callable[[str], Any],
+        run_step: StepRunner,
+        arun_step: AsyncStepRunner,
+        reuse_step: Optional[StepReuser] = None,
+        sentiment: Optional[Callable[[str], str]] = None,
+    ):
+        self.division = division
+        self.run_step = run_step
+        self.arun_step = arun_step
+        self.reuse_step = reuse_step
+        self.sentiment = sentiment
+        self._response_build_seconds = SampledSeries(RESPONSE_BUILD_SECONDS.labels())
+
+    def _reuse(self, division, query: str, intents: Optional[FrozenSet[str]], user_id: Optional[str],
+               context: Optional[Dict[str, Any]]):
+        return self.reuse_step(division, query, intents, user_id, context) if self.reuse_step else None
+
+    def _call(self, step: WorkflowStep, query: str, intents: Optional[FrozenSet[str]]):
+        """Returns (dedup key, division, query, intents) for a step."""
+        if step.query is None:
+            return (step.division, query), self.division(step.division), query, intents
+        step_query = step.query.replace("{query}", query)
+        return (step.division, step_query), self.division(step.division), step_query, None
+
+    def run(
+        self,
+        workflow: Workflow,
+        query: str,
+        intents: Optional[FrozenSet[str]] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> AgentResponse:
+        """Synchronous execution in topological order."""
+        started = time.perf_counter()
+        calls: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        reused: Set[Tuple[str, str]] = set()
+        results: Dict[str, Dict[str, Any]] = {}
+        for step in workflow.order:
+            blocked = self._blocked(step, results)
+            if blocked:
+                results[step.name] = self._skipped(step, blocked)
+                continue
+            key, division, step_query, step_intents = self._call(step, query, intents)
+            if key not in calls:
+                prior = self._reuse(division, step_query, step_intents, user_id, context)
+                if prior is not None:
+                    calls[key] = prior
+                    reused.add(key)
+                else:
+                    calls[key] = self.run_step(division, step_query, step_intents, user_id, context)
+            results[step.name] = calls[key]
+        response = self._merge(workflow, query, intents, results, reused)
+        workflow.seconds.observe(time.perf_counter() - started)
+        return response
+
+    async def arun(
+        self,
+        workflow: Workflow,
+        query: str,
+        intents: Optional[FrozenSet[str]] = None,
+        emit: Optional[Emit] = None,
+        user_id: Optional[str] = None,
+        context: Optional[Dict[str, Any]] = None,
+    ) -> AgentResponse:
+        """
+        Concurrent execution: each step starts as soon as its dependencies finish,
+        so latency follows the DAG's critical path. Progress is published through
+        `emit` in completion order as each step starts and finishes.
+        """
+        started = time.perf_counter()
+        calls: Dict[Tuple[str, str], asyncio.Future] = {}
+        reused: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Future] = {}
+        emit_logs(emit, [self._title_log(workflow)], "AEOS")
+
+        async def execute(step: WorkflowStep) -> Dict[str, Any]:
+            if step.depends_on:
+                await asyncio.gather(*(tasks[name] for name in step.depends_on))
+                blocked = self._blocked(step, {name: tasks[name].result() for name in step.depends_on})
+                if blocked:
+                    skipped = self._skipped(step, blocked)
+                    emit_logs(emit, skipped["logs"], "AEOS")
+                    return skipped
+            key, division, step_query, step_intents = self._call(step, query, intents)
+            emit_logs(emit, [step.log], "AEOS")
+            if key in reused:
+                return reused[key]
+            if key in calls:
+                return await calls[key]
+            prior = self._reuse(division, step_query, step_intents, user_id, context)
+            if prior is not None:
+                reused[key] = prior
+                emit_logs(emit, [self._reuse_log(step)], "AEOS")
+                return prior
+            calls[key] = asyncio.ensure_future(self.arun_step(division, step_query, step_intents, user_id, context))
+            result = await calls[key]
+            emit_division_result(emit, division.name, result, step.name)
+            return result
+
+        for step in workflow.order:
+            tasks[step.name] = asyncio.ensure_future(execute(step))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for future in list(tasks.values()) + list(calls.values()):
+                future.cancel()
+        results = {name: task.result() for name, task in tasks.items()}
+        emit_logs(emit, [self._outcome_log(workflow, results)], "AEOS")
+        response = self._merge(workflow, query, intents, results, set(reused))
+        workflow.seconds.observe(time.perf_counter() - started)
+        return response
+
+    @staticmethod
+    def _title_log(workflow: Workflow) -> str:
+        return f"AEOS Orchestrator detected MULTI-AGENT workflow: {workflow.title}"
+
+    @staticmethod
+    def _reuse_log(step: WorkflowStep) -> str:
+        return f"Reusing session result for step '{step.name}'."
+
+    @staticmethod
+    def _blocked(step: WorkflowStep, results: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """The block reason of the first finished dependency that halted the workflow."""
+        for name in step.depends_on:
+            blocked = results[name].get("blocked")
+            if blocked:
+                return blocked
+        return None
+
+    @staticmethod
+    def _skipped(step: WorkflowStep, reason: str) -> Dict[str, Any]:
+        # Carries the reason on, so the step's own dependents are skipped too.
+        return {
+            "response": f"{step.division} skipped ({reason})",
+            "tool_usage": [],
+            "logs": [f"Skipping step '{step.name}': {reason}."],
+            "cost": 0.0,
+            "blocked": reason,
+            "skipped": True,
+        }
+
+    @staticmethod
+    def _halted(results: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        return next((result["blocked"] for result in results.values() if result.get("blocked")), None)
+
+    def _outcome_log(self, workflow: Workflow, results: Dict[str, Dict[str, Any]]) -> str:
+        halted = self._halted(results)
+        return f"COLLABORATION HALTED: {halted}." if halted else workflow.success_log
+
+    def _merge(
+        self,
+        workflow: Workflow,
+        query: str,
+        intents: Optional[FrozenSet[str]],
+        results: Dict[str, Dict[str, Any]],
+        reused: Set[Tuple[str, str]] = frozenset(),
+    ) -> AgentResponse:
+        logs = [self._title_log(workflow)]
+        tool_usage: List[Dict[str, Any]] = []
+        cost = 0.0
+        responses = []
+        first_step_for: Dict[Tuple[str, str], str] = {}
+
+        for step in workflow.steps:
+            result = results[step.name]
+            key = self._call(step, query, intents)[0]
+            logs.append(step.log)
+            if result.get("skipped"):
+                logs.extend(result["logs"])
+            elif key in first_step_for:
+                # Deduplicated call: reuse the result without charging twice.
+                logs.append(f"Reusing result of step '{first_step_for[key]}'.")
+            elif key in reused:
+                # Produced by an earlier request; nothing ran, so nothing is charged.
+                first_step_for[key] = step.name
+                logs.append(self._reuse_log(step))
+            else:
+                first_step_for[key] = step.name
+                logs.extend(result.get("logs", []))
+                tool_usage.extend(result["tool_usage"])
+                cost += result.get("cost", 0.0)
+            responses.append(result["response"])
+
+        logs.append(self._outcome_log(workflow, results))
+        prefix = HALTED_PREFIX if self._halted(results) else workflow.response_prefix
+
+        started = time.perf_counter()
+        response = AgentResponse(
+            response=f"{prefix}: " + " -> ".join(responses),
+            division=workflow.division,
+            tool_usage=tool_usage,
+            collaboration_log=logs,
+            sentiment=self.sentiment(query) if self.sentiment is not None else "neutral",
+            cost_incurred=cost
+        )
+        self._response_build_seconds.observe(time.perf_counter() - started)
+        return response
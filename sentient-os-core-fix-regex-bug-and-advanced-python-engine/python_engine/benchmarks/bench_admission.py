@@ -0,0 +1,92 @@
+"""
+Noisy-neighbour test for admission control.
+
+One user floods the agent from NOISY_CLIENTS concurrent coroutines while
+QUIET_USERS well-behaved users each send one request every QUIET_INTERVAL
+seconds. Divisions block for STEP_SECONDS, so the flood saturates the division
+pool. The run is repeated with admission control disabled and enabled, and the
+quiet users' latency is compared:
+
+    cd python_engine && python benchmarks/bench_admission.py
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.admission import AdmissionController, AdmissionRejected
+from app.agent import AEOSOrchestrator, MasumiAgent
+from app.cache import ResponseCache
+from app.divisions import HumanInteractionDivision
+
+STEP_SECONDS = 0.02
+DURATION = 3.0
+NOISY_CLIENTS = 64
+QUIET_USERS = 16
+QUIET_INTERVAL = 0.1
+
+class SlowHumanInteractionDivision(HumanInteractionDivision):
+    def process(self, query, intents=None, context=None):
+        time.sleep(STEP_SECONDS)
+        return super().process(query, intents, context)
+
+def make_agent(admission: AdmissionController) -> MasumiAgent:
+    agent = MasumiAgent.__new__(MasumiAgent)
+    agent.meter = None
+    # Caching would hide the slow division after its first call.
+    agent.orchestrator = AEOSOrchestrator(cache=ResponseCache(ttl=0))
+    agent.orchestrator.use_division(SlowHumanInteractionDivision())
+    agent.admission = admission
+    return agent
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+async def noisy(agent: MasumiAgent, deadline: float, counts):
+    while time.perf_counter() < deadline:
+        try:
+            await agent.aprocess("help me", user_id="noisy")
+            counts["served"] += 1
+        except AdmissionRejected:
+            counts["rejected"] += 1
+            # A hostile client ignores Retry-After; yield just enough to not spin.
+            await asyncio.sleep(0.001)
+
+async def quiet(agent: MasumiAgent, user: str, deadline: float, latencies, counts):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            await agent.aprocess("help me", user_id=user)
+            latencies.append(time.perf_counter() - started)
+        except AdmissionRejected:
+            counts["quiet_rejected"] += 1
+        await asyncio.sleep(max(0.0, QUIET_INTERVAL - (time.perf_counter() - started)))
+
+async def scenario(admission: AdmissionController):
+    agent = make_agent(admission)
+    counts = {"served": 0, "rejected": 0, "quiet_rejected": 0}
+    latencies = []
+    deadline = time.perf_counter() + DURATION
+    await asyncio.gather(
+        *(noisy(agent, deadline, counts) for _ in range(NOISY_CLIENTS)),
+        *(quiet(agent, f"quiet-{i}", deadline, latencies, counts) for i in range(QUIET_USERS)),
+    )
+    return latencies, counts
+
+def main():
+    print(f"{'admission':<10} {'quiet p50':>10} {'quiet p99':>10} {'quiet 429':>10} {'noisy ok':>9} {'noisy 429':>10}")
+    for label, admission in (
+        ("off", AdmissionController(enabled=False)),
+        ("on", AdmissionController(rate=20, burst=40, max_concurrency=16, target_wait=0.1, enabled=True)),
+    ):
+        latencies, counts = asyncio.run(scenario(admission))
+        print(
+            f"{label:<10} {percentile(latencies, 0.5) * 1e3:>8.1f}ms {percentile(latencies, 0.99) * 1e3:>8.1f}ms "
+            f"{counts['quiet_rejected']:>10} {counts['served']:>9} {counts['rejected']:>10}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Audit log write cost, group commit and indexed reads.
+
+Records --records audit entries for --users users from --threads threads,
+timing the `record` call on the request path and counting the group commits
+(one fsync each) the background writer needed, flat out and at a paced rate.
+It then times history queries for one user and for a recent time window
+against a full scan of the log:
+
+    cd python_engine && python benchmarks/bench_audit.py --records 1000000
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.audit import AuditLog
+
+ROUTES = (("EID", "weather"), ("ENID", "compliance"), ("DTAD", "payments"), ("HID", None))
+
+def timed(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="aeos-audit-")
+    try:
+        log = AuditLog(root)
+        per_thread = args.records // args.threads
+
+        def writer(offset: int):
+            record = log.record
+            for i in range(offset, offset + per_thread):
+                route, capability = ROUTES[i % len(ROUTES)]
+                record(f"user-{i % args.users}", route, capability, ("Payment Rail",), 0.03, 0.0004, "pay 5 ADA to bob")
+
+        threads = [threading.Thread(target=writer, args=(n * per_thread,)) for n in range(args.threads)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        log.close()
+        stats = log.stats()
+        size = sum(os.path.getsize(os.path.join(root, name)) for name in os.listdir(root))
+        print(f"record():        {elapsed / stats['recorded'] * 1e6:6.2f} us/record over {args.threads} threads")
+        print(f"group commits:   {stats['commits']:,} fsyncs for {stats['committed']:,} records "
+              f"({stats['committed'] / max(stats['commits'], 1):,.0f} per fsync), "
+              f"{stats['segments']} segments, {size / 2**20:,.0f} MiB")
+
+        # Paced load, closer to a live server: commits batch what arrives per interval.
+        # Outside `root`: readers of a log also read its subdirectories (worker partitions).
+        paced_root = root + "-paced"
+        paced = AuditLog(paced_root)
+        deadline = time.perf_counter() + 2.0
+
+        def paced_writer(user: str):
+            while time.perf_counter() < deadline:
+                paced.record(user, "HID", None, (), 0.005, 0.0004, "help me")
+                time.sleep(0.001)
+
+        threads = [threading.Thread(target=paced_writer, args=(f"user-{n}",)) for n in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        paced.close()
+        stats = paced.stats()
+        print(f"paced, 2 s:      {stats['commits']:,} fsyncs for {stats['committed']:,} records "
+              f"({stats['committed'] / max(stats['commits'], 1):,.0f} per fsync)")
+
+        reader = AuditLog(root)
+        t_user, records = timed(lambda: list(reader.history(user_id="user-42")))
+        print(f"user history:    {t_user * 1000:8.1f} ms ({len(records)} records)")
+        newest = next(reader.history(limit=1))["ts"]
+        t_window, records = timed(lambda: list(reader.history(since=newest - 0.05)))
+        print(f"last 50 ms:      {t_window * 1000:8.1f} ms ({len(records):,} records)")
+        t_limit, _ = timed(lambda: list(reader.history(user_id="user-42", limit=10)))
+        print(f"user, newest 10: {t_limit * 1000:8.1f} ms")
+        t_scan, records = timed(lambda: [r for r in reader.history() if r["user"] == "user-42"], repeat=1)
+        print(f"full scan:       {t_scan * 1000:8.1f} ms ({len(records)} records)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        shutil.rmtree(root + "-paced", ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Compares requests/sec of single `/interact` calls against `/interact/batch`.
+
+Runs in-process against the ASGI app (no network, no services):
+
+    cd python_engine && python benchmarks/bench_batch.py
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.main import app
+
+QUERIES = [
+    "Show global weather",
+    "Check compliance status",
+    "Optimize treasury yield",
+    "Open a support ticket",
+    "Flood detected, release disaster funds",
+    "hello there",
+]
+BATCH_SIZES = (1, 64, 1024)
+
+def make_items(n: int):
+    return [{"query": QUERIES[i % len(QUERIES)], "user_id": f"user-{i}"} for i in range(n)]
+
+async def bench_single(client: httpx.AsyncClient, items) -> float:
+    start = time.perf_counter()
+    for item in items:
+        r = await client.post("/interact", json=item)
+        r.raise_for_status()
+    return len(items) / (time.perf_counter() - start)
+
+async def bench_batch(client: httpx.AsyncClient, items, rounds: int) -> float:
+    body = "\n".join(json.dumps(item) for item in items).encode()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        r = await client.post(
+            "/interact/batch", content=body, headers={"content-type": "application/x-ndjson"}
+        )
+        r.raise_for_status()
+        assert r.content.count(b"\n") == len(items)
+    return rounds * len(items) / (time.perf_counter() - start)
+
+async def main():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        single = await bench_single(client, make_items(1024))
+        print(f"{'mode':<12}{'batch size':>12}{'req/s':>12}")
+        print(f"{'single':<12}{1:>12}{single:>12.0f}")
+        for size in BATCH_SIZES:
+            rounds = max(1, 2048 // size)
+            rate = await bench_batch(client, make_items(size), rounds)
+            print(f"{'batch':<12}{size:>12}{rate:>12.0f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Measures event-loop lag and fast-query latency under a mix of slow and fast
+queries, comparing the inline synchronous pipeline (`process`) with the async
+division pipeline (`aprocess`).
+
+EID is replaced by a division that blocks for SLOW_STEP_SECONDS, standing in
+for real raster/satellite work:
+
+    cd python_engine && python benchmarks/bench_event_loop.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.agent import AEOSOrchestrator
+from app.cache import ResponseCache
+from app.divisions import EarthIntelligenceDivision
+
+SLOW_STEP_SECONDS = 0.05
+TICK_SECONDS = 0.001
+CLIENTS = 32
+REQUESTS_PER_CLIENT = 20
+SLOW_EVERY = 4  # one slow query in every SLOW_EVERY
+
+class SlowEarthIntelligenceDivision(EarthIntelligenceDivision):
+    def process(self, query, intents=None, context=None):
+        time.sleep(SLOW_STEP_SECONDS)
+        return super().process(query, intents, context)
+
+def make_orchestrator() -> AEOSOrchestrator:
+    # Caching would hide the slow division after its first call.
+    orchestrator = AEOSOrchestrator(cache=ResponseCache(ttl=0))
+    orchestrator.use_division(SlowEarthIntelligenceDivision())
+    return orchestrator
+
+async def measure_lag(stop: asyncio.Event, samples):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        samples.append(time.perf_counter() - start - TICK_SECONDS)
+
+async def client(orchestrator, index: int, use_async: bool, fast_latencies):
+    for i in range(REQUESTS_PER_CLIENT):
+        slow = (index * REQUESTS_PER_CLIENT + i) % SLOW_EVERY == 0
+        query = "show global weather" if slow else "treasury allocation"
+        start = time.perf_counter()
+        if use_async:
+            await orchestrator.aprocess(query)
+        else:
+            orchestrator.process(query)
+            await asyncio.sleep(0)
+        if not slow:
+            fast_latencies.append(time.perf_counter() - start)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+async def run(use_async: bool):
+    orchestrator = make_orchestrator()
+    lag, fast = [], []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop, lag))
+    start = time.perf_counter()
+    await asyncio.gather(*(client(orchestrator, c, use_async, fast) for c in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    return {
+        "mode": "async" if use_async else "sync-inline",
+        "wall_s": elapsed,
+        "loop_lag_p50_ms": statistics.median(lag) * 1e3,
+        "loop_lag_max_ms": max(lag) * 1e3,
+        "fast_p50_ms": statistics.median(fast) * 1e3,
+        "fast_p99_ms": percentile(fast, 0.99) * 1e3,
+    }
+
+async def main():
+    print(f"{'mode':<12}{'wall s':>9}{'lag p50 ms':>12}{'lag max ms':>12}{'fast p50 ms':>13}{'fast p99 ms':>13}")
+    for use_async in (False, True):
+        r = await run(use_async)
+        print(
+            f"{r['mode']:<12}{r['wall_s']:>9.2f}{r['loop_lag_p50_ms']:>12.2f}"
+            f"{r['loop_lag_max_ms']:>12.2f}{r['fast_p50_ms']:>13.2f}{r['fast_p99_ms']:>13.2f}"
+        )
+
+if __name__ == "__main__":
+    asyncio.run(main())
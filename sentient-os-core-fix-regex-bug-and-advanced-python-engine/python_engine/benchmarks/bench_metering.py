@@ -0,0 +1,74 @@
+"""
+Metering ledger throughput and query latency.
+
+Appends --rows records through `MeteringLedger.record` (the /interact hot
+path), flushes them to segment files, then times per-user and per-division
+spend aggregations over the full range and over a time window.
+
+    cd python_engine && python benchmarks/bench_metering.py --rows 10000000
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.metering import MeteringLedger
+
+DIVISIONS = ("EID", "ENID", "DTAD", "HID")
+COSTS = {"EID": 0.02, "ENID": 0.015, "DTAD": 0.03, "HID": 0.005}
+
+def timed(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="aeos-metering-")
+    try:
+        ledger = MeteringLedger(directory)
+        rng = random.Random(7)
+        users = [f"user-{i}" for i in range(args.users)]
+        picks = [(rng.choice(users), rng.choice(DIVISIONS)) for _ in range(4096)]
+
+        t0 = time.perf_counter()
+        for i in range(args.rows):
+            user, division = picks[i & 4095]
+            ledger.record(user, division, COSTS[division])
+        append = time.perf_counter() - t0
+        window_start = time.time()
+        ledger.close()
+
+        print(f"rows:                     {args.rows:,}")
+        print(f"record() mean latency:    {append / args.rows * 1e6:.2f} µs")
+        print(f"record() throughput:      {args.rows / append:,.0f} rows/s")
+
+        elapsed, by_user = timed(ledger.spend_by_user)
+        print(f"spend_by_user (all):      {elapsed * 1e3:.1f} ms  ({len(by_user):,} users)")
+        elapsed, by_division = timed(ledger.spend_by_division)
+        print(f"spend_by_division (all):  {elapsed * 1e3:.1f} ms  total={sum(by_division.values()):,.2f}")
+        elapsed, _ = timed(lambda: ledger.spend_by_division(user_id=picks[0][0]))
+        print(f"one user's divisions:     {elapsed * 1e3:.1f} ms")
+        elapsed, windowed = timed(lambda: ledger.spend_by_division(start=window_start))
+        print(f"spend_by_division (empty window): {elapsed * 1e3:.2f} ms")
+
+        check = MeteringLedger(directory)
+        assert abs(sum(check.spend_by_division().values()) - sum(by_division.values())) < 1e-6
+        assert not windowed
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == "__main__":
+    main()
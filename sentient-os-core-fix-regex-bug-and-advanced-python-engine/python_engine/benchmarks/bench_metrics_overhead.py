@@ -0,0 +1,81 @@
+"""
+Measures the cost of the instrumentation layer by running the same workload
+with the metrics registry enabled and disabled, in alternating blocks.
+
+    cd python_engine && python benchmarks/bench_metrics_overhead.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from app.agent import AEOSOrchestrator
+from app.main import agent, app
+from app.metrics import REGISTRY
+
+# Every request comes from the same user; without this most would be rate limited.
+agent.admission.enabled = False
+
+QUERIES = [
+    "Show global weather",
+    "Check compliance status",
+    "Optimize treasury yield",
+    "Open a support ticket",
+    "Flood detected, release disaster funds",
+    "send 10 ADA payment",
+    "hello there",
+]
+# Modes alternate every block, so drift in machine load hits both equally;
+# the overhead is the median ratio of each enabled block to its disabled twin.
+BLOCKS = 300
+ORCHESTRATOR_BLOCK = 200
+HTTP_BLOCK = 40
+
+def bench_orchestrator(orchestrator: AEOSOrchestrator, n: int = ORCHESTRATOR_BLOCK) -> float:
+    start = time.process_time()
+    for i in range(n):
+        orchestrator.process(QUERIES[i % len(QUERIES)])
+    return (time.process_time() - start) / n
+
+async def bench_http(client: httpx.AsyncClient, n: int = HTTP_BLOCK) -> float:
+    start = time.process_time()
+    for i in range(n):
+        r = await client.post("/interact", json={"query": QUERIES[i % len(QUERIES)], "user_id": "u"})
+        r.raise_for_status()
+    return (time.process_time() - start) / n
+
+async def interleaved(run: Callable[[], Awaitable[float]]) -> Tuple[float, float, float]:
+    """Median time per call with the registry disabled and enabled, and the median paired overhead."""
+    pairs: List[Dict[bool, float]] = []
+    for block in range(BLOCKS):
+        pair = {}
+        for enabled in ((False, True) if block % 2 else (True, False)):
+            REGISTRY.enabled = enabled
+            pair[enabled] = await run()
+        pairs.append(pair)
+    return (statistics.median(pair[False] for pair in pairs),
+            statistics.median(pair[True] for pair in pairs),
+            statistics.median(pair[True] / pair[False] - 1 for pair in pairs))
+
+async def main():
+    orchestrator = AEOSOrchestrator()
+
+    async def orchestrator_block() -> float:
+        return bench_orchestrator(orchestrator)
+
+    results = {"AEOSOrchestrator.process": await interleaved(orchestrator_block)}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results["POST /interact"] = await interleaved(lambda: bench_http(client))
+    print(f"{'path':<26}{'off µs':>10}{'on µs':>10}{'overhead':>10}")
+    for name, (off, on, overhead) in results.items():
+        print(f"{name:<26}{off * 1e6:>10.1f}{on * 1e6:>10.1f}{overhead * 100:>9.1f}%")
+
+if __name__ == "__main__":
+    asyncio.run(main())
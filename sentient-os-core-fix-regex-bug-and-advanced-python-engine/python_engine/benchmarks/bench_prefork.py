@@ -0,0 +1,107 @@
+"""
+Throughput of the preforked server by worker count.
+
+Starts `python -m app.prefork --workers N` for each N in --workers, on a
+real TCP socket, and drives `POST /interact` from --clients client
+processes, each issuing back-to-back requests over one keep-alive
+connection for --seconds. Admission control and the response cache are off
+so every request reaches the divisions. Reports requests/s, p50/p99 latency
+and the speed-up over the first worker count.
+
+Scaling is bounded by the cores available: the clients share them with the
+workers, so measure on a machine with more cores than workers plus clients.
+
+    cd python_engine && python benchmarks/bench_prefork.py --workers 1,2,4
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from corpus import generate
+from micro import summarize
+
+HOST = "127.0.0.1"
+
+def wait_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(HOST, port, timeout=1)
+            connection.request("GET", "/config")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server on port {port} did not start")
+
+def client(port: int, bodies, seconds: float):
+    connection = http.client.HTTPConnection(HOST, port)
+    headers = {"content-type": "application/json"}
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    i = random.randrange(len(bodies))
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        connection.request("POST", "/interact", bodies[i % len(bodies)], headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - t0)
+        errors += response.status >= 400
+        i += 1
+    return latencies, errors
+
+def run(workers: int, port: int, clients: int, seconds: float, bodies):
+    env = dict(os.environ, AEOS_ADMISSION="0", AEOS_CACHE_TTL="0", AEOS_AUDIT_DIR="", AEOS_METERING_DIR="")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.prefork", "--workers", str(workers), "--host", HOST, "--port", str(port)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(port)
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            # A short warm-up, then the measured run.
+            pool.starmap(client, [(port, bodies, 0.5)] * clients)
+            start = time.perf_counter()
+            results = pool.starmap(client, [(port, bodies, seconds)] * clients)
+            elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait()
+    result = summarize([latency for latencies, _ in results for latency in latencies], elapsed)
+    result["errors"] = sum(errors for _, errors in results)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    mixes = generate(size=500)
+    bodies = [json.dumps({"query": query, "user_id": f"bench-{i % 97}"}).encode()
+              for i, query in enumerate(query for mix in mixes.values() for query in mix)]
+    random.Random(7).shuffle(bodies)
+
+    print(f"{os.cpu_count()} CPUs, {args.clients} client processes")
+    print(f"{'workers':>8}{'req/s':>10}{'p50 ms':>9}{'p99 ms':>9}{'errors':>8}{'speed-up':>10}")
+    base = None
+    for n, workers in enumerate(int(w) for w in args.workers.split(",")):
+        result = run(workers, args.port + n, args.clients, args.seconds, bodies)
+        base = base or result["ops_per_sec"]
+        print(f"{workers:>8}{result['ops_per_sec']:>10,.0f}{result['p50_us'] / 1000:>9.2f}"
+              f"{result['p99_us'] / 1000:>9.2f}{result['errors']:>8}{result['ops_per_sec'] / base:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
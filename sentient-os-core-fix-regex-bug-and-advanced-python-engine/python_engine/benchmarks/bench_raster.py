@@ -0,0 +1,53 @@
+"""
+Raster assessment latency.
+
+Generates a synthetic dataset (see make_rasters.py) into a temporary
+directory, then times region assessments on a fresh store (cold tile cache,
+tiles paged in from the memory-mapped files) and again with the tile cache
+warm, bypassing the per-bbox memo so each run reduces every tile:
+
+    cd python_engine && python benchmarks/bench_raster.py
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.raster import REGIONS, RasterStore, TileCache
+from make_rasters import generate
+
+BENCH_REGIONS = ("ganges delta", "california", "europe", "asia", "north america")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--width", type=int, default=8640)
+    parser.add_argument("--height", type=int, default=4320)
+    parser.add_argument("--tile-size", type=int, default=256)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix="aeos-rasters-")
+    try:
+        generate(root, args.width, args.height, args.tile_size)
+        print(f"{'region':<16} {'pixels':>12} {'cold ms':>9} {'warm ms':>9}  flood")
+        for region in BENCH_REGIONS:
+            bbox = REGIONS[region]
+            store = RasterStore(root, TileCache(max_bytes=1 << 30))
+            t0 = time.perf_counter()
+            result = store._assess(bbox)
+            cold = time.perf_counter() - t0
+            warm = float("inf")
+            for _ in range(5):
+                t0 = time.perf_counter()
+                store._assess(bbox)
+                warm = min(warm, time.perf_counter() - t0)
+            print(f"{region:<16} {result['pixels']:>12,} {cold * 1000:>9.1f} {warm * 1000:>9.1f}"
+                  f"  {result['flood_probability']:.3f}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Response building and serialization cost per request.
+
+Runs the same static-division workload two ways and alternates them each
+round, keeping the best time:
+
+* `rebuilt`: each division call returns freshly built dicts and lists, and
+  the response is serialized with `model_dump_json().encode()`. This is the
+  previous per-request path.
+* `template`: divisions return their shared result templates, and the
+  response is encoded once with `to_json_bytes`.
+
+Time and peak traced allocation per request are reported for the
+orchestrator plus serialization. `/config` is compared separately: a model
+built and serialized by FastAPI on every call against the precomputed body.
+
+    cd python_engine && python benchmarks/bench_response.py
+"""
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import Response
+
+from app.agent import AEOSOrchestrator
+from app.cache import ResponseCache
+from app.main import AGENT_CONFIG, AGENT_CONFIG_BODY
+from app.models import MasumiAgentConfig, to_json_bytes
+
+QUERIES = [
+    "Show global weather",
+    "Check compliance status",
+    "Optimize treasury yield",
+    "Open a support ticket",
+    "Flood detected, release disaster funds",
+    "hello there",
+]
+ROUNDS = 5
+
+def rebuild(result):
+    """A result as the divisions used to build it on every call."""
+    return dict(
+        result,
+        tool_usage=[dict(usage) for usage in result["tool_usage"]],
+        logs=list(result["logs"]),
+    )
+
+def orchestrator(mode: str) -> AEOSOrchestrator:
+    # The response cache is off so every request reaches the divisions.
+    orchestrator = AEOSOrchestrator(cache=ResponseCache(ttl=0))
+    if mode == "rebuilt":
+        for division in orchestrator.divisions:
+            division.process = (lambda process: lambda *args: rebuild(process(*args)))(division.process)
+    return orchestrator
+
+def request(mode: str):
+    process = orchestrator(mode).process
+    if mode == "rebuilt":
+        return lambda query: process(query, "u").model_dump_json().encode()
+    return lambda query: to_json_bytes(process(query, "u"))
+
+def bench_time(handle, n: int = 20000) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        handle(QUERIES[i % len(QUERIES)])
+    return (time.perf_counter() - start) / n
+
+def bench_allocations(handle, n: int = 2000) -> float:
+    """Mean peak of traced memory above the starting point, per request."""
+    total = 0
+    tracemalloc.start()
+    try:
+        for i in range(n):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            handle(QUERIES[i % len(QUERIES)])
+            total += tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return total / n
+
+config_app = FastAPI()
+
+@config_app.get("/model")
+async def config_model():
+    return MasumiAgentConfig(**AGENT_CONFIG.model_dump())
+
+@config_app.get("/bytes")
+async def config_bytes():
+    return Response(content=AGENT_CONFIG_BODY, media_type="application/json")
+
+async def bench_config(path: str, n: int = 5000) -> float:
+    transport = httpx.ASGITransport(app=config_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        start = time.perf_counter()
+        for _ in range(n):
+            (await client.get(path)).raise_for_status()
+        return (time.perf_counter() - start) / n
+
+def main():
+    modes = ("rebuilt", "template")
+    handlers = {mode: request(mode) for mode in modes}
+    for mode in modes:
+        # Identical bodies either way.
+        assert all(handlers[mode](q) == handlers["template"](q) for q in QUERIES), mode
+    times = {mode: float("inf") for mode in modes}
+    config = {path: float("inf") for path in ("/model", "/bytes")}
+    for _ in range(ROUNDS):
+        for mode in modes:
+            times[mode] = min(times[mode], bench_time(handlers[mode]))
+        for path in config:
+            config[path] = min(config[path], asyncio.run(bench_config(path)))
+    allocations = {mode: bench_allocations(handlers[mode]) for mode in modes}
+
+    print(f"{'process + serialize':<22}{'µs':>8}{'peak B':>9}")
+    for mode in modes:
+        print(f"{mode:<22}{times[mode] * 1e6:>8.1f}{allocations[mode]:>9,.0f}")
+    print(f"{'GET /config':<22}{'µs':>8}")
+    for path, label in (("/model", "model per call"), ("/bytes", "precomputed")):
+        print(f"{label:<22}{config[path] * 1e6:>8.1f}")
+
+if __name__ == "__main__":
+    main()
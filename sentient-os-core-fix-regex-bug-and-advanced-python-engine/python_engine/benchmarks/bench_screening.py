@@ -0,0 +1,127 @@
+"""
+Sanctions/KYC screening latency.
+
+Writes --entries synthetic entries across three lists into a temporary
+screening directory, builds the index, then times single id checks (misses
+and hits), fuzzy name matches and batch id screening. Finally it appends to a
+list and measures screening latency while the index is rebuilt and swapped
+in the background:
+
+    cd python_engine && python benchmarks/bench_screening.py --entries 3000000
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.screening import SOURCES, Screener
+
+LISTS = ("ofac_sdn", "eu_consolidated", "un_security_council")
+SYLLABLES = ("al", "an", "ar", "be", "da", "el", "ha", "ib", "ka", "lo", "ma", "mo", "na", "ov", "ra", "sa", "ti", "va", "yu", "zo")
+
+def synthetic_name(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        for _ in range(rng.randint(2, 3))
+    )
+
+def write_lists(root: str, entries: int, rng: random.Random):
+    os.makedirs(os.path.join(root, SOURCES))
+    per_list = entries // len(LISTS)
+    samples = []
+    for list_index, name in enumerate(LISTS):
+        with open(os.path.join(root, SOURCES, name + ".csv"), "w", encoding="utf-8") as f:
+            f.write("identifier,name\n")
+            for i in range(per_list):
+                identifier = f"addr1_{list_index}_{i:09d}"
+                person = synthetic_name(rng)
+                f.write(f"{identifier},{person}\n")
+                if i % 10007 == 0:
+                    samples.append((identifier, person))
+    return samples
+
+def per_call_us(fn, items, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for item in items:
+            fn(item)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(items) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--entries", type=int, default=3_000_000)
+    parser.add_argument("--batch", type=int, default=100_000)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    root = tempfile.mkdtemp(prefix="aeos-screening-")
+    try:
+        samples = write_lists(root, args.entries, rng)
+        t0 = time.perf_counter()
+        screener = Screener(root, reload_interval=0)
+        build = time.perf_counter() - t0
+        index = screener.index
+        size = sum(os.path.getsize(os.path.join(index.path, n)) for n in os.listdir(index.path))
+        print(f"index: {index.entries:,} entries, {size / 2**20:,.0f} MiB, built in {build:.1f}s")
+
+        misses = [f"addr1_clean_{i}" for i in range(20_000)]
+        hits = [identifier for identifier, _ in samples]
+        names = [person for _, person in samples]
+        variants = [person.replace("a", "e", 1) for person in names]
+        print(f"id check, miss        {per_call_us(index.check_id, misses):8.2f} us")
+        print(f"id check, hit         {per_call_us(index.check_id, hits):8.2f} us")
+        print(f"screen (id + name)    {per_call_us(screener.screen, misses):8.2f} us")
+        print(f"name match, exact     {per_call_us(index.match_name, names):8.2f} us")
+        print(f"name match, variant   {per_call_us(index.match_name, variants):8.2f} us")
+
+        batch = misses * (args.batch // len(misses)) + hits
+        t0 = time.perf_counter()
+        found = screener.screen_many(batch)
+        elapsed = time.perf_counter() - t0
+        assert len(found) == len(hits)
+        print(f"batch of {len(batch):,}     {elapsed / len(batch) * 1e6:8.2f} us/id ({len(found)} hits)")
+
+        # Hot reload: screen continuously while a changed list is rebuilt.
+        with open(os.path.join(root, SOURCES, LISTS[0] + ".csv"), "a", encoding="utf-8") as f:
+            f.write("addr1_new_entry,Newly Listed\n")
+        latencies = []
+        done = threading.Event()
+
+        def screen_loop():
+            i = 0
+            while not done.is_set():
+                t = time.perf_counter()
+                screener.screen(misses[i % len(misses)])
+                latencies.append(time.perf_counter() - t)
+                i += 1
+
+        worker = threading.Thread(target=screen_loop)
+        worker.start()
+        t0 = time.perf_counter()
+        screener.reload()
+        reload_time = time.perf_counter() - t0
+        done.set()
+        worker.join()
+        assert screener.screen("addr1_new_entry")
+        latencies.sort()
+        print(
+            f"during reload ({reload_time:.1f}s): {len(latencies):,} checks, "
+            f"p50 {statistics.median(latencies) * 1e6:.1f} us, "
+            f"p99 {latencies[int(len(latencies) * 0.99)] * 1e6:.1f} us, "
+            f"max {latencies[-1] * 1e3:.1f} ms"
+        )
+        screener.close()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
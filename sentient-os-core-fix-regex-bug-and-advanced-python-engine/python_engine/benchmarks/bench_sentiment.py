@@ -0,0 +1,69 @@
+"""
+Sentiment scoring cost per query.
+
+Scores the seeded query corpus (`corpus.py`) plus support-style messages:
+
+* `score`, uncached: the per-token path used for single requests.
+* `score`, cached: a repeat of an already scored (normalized) text.
+* `score_many`: one vectorized NumPy pass over a whole uncached batch, as
+  `/interact/batch` does for each chunk of its body.
+
+Both paths are checked to produce identical scores first.
+
+    cd python_engine && python benchmarks/bench_sentiment.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from app.sentiment import SentimentScorer
+from corpus import generate
+
+MESSAGES = [
+    "Thanks, the support team was really helpful!",
+    "My payment failed again and nobody answers, this is unacceptable",
+    "not bad, but the dashboard is very slow",
+    "I can't access my wallet, was I hacked?",
+    "Great job on the flood relief payouts",
+]
+ROUNDS = 5
+
+def best(fn, texts) -> float:
+    """Best time per text over ROUNDS runs of `fn(texts)`."""
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        fn(texts)
+        times.append((time.perf_counter() - start) / len(texts))
+    return min(times)
+
+def score_each(scorer: SentimentScorer):
+    return lambda texts: [scorer.score(text) for text in texts]
+
+def main():
+    texts = [query for mix in generate(size=5000).values() for query in mix] + MESSAGES * 200
+    # Distinct texts, so uncached runs really compute every score.
+    texts = list(dict.fromkeys(" ".join(text.lower().split()) for text in texts))
+
+    uncached = SentimentScorer(cache_size=0)
+    assert np.array_equal(np.array(score_each(uncached)(texts)), uncached.score_many(texts))
+
+    warm = SentimentScorer()
+    warm.score_many(texts)
+    results = {
+        "score, uncached": best(score_each(uncached), texts),
+        "score, cached": best(score_each(warm), texts),
+        "score_many, uncached": best(uncached.score_many, texts),
+    }
+    print(f"{len(texts):,} distinct texts")
+    print(f"{'path':<24}{'µs / query':>12}")
+    for name, seconds in results.items():
+        print(f"{name:<24}{seconds * 1e6:>12.2f}")
+
+if __name__ == "__main__":
+    main()
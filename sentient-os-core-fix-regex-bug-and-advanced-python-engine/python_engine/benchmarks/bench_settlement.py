@@ -0,0 +1,68 @@
+"""
+Settlement engine throughput.
+
+Submits --transfers random transfers between --wallets wallets, one call per
+transfer through `submit` and in bulk through `submit_many`, lets the engine
+settle them, and checks that total supply is conserved:
+
+    cd python_engine && python benchmarks/bench_settlement.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.settlement import SettlementEngine
+
+def drain(engine: SettlementEngine):
+    while engine.stats()["pending"]:
+        engine.settle()
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transfers", type=int, default=1_000_000)
+    parser.add_argument("--wallets", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    wallets = [f"addr1_wallet_{i}" for i in range(args.wallets)]
+    senders = [wallets[i] for i in rng.integers(0, args.wallets, args.transfers)]
+    recipients = [wallets[i] for i in rng.integers(0, args.wallets, args.transfers)]
+    # Mostly small transfers with a tail large enough to trigger overdrafts.
+    amounts = np.round(rng.exponential(20.0, args.transfers), 6) + 0.000001
+
+    for mode in ("submit", "submit_many"):
+        engine = SettlementEngine(initial_balance=1000.0)
+        supply = 1000.0 * args.wallets
+        for wallet in wallets:
+            engine.balance(wallet)
+        engine.submit_many(wallets, wallets, np.full(args.wallets, 0.000001))
+        drain(engine)
+
+        started = time.perf_counter()
+        if mode == "submit":
+            submit = engine.submit
+            for sender, recipient, amount in zip(senders, recipients, amounts.tolist()):
+                submit(sender, recipient, amount)
+        else:
+            engine.submit_many(senders, recipients, amounts)
+        submitted = time.perf_counter() - started
+        drain(engine)
+        engine.close()
+        elapsed = time.perf_counter() - started
+
+        stats = engine.stats()
+        assert abs(engine.total_supply() - supply) < 1e-6, "supply not conserved"
+        assert stats["settled"] + stats["rejected"] == args.transfers + args.wallets
+        print(
+            f"{mode:<12} {args.transfers / elapsed:>12,.0f} transfers/s end to end "
+            f"(submit {submitted:.2f}s, total {elapsed:.2f}s, "
+            f"{stats['batches']} batches, {stats['rejected']:,} rejected)"
+        )
+
+if __name__ == "__main__":
+    main()
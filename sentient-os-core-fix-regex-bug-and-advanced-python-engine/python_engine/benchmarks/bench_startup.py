@@ -0,0 +1,109 @@
+"""
+Cold-start report for the engine: import time per module and time to the
+first served /interact request, each measured in a fresh interpreter.
+
+    cd python_engine && python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget-ms 1500 --json startup.json
+
+With --budget-ms the script exits with status 1 when time to first served
+request exceeds the budget.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import asyncio, json, time
+t0 = time.perf_counter()
+import app.main
+t1 = time.perf_counter()
+import httpx
+async def first_request():
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://startup") as client:
+        r = await client.post("/interact", json={"query": "show global weather", "user_id": "startup"})
+        r.raise_for_status()
+t2 = time.perf_counter()
+asyncio.run(first_request())
+t3 = time.perf_counter()
+print(json.dumps({"import_app_ms": (t1 - t0) * 1e3, "first_request_ms": (t3 - t2) * 1e3}), flush=True)
+"""
+
+def _env():
+    env = dict(os.environ)
+    env["PYTHONPATH"] = ENGINE_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["PYTHONDONTWRITEBYTECODE"] = "0"
+    return env
+
+def measure_first_request():
+    """Returns timings, including wall time from process spawn to the first response."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", CHILD], stdout=subprocess.PIPE, env=_env(), cwd=ENGINE_DIR)
+    line = proc.stdout.readline()
+    spawn_to_response_ms = (time.perf_counter() - started) * 1e3
+    proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError("startup child process failed")
+    timings = json.loads(line)
+    timings["spawn_to_first_response_ms"] = spawn_to_response_ms
+    return timings
+
+def measure_imports(top: int):
+    """Parses `python -X importtime` output into per-module cumulative import times (ms)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        stderr=subprocess.PIPE, env=_env(), cwd=ENGINE_DIR, text=True, check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        head, cumulative_us, name = line.split("|", 2)
+        self_us = head.split(":", 1)[1]
+        # Nesting is shown as two extra spaces per level after the separator.
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1e3,
+                        "cumulative_ms": int(cumulative_us) / 1e3, "depth": depth})
+    # Depth 0 and 1 cover the interpreter's own imports plus everything app.main pulls in directly.
+    heaviest = sorted((m for m in modules if m["depth"] <= 1), key=lambda m: m["cumulative_ms"], reverse=True)
+    engine = [m for m in modules if m["module"] == "app" or m["module"].startswith("app.")]
+    return {"top_level": heaviest[:top], "engine_modules": engine}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, help="fail when spawn-to-first-response exceeds this")
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to measure (best is reported)")
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    runs = [measure_first_request() for _ in range(args.runs)]
+    best = min(runs, key=lambda r: r["spawn_to_first_response_ms"])
+    imports = measure_imports(args.top)
+
+    print(f"{'module (depth <= 1)':<40}{'cumulative ms':>15}")
+    for m in imports["top_level"]:
+        print(f"{m['module']:<40}{m['cumulative_ms']:>15.1f}")
+    print(f"\n{'engine module':<40}{'self ms':>15}{'cumulative ms':>15}")
+    for m in imports["engine_modules"]:
+        print(f"{m['module']:<40}{m['self_ms']:>15.1f}{m['cumulative_ms']:>15.1f}")
+    print(f"\nimport app.main:              {best['import_app_ms']:8.1f} ms")
+    print(f"first /interact (in process): {best['first_request_ms']:8.1f} ms")
+    print(f"spawn -> first response:      {best['spawn_to_first_response_ms']:8.1f} ms (best of {args.runs})")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"first_request": best, "runs": runs, "imports": imports}, f, indent=2)
+
+    if args.budget_ms is not None and best["spawn_to_first_response_ms"] > args.budget_ms:
+        print(f"COLD START BUDGET EXCEEDED: {best['spawn_to_first_response_ms']:.1f} ms > {args.budget_ms:.1f} ms")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
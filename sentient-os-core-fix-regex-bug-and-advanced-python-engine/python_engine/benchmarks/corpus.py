@@ -0,0 +1,80 @@
+"""
+Seeded generator for realistic /interact query corpora.
+
+Queries are built from templates around the divisions' own keyword tables, so
+the corpus tracks routing changes automatically. Three mixes are produced:
+single-division, collaboration workflows and fallback-to-HID.
+"""
+import os
+import random
+import sys
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.divisions import (
+    DeFiTransactionDivision,
+    EarthIntelligenceDivision,
+    EnterpriseIntelligenceDivision,
+    HumanInteractionDivision,
+)
+from app.workflows import WORKFLOWS
+
+DIVISIONS = [
+    EarthIntelligenceDivision,
+    EnterpriseIntelligenceDivision,
+    DeFiTransactionDivision,
+    HumanInteractionDivision,
+]
+
+PREFIXES = ["", "please ", "can you ", "AEOS, ", "hey, ", "urgent: "]
+SUFFIXES = ["", " now", " for today", " in the EMEA region", " and summarize", "?", " for wallet addr1_q9x"]
+FILLER = [
+    "hello there", "what can you do", "good morning team", "thanks for the update",
+    "how are things", "tell me something interesting", "status report please",
+]
+# Terms that match no routing keyword, used to build fallback queries.
+NEUTRAL_TERMS = ["dashboard", "overview", "summary", "numbers", "latest", "report", "update"]
+
+def _decorate(rng: random.Random, core: str) -> str:
+    return f"{rng.choice(PREFIXES)}{core}{rng.choice(SUFFIXES)}"
+
+def single_division_queries(rng: random.Random, n: int) -> List[str]:
+    queries = []
+    for _ in range(n):
+        division = rng.choice(DIVISIONS)
+        if division.branches and rng.random() < 0.7:
+            _, keywords = rng.choice(division.branches)
+            core = f"show {rng.choice(keywords)} {rng.choice(NEUTRAL_TERMS)}"
+        else:
+            core = f"{rng.choice(division.route_keywords)} {rng.choice(NEUTRAL_TERMS)}"
+        queries.append(_decorate(rng, core))
+    return queries
+
+def collaboration_queries(rng: random.Random, n: int) -> List[str]:
+    queries = []
+    for _ in range(n):
+        workflow = rng.choice(WORKFLOWS)
+        core = " then ".join(rng.choice(group) for group in workflow.trigger)
+        queries.append(_decorate(rng, core))
+    return queries
+
+def fallback_queries(rng: random.Random, n: int) -> List[str]:
+    return [_decorate(rng, f"{rng.choice(FILLER)} {rng.choice(NEUTRAL_TERMS)}") for _ in range(n)]
+
+def generate(seed: int = 1234, size: int = 2000) -> Dict[str, List[str]]:
+    """Returns the three mixes plus a realistic blend (70% single, 20% collaboration, 10% fallback)."""
+    rng = random.Random(seed)
+    mixes = {
+        "single": single_division_queries(rng, size),
+        "collaboration": collaboration_queries(rng, size),
+        "fallback": fallback_queries(rng, size),
+    }
+    blend = (
+        mixes["single"][: int(size * 0.7)]
+        + mixes["collaboration"][: int(size * 0.2)]
+        + mixes["fallback"][: int(size * 0.1)]
+    )
+    rng.shuffle(blend)
+    mixes["blended"] = blend
+    return mixes
@@ -0,0 +1,56 @@
+"""
+In-process ASGI load tests. Each concurrency level runs that many client
+coroutines issuing back-to-back requests through httpx.ASGITransport.
+"""
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from app.main import agent, app
+from micro import summarize
+
+# Load tests measure raw capacity; per-user admission limits would
+# turn most of the load into 429s.
+agent.admission.enabled = False
+
+async def _client(client: httpx.AsyncClient, method: str, path: str, payloads, deadline: float, latencies: List[float], errors: List[int]):
+    i = 0
+    while time.perf_counter() < deadline:
+        t0 = time.perf_counter()
+        if method == "POST":
+            r = await client.post(path, json=payloads[i % len(payloads)])
+        else:
+            r = await client.get(path)
+        latencies.append(time.perf_counter() - t0)
+        if r.status_code >= 400:
+            errors.append(r.status_code)
+        i += 1
+
+async def _run_level(method: str, path: str, payloads, concurrency: int, seconds: float) -> Dict[str, float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # Warm the connection path before measuring.
+        await _client(client, method, path, payloads, time.perf_counter() + min(0.2, seconds / 10), [], [])
+        latencies: List[float] = []
+        errors: List[int] = []
+        start = time.perf_counter()
+        deadline = start + seconds
+        await asyncio.gather(*(
+            _client(client, method, path, payloads[c::concurrency] or payloads, deadline, latencies, errors)
+            for c in range(concurrency)
+        ))
+        result = summarize(latencies, time.perf_counter() - start)
+        result["errors"] = len(errors)
+        return result
+
+def run(queries: List[str], concurrency_levels=(1, 8, 64), seconds: float = 2.0) -> Dict[str, Dict[str, float]]:
+    payloads = [{"query": q, "user_id": f"bench-{i % 97}"} for i, q in enumerate(queries)]
+    results = {}
+    for concurrency in concurrency_levels:
+        results[f"POST /interact c={concurrency}"] = asyncio.run(
+            _run_level("POST", "/interact", payloads, concurrency, seconds))
+        results[f"GET /config c={concurrency}"] = asyncio.run(
+            _run_level("GET", "/config", [None], concurrency, seconds))
+    return results
@@ -0,0 +1,88 @@
+"""
+Synthetic global raster dataset for the Environmental Intelligence Division.
+
+Writes rainfall, elevation, temperature and fire_risk layers on a global
+lon/lat grid into --out (the default AEOS_RASTER_DIR), so EID reports and the
+flood-payout trigger can be exercised without real satellite data. The fields
+are smooth noise with a few planted hotspots; the Ganges delta is wet and
+low-lying enough to cross the default flood payout threshold:
+
+    cd python_engine && python benchmarks/make_rasters.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.raster import DEFAULT_RASTER_DIR, REGIONS, create_dataset, write_layer
+
+# (region, layer, peak value, radius in degrees) added on top of the base fields.
+HOTSPOTS = (
+    ("ganges delta", "rainfall", 140.0, 3.0),
+    ("ganges delta", "elevation", -2000.0, 4.0),
+    ("mekong delta", "rainfall", 60.0, 2.0),
+    ("sahel", "temperature", 12.0, 12.0),
+    ("australia", "temperature", 10.0, 12.0),
+    ("california", "fire_risk", 0.6, 5.0),
+    ("australia", "fire_risk", 0.5, 10.0),
+)
+
+def _centre(region: str):
+    west, south, east, north = REGIONS[region]
+    return (west + east) / 2, (south + north) / 2
+
+def make_rows(layer: str, width: int, height: int):
+    """`rows(start, stop)` callback producing `layer` for write_layer."""
+    lon = np.linspace(-180.0, 180.0, width, endpoint=False, dtype=np.float32) + 180.0 / width
+    hotspots = [(_centre(region), peak, radius) for region, name, peak, radius in HOTSPOTS if name == layer]
+
+    def rows(start: int, stop: int) -> np.ndarray:
+        lat = (90.0 - (np.arange(start, stop, dtype=np.float32) + 0.5) * 180.0 / height)[:, None]
+        wave = np.sin(np.radians(lon) * 3.0) * np.cos(np.radians(lat) * 5.0)
+        if layer == "rainfall":
+            values = 10.0 + 15.0 * np.cos(np.radians(lat)) ** 4 + 8.0 * wave
+        elif layer == "elevation":
+            values = 450.0 + 400.0 * wave + 300.0 * np.sin(np.radians(lat) * 7.0) ** 2
+        elif layer == "temperature":
+            values = 30.0 - 0.45 * np.abs(lat) + 3.0 * wave
+        else:
+            values = 0.2 + 0.1 * wave * np.cos(np.radians(lat))
+        values = np.broadcast_to(values, (stop - start, width)).astype(np.float32)
+        for (x, y), peak, radius in hotspots:
+            values = values + peak * np.exp(-((lon - x) ** 2 + (lat - y) ** 2) / (2 * radius ** 2))
+        if layer == "rainfall":
+            values = np.maximum(values, 0.0)
+        elif layer == "elevation":
+            values = np.maximum(values, 2.0)
+        elif layer == "fire_risk":
+            values = np.clip(values, 0.0, 1.0)
+        # Polar caps carry no data, exercising nodata handling.
+        return np.where(np.abs(lat) > 85.0, np.nan, values)
+
+    return rows
+
+def generate(root: str, width: int, height: int, tile_size: int):
+    create_dataset(root, width, height, tile_size)
+    for layer, units in (("rainfall", "mm/day"), ("elevation", "m"), ("temperature", "C"), ("fire_risk", "index")):
+        write_layer(root, layer, make_rows(layer, width, height), units=units)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=DEFAULT_RASTER_DIR)
+    parser.add_argument("--width", type=int, default=8640)
+    parser.add_argument("--height", type=int, default=4320)
+    parser.add_argument("--tile-size", type=int, default=256)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    generate(args.out, args.width, args.height, args.tile_size)
+    size = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out))
+    print(f"wrote {args.width}x{args.height} grid, 4 layers, {size / 2**20:,.0f} MiB "
+          f"to {args.out} in {time.perf_counter() - started:.1f}s")
+
+if __name__ == "__main__":
+    main()
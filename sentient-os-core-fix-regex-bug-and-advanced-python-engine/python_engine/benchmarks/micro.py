@@ -0,0 +1,48 @@
+"""
+Microbenchmarks for the orchestrator and the divisions, run in-process.
+The response cache is disabled so every call exercises routing and division
+logic rather than a cache lookup.
+"""
+import time
+from typing import Callable, Dict, List
+
+from app.agent import AEOSOrchestrator
+from app.cache import ResponseCache
+
+def _time_calls(fn: Callable[[str], object], queries: List[str], min_seconds: float) -> Dict[str, float]:
+    latencies: List[float] = []
+    start = time.perf_counter()
+    while True:
+        for query in queries:
+            t0 = time.perf_counter()
+            fn(query)
+            latencies.append(time.perf_counter() - t0)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            break
+    return summarize(latencies, elapsed)
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    ordered = sorted(latencies)
+
+    def pct(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6
+
+    return {
+        "ops": len(ordered),
+        "ops_per_sec": len(ordered) / elapsed,
+        "p50_us": pct(0.50),
+        "p95_us": pct(0.95),
+        "p99_us": pct(0.99),
+    }
+
+def run(mixes: Dict[str, List[str]], min_seconds: float = 1.0) -> Dict[str, Dict[str, float]]:
+    orchestrator = AEOSOrchestrator(cache=ResponseCache(ttl=0))
+    results = {}
+    for mix, queries in mixes.items():
+        results[f"orchestrator.process[{mix}]"] = _time_calls(orchestrator.process, queries, min_seconds)
+
+    for division in orchestrator.divisions:
+        queries = [" ".join(keywords) for _, keywords in division.branches] + ["status"]
+        results[f"{division.code}.process"] = _time_calls(division.process, queries, min_seconds / 4)
+    return results
@@ -0,0 +1,99 @@
+"""
+Runs the engine benchmark suite and writes machine-readable JSON results.
+
+    cd python_engine
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --output results.json --baseline benchmarks/baseline.json
+
+With --baseline, every metric is compared against the stored run and the
+script exits with status 1 when any metric regresses by more than
+--tolerance (default 15%).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import corpus
+import load
+import micro
+
+# Metric -> True when higher is better.
+COMPARED_METRICS = {
+    "ops_per_sec": True,
+    "p50_us": False,
+    "p95_us": False,
+    "p99_us": False,
+}
+
+def compare(current: dict, baseline: dict, tolerance: float):
+    """Returns a list of (benchmark, metric, baseline, current, change) regressions."""
+    regressions = []
+    for name, metrics in current["results"].items():
+        reference = baseline.get("results", {}).get(name)
+        if not reference:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in metrics or not reference.get(metric):
+                continue
+            change = metrics[metric] / reference[metric] - 1.0
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append((name, metric, reference[metric], metrics[metric], change))
+    return regressions
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="benchmark-results.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--corpus-size", type=int, default=2000)
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each load level")
+    parser.add_argument("--concurrency", default="1,8,64")
+    parser.add_argument("--skip-load", action="store_true")
+    args = parser.parse_args(argv)
+
+    mixes = corpus.generate(seed=args.seed, size=args.corpus_size)
+    results = micro.run(mixes, min_seconds=args.seconds / 2)
+    if not args.skip_load:
+        levels = tuple(int(c) for c in args.concurrency.split(","))
+        results.update(load.run(mixes["blended"], levels, args.seconds))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "corpus_size": args.corpus_size,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+    print(f"{'benchmark':<42}{'ops/s':>12}{'p50 µs':>10}{'p95 µs':>10}{'p99 µs':>10}")
+    for name, r in results.items():
+        print(f"{name:<42}{r['ops_per_sec']:>12.0f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}{r['p99_us']:>10.1f}")
+    print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, before, after, change in regressions:
+            print(f"REGRESSION {name} {metric}: {before:.1f} -> {after:.1f} ({change:+.1%})")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())